@@ -1,10 +1,148 @@
+from django import forms
 from django.contrib import admin
-from .models import Book, Author, BookInstance, Genre
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.exceptions import ValidationError
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.functional import cached_property
+
+from .models import Book, Author, BookInstance, Genre, OverdueReport
+from .pagination import EstimatedCountPaginator
+
+
+# Каталог рассчитан на миллионы строк, поэтому в админке:
+# - списки не считают COUNT(*) целиком (EstimatedCountPaginator, show_full_result_count)
+# - внешние ключи выбираются через autocomplete, а не <select> со всеми строками
+# - инлайны показывают первые строки и ссылку на полный список
+
+
+class AutocompleteFilter(admin.ListFilter):
+    """
+    List filter by a foreign key rendered as an autocomplete select instead of
+    a list of every related object. Only the selected object is loaded; choosing
+    another one reloads the changelist with ``<field>__id__exact=<pk>``.
+    The related model's admin must define search_fields.
+    """
+    template = 'admin/catalog/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.field = model._meta.get_field(self.field_name)
+        self.title = self.field.verbose_name
+        super().__init__(request, params, model, model_admin)
+        self.admin_site = model_admin.admin_site
+        self.parameter_name = '%s__%s__exact' % (self.field_name, self.field.target_field.name)
+        # использованный параметр нужно забрать, иначе ChangeList применит его еще раз
+        self.value = params.pop(self.parameter_name, None)
+        if self.value:
+            # ?author__id__exact=abc - как у встроенных фильтров: список откроется с ?e=1,
+            # а виджет не получит неверный pk
+            try:
+                self.value = self.field.target_field.to_python(self.value)
+            except ValidationError as e:
+                raise IncorrectLookupParameters(e)
+
+    @classmethod
+    def widget_for(cls, model, admin_site):
+        remote_field = model._meta.get_field(cls.field_name).remote_field
+        return AutocompleteSelect(remote_field, admin_site, attrs={'style': 'width: 100%'})
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.parameter_name]
+
+    def queryset(self, request, queryset):
+        if self.value:
+            try:
+                return queryset.filter(**{self.parameter_name: self.value})
+            except (ValueError, ValidationError) as e:
+                raise IncorrectLookupParameters(e)
+        return queryset
+
+    def choices(self, changelist):
+        self.base_query_string = changelist.get_query_string(remove=[self.parameter_name, PAGE_VAR])
+        yield {
+            'selected': not self.value,
+            'query_string': self.base_query_string,
+            'display': 'All',
+        }
+
+    @property
+    def widget_id(self):
+        return 'changelist-filter-%s' % self.field_name
+
+    def rendered_widget(self):
+        widget = self.widget_for(self.field.model, self.admin_site)
+        # ModelChoiceField передает виджету итератор по queryset, из которого
+        # виджет берет только выбранный объект
+        field = forms.ModelChoiceField(self.field.remote_field.model._default_manager.all(), widget=widget,
+                                       required=False)
+        return field.widget.render(self.parameter_name, self.value, attrs={'id': self.widget_id})
+
+
+class AuthorFilter(AutocompleteFilter):
+    field_name = 'author'
+
+
+class GenreFilter(AutocompleteFilter):
+    field_name = 'genre'
+
+
+class LimitedInlineFormSet(BaseInlineFormSet):
+    """
+    Inline formset that edits only the first ``limit`` related objects. The
+    template admin/catalog/change_form.html links to the full changelist.
+    """
+    limit = 20
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            # порядок по pk - чтобы GET и POST видели одни и те же строки
+            self._queryset = super().get_queryset().order_by('pk')[:self.limit]
+        return self._queryset
+
+    @cached_property
+    def total_count(self):
+        shown = len(self.get_queryset())
+        if shown < self.limit:
+            return shown
+        return self.queryset.count()
+
+    @property
+    def is_truncated(self):
+        return self.total_count > len(self.get_queryset())
+
+    @property
+    def changelist_url(self):
+        opts = self.model._meta
+        return '%s?%s__%s__exact=%s' % (reverse('admin:%s_%s_changelist' % (opts.app_label, opts.model_name)),
+                                        self.fk.name, self.fk.target_field.name, self.instance.pk)
+
+
+class CatalogModelAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # иначе на каждой странице списка еще один COUNT(*) по всей таблице
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        media = super().media
+        # виджеты фильтров рисуются в боковой панели - их js/css подключаются к странице
+        for list_filter in self.list_filter:
+            if isinstance(list_filter, type) and issubclass(list_filter, AutocompleteFilter):
+                media += list_filter.widget_for(self.model, self.admin_site).media
+        return media
 
 
 # чтобы в книгах можно было отображать реальные доступные копии
 class BooksInstanceInline(admin.TabularInline):
     model = BookInstance
+    formset = LimitedInlineFormSet
+    autocomplete_fields = ['borrower']
     # уберает не нужные инстансы, которые не относятся
     # extra конкретнойкниги
     extra = 0
@@ -13,33 +151,46 @@ class BooksInstanceInline(admin.TabularInline):
 # чтобы в авторах можно было отображать имеющиеся книги
 class BooksInline(admin.TabularInline):
     model = Book
+    formset = LimitedInlineFormSet
     exclude = ['summary']
+    autocomplete_fields = ['genre']
     # уберает не нужные инстансы, которые не относятся
     # extra конкретнойкниги
     extra = 0
 
 
 @admin.register(Author)
-class AuthorAdmin(admin.ModelAdmin):
+class AuthorAdmin(CatalogModelAdmin):
     list_display = ('last_name', 'first_name', 'date_of_birth', 'date_of_death')
     fields = ['first_name', 'last_name', ('date_of_birth', 'date_of_death')]
+    search_fields = ('last_name', 'first_name')
     inlines = [BooksInline]
 
 
 # декоратор делает тоже что и admin.site.register(BookAdmin)
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(CatalogModelAdmin):
     # можно передвать результаты работы методов, опредяляемых в модели
     # display_genre
     list_display = ('title', 'author', 'display_genre')
-    list_filter = ('author', )
+    list_select_related = ('author', )
+    list_filter = (AuthorFilter, GenreFilter)
+    search_fields = ('title', '=isbn')
+    autocomplete_fields = ['author', 'genre']
+    ordering = ('-id', )
     inlines = [BooksInstanceInline]
 
+    def get_queryset(self, request):
+        # display_genre берет self.genre.all()[:3] - из кэша prefetch, без запроса на строку
+        return super().get_queryset(request).prefetch_related('genre')
+
 
 @admin.register(BookInstance)
-class BookInstanceAdmin(admin.ModelAdmin):
+class BookInstanceAdmin(CatalogModelAdmin):
     list_display = ('book', 'status', 'borrower', 'due_back', 'id')
+    list_select_related = ('book', 'borrower')
     list_filter = ('status', 'due_back')
+    autocomplete_fields = ['book', 'borrower']
 
     fieldsets = (
         ('Main information', {
@@ -51,9 +202,25 @@ class BookInstanceAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(Genre)
+class GenreAdmin(CatalogModelAdmin):
+    search_fields = ('name', )
+    ordering = ('name', )
+
+
+# сводки команды process_overdue, только для просмотра
+@admin.register(OverdueReport)
+class OverdueReportAdmin(CatalogModelAdmin):
+    list_display = ('as_of', 'total_overdue', 'borrowers', 'oldest_due_back', 'report_file', 'created_at')
+    readonly_fields = ('as_of', 'total_overdue', 'borrowers', 'oldest_due_back', 'report_file', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+
 # Register your models here.
 # admin.site.register(Book)
 # admin.site.register(AuthorAdmin)
 # admin.site.register(Author)
-admin.site.register(Genre)
+# admin.site.register(Genre)
 # admin.site.register(BookInstance)
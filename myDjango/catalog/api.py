@@ -0,0 +1,221 @@
+from functools import wraps
+
+from django.db import connections, router
+from django.db.models import F
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from .models import Author, Book, Genre
+from .pagination import InvalidCursor, KeysetPaginator
+
+# Версия API входит в URL (/catalog/api/v1/...): несовместимые изменения формата
+# выпускаются как v2, а старые клиенты продолжают работать с v1.
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+# сколько книг автора вкладывается в ответ (?include=books), первые по названию
+EMBEDDED_BOOKS_LIMIT = 20
+# компактный JSON без пробелов - ответы заметно меньше для мобильных клиентов
+JSON_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+class ApiError(Exception):
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _embed_author(rows):
+    authors = {row['author_id'] for row in rows if row['author_id'] is not None}
+    found = {author['id']: author for author in Author.objects.filter(pk__in=authors)
+             .values('id', 'first_name', 'last_name')}
+    for row in rows:
+        row['author'] = found.get(row['author_id'])
+
+
+def _embed_genres(rows):
+    # один запрос к промежуточной таблице вместе с названиями жанров
+    genres = {row['id']: [] for row in rows}
+    for book_id, genre_id, name in (Book.genre.through.objects.filter(book_id__in=genres)
+                                    .order_by('genre__name').values_list('book_id', 'genre_id', 'genre__name')):
+        genres[book_id].append({'id': genre_id, 'name': name})
+    for row in rows:
+        row['genres'] = genres[row['id']]
+
+
+def _embed_books(rows):
+    # ROW_NUMBER() по каждому автору: даже у автора с тысячами книг в ответ
+    # попадают только первые EMBEDDED_BOOKS_LIMIT, а books_count (COUNT(*) в том же
+    # окне) показывает клиенту, сколько их всего
+    books = {row['id']: [] for row in rows}
+    counts = dict.fromkeys(books, 0)
+    if books:
+        sql = ('SELECT id, title, isbn, author_id, total FROM ('
+               ' SELECT id, title, isbn, author_id,'
+               ' ROW_NUMBER() OVER (PARTITION BY author_id ORDER BY title, id) AS position,'
+               ' COUNT(*) OVER (PARTITION BY author_id) AS total'
+               ' FROM {book} WHERE author_id IN ({authors})'
+               ') t WHERE position <= %s ORDER BY author_id, position'
+               ).format(book=Book._meta.db_table, authors=', '.join(['%s'] * len(books)))
+        with connections[router.db_for_read(Book)].cursor() as cursor:
+            cursor.execute(sql, list(books) + [EMBEDDED_BOOKS_LIMIT])
+            for pk, title, isbn, author_id, total in cursor.fetchall():
+                books[author_id].append({'id': pk, 'title': title, 'isbn': isbn})
+                counts[author_id] = total
+    for row in rows:
+        row['books'] = books[row['id']]
+        row['books_count'] = counts[row['id']]
+
+
+class Resource:
+    """
+    Description of one API collection: the queryset, the fields a client may ask
+    for (?fields=...), the fields returned by default, the keyset ordering and the
+    related objects that can be embedded (?include=...), each with one extra query
+    per page. ``requires`` are the fields an embed needs in the rows, ``provides``
+    the output keys an embed adds (by default just its name).
+    """
+
+    def __init__(self, queryset, fields, default_fields, ordering=('id', ), includes=None, requires=None,
+                 provides=None):
+        self.queryset = queryset
+        self.fields = fields
+        self.default_fields = default_fields
+        self.ordering = ordering
+        self.includes = includes or {}
+        self.requires = requires or {}
+        self.provides = provides or {}
+
+    def _choose(self, value, allowed, default, what):
+        if not value:
+            return list(default)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ApiError('Unknown %s: %s' % (what, ', '.join(unknown)))
+        return names
+
+    def rows(self, request, queryset):
+        """
+        Returns the values() queryset with the requested fields, the names of the
+        output keys and the requested embeds.
+        """
+        fields = self._choose(request.GET.get('fields'), self.fields, self.default_fields, 'fields')
+        includes = self._choose(request.GET.get('include'), self.includes, (), 'include')
+        fields = ['id'] + [name for name in fields if name != 'id']
+        # поля для курсора и вложений читаются всегда, но отдаются только запрошенные
+        needed = {name.lstrip('-') for name in self.ordering}
+        for include in includes:
+            needed.update(self.requires.get(include, ()))
+        columns = fields + sorted(needed - set(fields))
+        output = fields + [key for include in includes for key in self.provides.get(include, (include, ))]
+        return queryset.values(*columns), output, includes
+
+    def serialize(self, rows, output, includes):
+        for include in includes:
+            self.includes[include](rows)
+        return [{name: row[name] for name in output} for row in rows]
+
+
+RESOURCES = {
+    'books': Resource(
+        lambda: Book.objects.all(),
+        fields=('id', 'title', 'summary', 'isbn', 'author_id', 'last_modified'),
+        default_fields=('id', 'title', 'isbn', 'author_id'),
+        includes={'author': _embed_author, 'genres': _embed_genres},
+        requires={'author': ('author_id', )}),
+    'authors': Resource(
+        lambda: Author.objects.all(),
+        fields=('id', 'first_name', 'last_name', 'date_of_birth', 'date_of_death', 'last_modified'),
+        default_fields=('id', 'first_name', 'last_name'),
+        ordering=('last_name', 'id'),
+        includes={'books': _embed_books},
+        provides={'books': ('books', 'books_count')}),
+    'genres': Resource(
+        lambda: Genre.objects.all(),
+        fields=('id', 'name'),
+        default_fields=('id', 'name'),
+        ordering=('name', 'id')),
+    # доступность экземпляров по книгам: счетчики хранятся в самой книге (Book.*_copies)
+    'availability': Resource(
+        lambda: Book.objects.annotate(
+            total=F('total_copies'), available=F('available_copies'), on_loan=F('on_loan_copies')),
+        fields=('id', 'total', 'available', 'on_loan'),
+        default_fields=('id', 'total', 'available', 'on_loan')),
+}
+
+
+def _api_view(view):
+    """
+    Read-only JSON endpoint: GET/HEAD only, JSON errors, 401 instead of a redirect
+    to the login page for anonymous clients.
+    """
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401, json_dumps_params=JSON_PARAMS)
+        try:
+            data = view(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': e.message}, status=e.status, json_dumps_params=JSON_PARAMS)
+        return JsonResponse(data, json_dumps_params=JSON_PARAMS)
+    return wrapper
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit must be an integer')
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def _ids(value):
+    try:
+        return [int(pk) for pk in value.split(',') if pk.strip()]
+    except ValueError:
+        raise ApiError('ids must be integers')
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri('?' + params.urlencode())
+
+
+@_api_view
+def collection(request, resource):
+    """
+    One page of a collection: {"results": [...], "next": url, "previous": url}.
+    ?ids=1,2,3 restricts the collection to the given ids.
+    """
+    resource = RESOURCES[resource]
+    queryset = resource.queryset()
+    if request.GET.get('ids'):
+        queryset = queryset.filter(pk__in=_ids(request.GET['ids']))
+    values, output, includes = resource.rows(request, queryset)
+
+    paginator = KeysetPaginator(values, _limit(request), resource.ordering)
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise ApiError('Invalid cursor')
+    return {
+        'results': resource.serialize(list(page.object_list), output, includes),
+        'next': _page_url(request, page.next_cursor),
+        'previous': _page_url(request, page.previous_cursor),
+    }
+
+
+@_api_view
+def detail(request, resource, pk):
+    resource = RESOURCES[resource]
+    values, output, includes = resource.rows(request, resource.queryset().filter(pk=pk))
+    rows = list(values)
+    if not rows:
+        raise ApiError('Not found', status=404)
+    return resource.serialize(rows, output, includes)[0]
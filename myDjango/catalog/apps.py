@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CatalogConfig(AppConfig):
     name = 'catalog'
+
+    def ready(self):
+        # подключаем обработчики сигналов (счетчики каталога и т.д.)
+        from . import signals  # noqa: F401
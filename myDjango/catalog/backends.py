@@ -0,0 +1,16 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .permissions import get_snapshot
+
+
+class SnapshotModelBackend(ModelBackend):
+    """
+    ModelBackend that answers permission checks (user.has_perm, PermissionRequiredMixin,
+    {{ perms }} in templates) from the cached PermissionSnapshot instead of querying
+    the user and group permission tables on every request.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return set(get_snapshot(user_obj).permissions)
@@ -0,0 +1,334 @@
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection, models, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import urls as catalog_urls
+from .models import Author, Book, BookInstance, Genre
+from .uuids import uuid7
+
+BENCHMARK_USER = 'benchmark'
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _url_arguments():
+    """
+    Arguments for every named catalog URL that takes some. A URL that is missing
+    here is reported as an error in the results instead of being skipped silently.
+    """
+    book = Book.objects.order_by('pk').values_list('pk', flat=True).first()
+    author = Author.objects.order_by('pk').values_list('pk', flat=True).first()
+    # самый "тяжелый" автор и книга - с наибольшим числом книг и экземпляров
+    busy_author = (Book.objects.exclude(author=None).values('author').order_by()
+                   .annotate(n=Count('pk')).order_by('-n').values_list('author', flat=True).first())
+    busy_book = (BookInstance.objects.exclude(book=None).values('book').order_by()
+                 .annotate(n=Count('pk')).order_by('-n').values_list('book', flat=True).first())
+    loan = BookInstance.objects.on_loan().values_list('pk', flat=True).first()
+    return {
+        'book-detail': [(pk, ) for pk in dict.fromkeys([book, busy_book]) if pk],
+        'author-detail': [(pk, ) for pk in dict.fromkeys([author, busy_author]) if pk],
+        'book_update': [(book, )] if book else [],
+        'book_delete': [(book, )] if book else [],
+        'author_update': [(author, )] if author else [],
+        'author_delete': [(author, )] if author else [],
+        'renew-book-librarian': [(loan, )] if loan else [],
+        'export': [(kind, 'csv') for kind in ('books', 'authors', 'loans')],
+        'api-collection': [(resource, ) for resource in ('books', 'authors', 'genres', 'availability')],
+        'api-detail': [(kind, pk) for kind, pk in (('books', book), ('authors', author)) if pk],
+    }
+
+
+# адреса, которые меняют данные (только POST) - GET-запросами их не измерить
+WRITE_ONLY = {'book-checkout', 'return-copy', 'renew-books-bulk', 'api-renew-loans'}
+
+# запросы с параметрами, которые тоже стоит мерить (поиск, глубокие страницы)
+EXTRA_QUERIES = {
+    'search': ['?q=war', '?q=war+peace'],
+    'books': ['', '?count=1', '?available=1'],
+}
+
+
+def catalog_targets(arguments):
+    """
+    Yields (name, url) for every named pattern of catalog/urls.py.
+    """
+    for pattern in catalog_urls.urlpatterns:
+        name = pattern.name
+        if not name:
+            continue
+        if name in WRITE_ONLY:
+            yield name, None
+        elif pattern.pattern.regex.groups == 0:
+            for query in EXTRA_QUERIES.get(name, ['']):
+                yield name, reverse(name) + query
+        elif name not in arguments:
+            yield name, None
+        else:
+            for args in arguments[name]:
+                yield name, reverse(name, args=args)
+
+
+def admin_urls():
+    for model in admin.site._registry:
+        yield ('admin:%s_%s_changelist' % (model._meta.app_label, model._meta.model_name),
+               reverse('admin:%s_%s_changelist' % (model._meta.app_label, model._meta.model_name)))
+
+
+def percentile(values, percent):
+    # ближайший ранг: значение, не меньше которого ``percent`` процентов замеров
+    ordered = sorted(values)
+    rank = max(int(round(percent / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+@contextmanager
+def _benchmark_user(username=None):
+    # существующий пользователь или временный суперпользователь, который удаляется после замера
+    if username:
+        yield User.objects.get(username=username)
+        return
+    user = User(username='%s-%s' % (BENCHMARK_USER, uuid.uuid4().hex[:12]), is_staff=True, is_superuser=True)
+    user.set_unusable_password()
+    user.save()
+    try:
+        yield user
+    finally:
+        user.delete()
+
+
+def measure(client, url, requests, warmup=1):
+    """
+    Requests ``url`` warmup + requests times and returns the timings in
+    milliseconds, the query counts and the last status code.
+    """
+    timings, queries, status = [], [], None
+    for number in range(warmup + requests):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url)
+            # потоковые ответы (выгрузки) читаются целиком, иначе время не учитывает их
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            elapsed = (time.perf_counter() - start) * 1000
+        status = response.status_code
+        if number >= warmup:
+            timings.append(elapsed)
+            queries.append(len(captured))
+    return timings, queries, status
+
+
+def run_benchmark(requests=20, warmup=1, include_admin=True, label='', username=None):
+    """
+    Measures every catalog URL and admin changelist and returns a
+    JSON-serializable dict with latency percentiles and query counts.
+    Requests are made as the existing user ``username`` or, by default, as a
+    temporary superuser that is deleted after the run.
+    Raises User.DoesNotExist for an unknown ``username``.
+    """
+    # ALLOWED_HOSTS обычно не содержит 'testserver' тестового клиента
+    hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+    client = Client(SERVER_NAME=hosts[0] if hosts else 'localhost')
+
+    targets = list(catalog_targets(_url_arguments()))
+    if include_admin:
+        targets += list(admin_urls())
+
+    results = []
+    with _benchmark_user(username) as user:
+        client.force_login(user)
+        for name, url in targets:
+            if name in WRITE_ONLY:
+                results.append({'name': name, 'url': None, 'skipped': 'changes data (POST only)'})
+                continue
+            if url is None:
+                results.append({'name': name, 'url': None, 'error': 'no benchmark arguments for this URL'})
+                continue
+            timings, queries, status = measure(client, url, requests, warmup)
+            result = {'name': name, 'url': url, 'status': status, 'requests': len(timings),
+                      'mean_ms': round(sum(timings) / len(timings), 3), 'max_ms': round(max(timings), 3),
+                      'queries_min': min(queries), 'queries_max': max(queries)}
+            for percent in PERCENTILES:
+                result['p%s_ms' % percent] = round(percentile(timings, percent), 3)
+            results.append(result)
+        # сессия в базе не должна пережить пользователя
+        client.logout()
+
+    return {
+        'label': label,
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'database': connection.vendor,
+        'volumes': {'authors': Author.objects.count(), 'books': Book.objects.count(),
+                    'instances': BookInstance.objects.count(), 'genres': Genre.objects.count()},
+        'requests_per_url': requests,
+        'results': results,
+    }
+
+
+def write_results(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+# ----- ключи uuid4 и uuid7 -----
+
+KEY_GENERATORS = {4: uuid.uuid4, 7: uuid7}
+
+
+def _index_size(cursor, table):
+    """
+    Size of the primary key index of ``table`` in bytes (None if the database
+    cannot tell).
+    """
+    if connection.vendor == 'postgresql':
+        cursor.execute("SELECT pg_relation_size(%s)", ['%s_pkey' % table])
+        return cursor.fetchone()[0]
+    if connection.vendor == 'sqlite':
+        try:
+            # dbstat есть не во всех сборках SQLite
+            cursor.execute("SELECT SUM(pgsize) FROM dbstat('temp') WHERE name = %s",
+                           ['sqlite_autoindex_%s_1' % table])
+        except Exception:
+            return None
+        return cursor.fetchone()[0]
+    return None
+
+
+def benchmark_uuid_keys(rows=1000000, batch_size=10000, versions=(4, 7)):
+    """
+    Inserts ``rows`` rows keyed by UUIDs of each version into a temporary table
+    shaped like the primary key of BookInstance and returns the insert time,
+    the throughput and the size of the primary key index per version.
+    """
+    field = models.UUIDField()
+    column = field.db_type(connection)
+    results = {}
+    for version in versions:
+        generate = KEY_GENERATORS[version]
+        table = 'catalog_uuid_bench_v%s' % version
+        elapsed = 0.0
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS %s' % table)
+            cursor.execute('CREATE TEMPORARY TABLE %s (id %s NOT NULL PRIMARY KEY, imprint varchar(200) NOT NULL)'
+                           % (table, column))
+            for start in range(0, rows, batch_size):
+                batch = [(field.get_db_prep_value(generate(), connection), 'Imprint')
+                         for _ in range(min(batch_size, rows - start))]
+                # время генерации ключей не входит в замер - только вставка
+                begin = time.perf_counter()
+                with transaction.atomic():
+                    cursor.executemany('INSERT INTO %s (id, imprint) VALUES (%%s, %%s)' % table, batch)
+                elapsed += time.perf_counter() - begin
+            size = _index_size(cursor, table)
+            cursor.execute('DROP TABLE %s' % table)
+        results['v%s' % version] = {'rows': rows, 'seconds': round(elapsed, 3),
+                                    'rows_per_second': round(rows / elapsed) if elapsed else None,
+                                    'index_bytes': size}
+    return {
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'database': connection.vendor,
+        'batch_size': batch_size,
+        'results': results,
+    }
+
+
+# ----- холодный старт воркера -----
+
+# Выполняется в отдельном процессе: импорт точки входа (django.setup, приложения,
+# прогрев, если он включен), подключения воркера и первые запросы прямо через WSGI application
+STARTUP_PROBE = '''
+import io, json, sys, time
+started = time.perf_counter()
+import importlib
+module = importlib.import_module(sys.argv[1])
+from catalog import warmup
+# то же, что хук post_worker_init в gunicorn.conf.py
+warmup.post_worker_init(None)
+imported = time.perf_counter()
+
+def request(url):
+    path, _, query = url.partition('?')
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+               'SERVER_NAME': sys.argv[2], 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+               'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+               'wsgi.multithread': False, 'wsgi.multiprocess': True, 'wsgi.run_once': False}
+    status = []
+    begin = time.perf_counter()
+    body = module.application(environ, lambda code, headers, exc_info=None: status.append(code))
+    for _ in body:
+        pass
+    body.close()
+    return (time.perf_counter() - begin) * 1000, int(status[0].split()[0])
+
+requests = []
+for url in sys.argv[3:]:
+    first_ms, status = request(url)
+    second_ms, _ = request(url)
+    requests.append({'url': url, 'status': status, 'first_ms': first_ms, 'second_ms': second_ms})
+report = warmup.last_report or {}
+print(json.dumps({'import_ms': (imported - started) * 1000, 'warmup_ms': report.get('total_ms'),
+                  'requests': requests}))
+'''
+
+STARTUP_URLS = ('/accounts/login/', '/catalog/books/')
+
+
+def _median(values):
+    values = [value for value in values if value is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def startup_probe(urls, warm, entry='myDjango.wsgi'):
+    """
+    Starts a fresh interpreter that imports ``entry`` with or without the
+    warm-up and requests ``urls`` twice; returns its timings.
+    """
+    hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+    env = dict(os.environ, WORKER_WARMUP='1' if warm else '0')
+    begin = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', STARTUP_PROBE, entry, hosts[0] if hosts else 'localhost']
+                            + list(urls), env=env, cwd=settings.BASE_DIR, stdout=subprocess.PIPE, check=True)
+    result = json.loads(output.stdout.decode().strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - begin) * 1000
+    return result
+
+
+def benchmark_startup(urls=STARTUP_URLS, rounds=5, entry='myDjango.wsgi'):
+    """
+    Compares cold workers with warmed-up ones: median import time of the
+    entry point, warm-up time and first/second request latency per URL over
+    ``rounds`` fresh processes each.
+    """
+    results = {}
+    for mode, warm in (('cold', False), ('warm', True)):
+        probes = [startup_probe(urls, warm, entry) for _ in range(rounds)]
+        results[mode] = {
+            'import_ms': _median(probe['import_ms'] for probe in probes),
+            'warmup_ms': _median(probe['warmup_ms'] for probe in probes),
+            'process_ms': _median(probe['process_ms'] for probe in probes),
+            'requests': [{'url': url, 'status': probes[-1]['requests'][position]['status'],
+                          'first_ms': _median(probe['requests'][position]['first_ms'] for probe in probes),
+                          'second_ms': _median(probe['requests'][position]['second_ms'] for probe in probes)}
+                         for position, url in enumerate(urls)],
+        }
+    return {
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'database': connection.vendor,
+        'entry': entry,
+        'rounds': rounds,
+        'results': results,
+    }
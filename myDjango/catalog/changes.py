@@ -0,0 +1,154 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Author, Book, BookInstance, CatalogStats
+from .stats import STATS_PK, bump_stats, get_stats
+
+# Изменение экземпляра "поднимает" время изменения и версию его книги, изменение
+# книги - время изменения и версию ее автора (вызывается из catalog/signals.py).
+# По времени страницы отвечают на If-None-Match / If-Modified-Since
+# (catalog/conditional.py), по версии строятся ключи кэша фрагментов шаблонов:
+# после изменения старый фрагмент просто перестает читаться.
+
+
+def _ids(ids):
+    return {pk for pk in ids if pk is not None}
+
+
+def touch_books(book_ids, **deltas):
+    """
+    Marks the given books as modified now and bumps their versions with one UPDATE
+    (signals are not sent). ``deltas`` are added to the copy counters in the same
+    UPDATE, e.g. touch_books([pk], **copy_deltas(new='o', old='a')).
+
+    After a change of book copies that bypasses BookInstance.save()/delete(),
+    e.g. queryset.update() or bulk_create(), call rebuild_copy_counters() instead.
+    """
+    book_ids = _ids(book_ids)
+    counters = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if book_ids:
+        Book.objects.filter(pk__in=book_ids).update(last_modified=timezone.now(), version=F('version') + 1,
+                                                    **counters)
+
+
+def copy_counts(status):
+    # вклад одного экземпляра со статусом ``status`` в счетчики книги (None - экземпляра нет)
+    if status is None:
+        return {'total_copies': 0, 'available_copies': 0, 'on_loan_copies': 0}
+    return {'total_copies': 1, 'available_copies': int(status == 'a'), 'on_loan_copies': int(status == 'o')}
+
+
+def copy_deltas(new=None, old=None):
+    """
+    Changes of the copy counters of a book when one of its copies goes from status
+    ``old`` to ``new``; None means the copy is not (or no longer) of this book.
+    """
+    new, old = copy_counts(new), copy_counts(old)
+    return {name: new[name] - old[name] for name in new}
+
+
+def copy_changed(book_id, new=None, old=None):
+    """
+    Updates the counters of the book and of the catalog after one of the book's
+    copies went from status ``old`` to ``new`` (None: the copy did not exist
+    or no longer belongs to the book). Locks the book row before the stats
+    shard of the book - every writer takes them in this order, so they cannot
+    deadlock.
+    """
+    deltas = copy_deltas(new=new, old=old)
+    touch_books([book_id], **deltas)
+    bump_stats(shard_key=book_id, num_instances=deltas['total_copies'],
+               num_instances_available=deltas['available_copies'])
+
+
+def _copies(**filters):
+    return Coalesce(Subquery(BookInstance.objects.filter(book=OuterRef('pk'), **filters).order_by()
+                             .values('book').annotate(count=Count('pk')).values('count')), Value(0))
+
+
+def rebuild_copy_counters(book_ids=None, batch_size=10000):
+    """
+    Recomputes the copy counters of the given books (of all books by default)
+    in batches of ``batch_size`` books and returns the number of books whose
+    counters were wrong. Only those are updated and touched.
+    """
+    books = Book.objects.all() if book_ids is None else Book.objects.filter(pk__in=_ids(book_ids))
+    fixed, last = 0, None
+    while True:
+        batch = books.order_by('pk') if last is None else books.filter(pk__gt=last).order_by('pk')
+        ids = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return fixed
+        last = ids[-1]
+        counts = {'total_copies': _copies(), 'available_copies': _copies(status='a'),
+                  'on_loan_copies': _copies(status='o')}
+        stale = (Book.objects.filter(pk__in=ids)
+                 .annotate(**{'actual_%s' % name: count for name, count in counts.items()})
+                 .exclude(**{name: F('actual_%s' % name) for name in counts}))
+        fixed += Book.objects.filter(pk__in=stale.values('pk')).update(
+            last_modified=timezone.now(), version=F('version') + 1, **counts)
+
+
+def touch_authors(author_ids):
+    author_ids = _ids(author_ids)
+    if author_ids:
+        Author.objects.filter(pk__in=author_ids).update(last_modified=timezone.now(), version=F('version') + 1)
+
+
+def catalog_stamps():
+    """
+    Returns (books_modified, authors_modified, num_books, num_authors) with a single
+    query. Deleting a row does not move the MAX(last_modified) of its table, but it
+    changes the counters, so together they change on every change of the lists.
+    """
+    # ORDER BY last_modified DESC LIMIT 1 читает один конец индекса по last_modified
+    stamps = (CatalogStats.objects.filter(pk=STATS_PK)
+              .annotate(books_modified=Subquery(Book.objects.order_by('-last_modified')
+                                                .values('last_modified')[:1]),
+                        authors_modified=Subquery(Author.objects.order_by('-last_modified')
+                                                  .values('last_modified')[:1]))
+              .values_list('books_modified', 'authors_modified', 'num_books', 'num_authors').first())
+    if stamps is None:
+        get_stats()
+        return catalog_stamps()
+    return stamps
+
+
+# Версия содержимого каталога: книги, их жанры и авторы, названия жанров, имена
+# авторов - но не экземпляры. Выдачи и возвраты двигают last_modified книг, а эту
+# версию нет, поэтому кэш, который не зависит от экземпляров (количества книг по
+# жанрам и авторам, catalog/facets.py), переживает поток выдач.
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def catalog_version():
+    """
+    Returns the current catalog content version (read from the cache, no
+    database queries). Copy status changes do not move it.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # версия не должна истекать раньше того, что под ней закэшировано
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def _set_catalog_version():
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def bump_catalog_version():
+    """
+    Moves the catalog content version after an edit of a book, a genre or an
+    author (called from catalog/signals.py).
+    """
+    # сразу - чтобы текущий процесс не читал старые значения,
+    # после коммита - чтобы другой воркер не закэшировал незакоммиченные данные
+    _set_catalog_version()
+    transaction.on_commit(_set_catalog_version)
@@ -0,0 +1,43 @@
+import hashlib
+from datetime import datetime
+
+from django.views.decorators.http import condition
+
+from .permissions import snapshot_version
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match / If-Modified-Since with 304 Not Modified before the
+    object or the page is loaded and rendered.
+
+    Views implement get_modification_stamps(): one cheap query returning a tuple of
+    values (timestamps, counters) that changes whenever the page content does, or
+    None if the object does not exist. The ETag also covers the user and the
+    version of their permissions, because the sidebar depends on them.
+    """
+
+    def get_modification_stamps(self):
+        raise NotImplementedError
+
+    def _modification_stamps(self):
+        # etag_func и last_modified_func вызываются по очереди - запрос к базе один
+        if not hasattr(self, '_stamps'):
+            self._stamps = self.get_modification_stamps()
+        return self._stamps
+
+    def get_etag(self):
+        stamps = self._modification_stamps()
+        if stamps is None:
+            return None
+        key = repr((self.request.get_full_path(), stamps, snapshot_version(self.request.user)))
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def get_last_modified(self):
+        stamps = self._modification_stamps() or ()
+        return max((stamp for stamp in stamps if isinstance(stamp, datetime)), default=None)
+
+    def dispatch(self, request, *args, **kwargs):
+        conditional = condition(etag_func=lambda request, *args, **kwargs: self.get_etag(),
+                                last_modified_func=lambda request, *args, **kwargs: self.get_last_modified())
+        return conditional(super().dispatch)(request, *args, **kwargs)
@@ -0,0 +1,51 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Author, Book, BookInstance
+
+# Сколько строк забирается из серверного курсора за раз
+CHUNK_SIZE = 2000
+
+# имя выгрузки -> (функция, возвращающая queryset, поля для values())
+EXPORTS = {
+    'books': (lambda: Book.objects.order_by('id'),
+              ('id', 'title', 'isbn', 'summary', 'author_id', 'author__last_name', 'author__first_name')),
+    'authors': (lambda: Author.objects.order_by('id'),
+                ('id', 'last_name', 'first_name', 'date_of_birth', 'date_of_death')),
+    'loans': (lambda: BookInstance.objects.filter(status__exact='o').order_by('due_back', 'id'),
+              ('id', 'book_id', 'book__title', 'book__isbn', 'imprint', 'due_back', 'borrower__username')),
+}
+
+
+class Echo:
+    """
+    File-like object for csv.writer that returns the written line instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(kind):
+    """
+    Yields values() dicts of the export through a server-side cursor, so neither
+    model instances nor the whole result set are ever held in memory.
+    """
+    queryset, fields = EXPORTS[kind]
+    return fields, queryset().values(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def stream_csv(kind):
+    fields, rows = export_rows(kind)
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row[field] for field in fields])
+
+
+def stream_jsonl(kind):
+    _, rows = export_rows(kind)
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + '\n'
@@ -0,0 +1,144 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db import connections, router
+
+from .changes import catalog_version
+from .models import Author, Book, Genre
+
+# Фасеты списка книг: жанр, автор, доступность - с количеством книг у каждого
+# значения. Все количества считаются одним запросом: три GROUP BY (жанры - по
+# промежуточной таблице Book.genre), склеенные через UNION ALL. Количества
+# одного фасета учитывают остальные выбранные фильтры, но не свой, чтобы можно
+# было переключиться на другое значение. GROUPING SETS сделал бы то же за один
+# проход, но их нет в SQLite.
+#
+# Количества каждого фасета кэшируются отдельно. Доступность зависит от экземпляров,
+# поэтому ее ключ - отметки каталога (catalog_stamps(), та же выборка, что и для
+# ETag списка), их двигает каждая выдача и возврат. Количества по жанрам и авторам
+# от экземпляров не зависят (если не выбран фильтр доступности), и их ключ -
+# версия каталога (changes.catalog_version(), ее двигают только правки книг, жанров
+# и авторов) и счетчики книг и авторов (их меняет и пересчет после массовой загрузки
+# мимо сигналов). Поток выдач не заставляет пересчитывать их заново.
+FACETS_TIMEOUT = 10 * 60
+FACETS_KEY = 'catalog:facets:%s'
+# сколько самых частых значений показывать (выбранное значение показывается всегда)
+FACET_LIMIT = 10
+FILTERS = ('genre', 'author', 'available')
+
+
+class FacetValue:
+
+    def __init__(self, pk, label, count, selected):
+        self.pk = pk
+        self.label = label
+        self.count = count
+        self.selected = selected
+
+
+def _where(filters, skip):
+    # условия выбранных фильтров, кроме фильтра самого фасета ``skip``
+    conditions, params = [], []
+    if filters.get('genre') and skip != 'genre':
+        conditions.append('b.id IN (SELECT bg2.book_id FROM {through} bg2 WHERE bg2.genre_id = %s)')
+        params.append(filters['genre'])
+    if filters.get('author') and skip != 'author':
+        conditions.append('b.author_id = %s')
+        params.append(filters['author'])
+    if filters.get('available') and skip != 'available':
+        # частичный индекс book_available_idx
+        conditions.append('b.available_copies > 0')
+    return ''.join(' AND ' + condition for condition in conditions), params
+
+
+def _selected_first(column, value):
+    # выбранное значение попадает в LIMIT, даже если оно не из самых частых
+    if value:
+        return '(%s = %%s) DESC, ' % column, [value]
+    return '', []
+
+
+def facet_counts(filters, kinds=FILTERS):
+    """
+    Returns {'genre': [(pk, name, count)], 'author': [(pk, last_name,
+    first_name, count)], 'available': count} for the books matching
+    ``filters`` with a single query. Only the facets in ``kinds`` are counted.
+    """
+    parts, params = [], []
+    if 'genre' in kinds:
+        genre_where, genre_params = _where(filters, 'genre')
+        genre_order, genre_order_params = _selected_first('bg.genre_id', filters.get('genre'))
+        parts.append(
+            "SELECT 'genre', t.genre_id, g.name, NULL, t.n FROM ("
+            " SELECT bg.genre_id, COUNT(*) AS n FROM {through} bg INNER JOIN {book} b ON b.id = bg.book_id"
+            " WHERE 1 = 1" + genre_where +
+            " GROUP BY bg.genre_id ORDER BY " + genre_order + "n DESC, bg.genre_id LIMIT %s"
+            ") t INNER JOIN {genre} g ON g.id = t.genre_id")
+        params += genre_params + genre_order_params + [FACET_LIMIT]
+    if 'author' in kinds:
+        author_where, author_params = _where(filters, 'author')
+        author_order, author_order_params = _selected_first('b.author_id', filters.get('author'))
+        parts.append(
+            "SELECT 'author', t.author_id, a.last_name, a.first_name, t.n FROM ("
+            " SELECT b.author_id, COUNT(*) AS n FROM {book} b"
+            " WHERE b.author_id IS NOT NULL" + author_where +
+            " GROUP BY b.author_id ORDER BY " + author_order + "n DESC, b.author_id LIMIT %s"
+            ") t INNER JOIN {author} a ON a.id = t.author_id")
+        params += author_params + author_order_params + [FACET_LIMIT]
+    if 'available' in kinds:
+        available_where, available_params = _where(filters, 'available')
+        parts.append(
+            "SELECT 'available', NULL, NULL, NULL, COUNT(*) FROM {book} b"
+            " WHERE b.available_copies > 0" + available_where)
+        params += available_params
+    sql = ' UNION ALL '.join(parts).format(
+        through=Book.genre.through._meta.db_table, book=Book._meta.db_table,
+        genre=Genre._meta.db_table, author=Author._meta.db_table)
+
+    counts = {kind: [] for kind in kinds if kind != 'available'}
+    if 'available' in kinds:
+        counts['available'] = 0
+    # чтение - как у запросов ORM, с реплики (catalog/routers.py)
+    with connections[router.db_for_read(Book)].cursor() as cursor:
+        cursor.execute(sql, params)
+        for kind, pk, label, extra, count in cursor.fetchall():
+            if kind == 'genre':
+                counts['genre'].append((pk, label, count))
+            elif kind == 'author':
+                counts['author'].append((pk, label, extra, count))
+            else:
+                counts['available'] = count
+    return counts
+
+
+def _facet_key(kind, filters, stamps):
+    key = repr((kind, [filters.get(name) for name in FILTERS], stamps))
+    return FACETS_KEY % hashlib.md5(key.encode()).hexdigest()
+
+
+def book_facets(filters, stamps):
+    """
+    Facet values for the book list filtered by ``filters`` ({'genre': pk,
+    'author': pk, 'available': bool}). Counts that depend on copies are
+    cached per catalog ``stamps``, the others per catalog version.
+    """
+    # из отметок каталога не берется только время изменения книг - его двигают экземпляры
+    content_stamps = (catalog_version(), ) + tuple(stamps[1:])
+    keys = {kind: _facet_key(kind, filters, stamps if kind == 'available' or filters.get('available')
+                             else content_stamps)
+            for kind in FILTERS}
+    cached = cache.get_many(list(keys.values()))
+    counts = {kind: cached[key] for kind, key in keys.items() if key in cached}
+    missing = [kind for kind in FILTERS if kind not in counts]
+    if missing:
+        fresh = facet_counts(filters, missing)
+        cache.set_many({keys[kind]: fresh[kind] for kind in missing}, FACETS_TIMEOUT)
+        counts.update(fresh)
+    # LIMIT выбирал самые частые, а показываются они по убыванию количества
+    return {
+        'genre': [FacetValue(pk, name, count, pk == filters.get('genre'))
+                  for pk, name, count in sorted(counts['genre'], key=lambda row: (-row[2], row[1]))],
+        'author': [FacetValue(pk, '%s, %s' % (last_name, first_name), count, pk == filters.get('author'))
+                   for pk, last_name, first_name, count in sorted(counts['author'], key=lambda row: (-row[3], row[1]))],
+        'available': counts['available'],
+    }
@@ -3,7 +3,9 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 import datetime  # for checking renewal date range.
+import uuid
 
+from django.contrib.auth.models import User
 from django.forms import ModelForm
 from .models import BookInstance
 
@@ -36,6 +38,58 @@ class RenewBookForm(forms.Form):
         # print('data', data)
         return data
 
+class CopyIdsField(forms.Field):
+    """
+    List of book copy ids (UUIDs): repeated form values or a JSON list.
+    """
+    widget = forms.MultipleHiddenInput
+    default_error_messages = {
+        'invalid': _('Invalid copy id: %(value)s'),
+        'too_many': _('At most %(limit)s copies can be renewed at once'),
+    }
+
+    def __init__(self, max_count=500, **kwargs):
+        self.max_count = max_count
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        if not value:
+            return []
+        if isinstance(value, str):
+            value = [value]
+        # из JSON может прийти число или объект, а не список
+        if not isinstance(value, (list, tuple)):
+            raise ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+        ids = []
+        for item in value:
+            try:
+                ids.append(uuid.UUID(str(item)))
+            except ValueError:
+                raise ValidationError(self.error_messages['invalid'], code='invalid', params={'value': item})
+        if len(ids) > self.max_count:
+            raise ValidationError(self.error_messages['too_many'], code='too_many', params={'limit': self.max_count})
+        # повторы не нужны, порядок сохраняется для отчета
+        return list(dict.fromkeys(ids))
+
+
+# фильтры списка книг (catalog/facets.py); неверное значение просто не фильтрует
+class BookFilterForm(forms.Form):
+    # верхняя граница - integer первичных ключей; большее число уронило бы запрос
+    genre = forms.IntegerField(required=False, min_value=1, max_value=2 ** 31 - 1)
+    author = forms.IntegerField(required=False, min_value=1, max_value=2 ** 31 - 1)
+    available = forms.BooleanField(required=False)
+
+    def filters(self):
+        self.is_valid()
+        return {name: self.cleaned_data.get(name) for name in ('genre', 'author', 'available')}
+
+
+# продление сразу нескольких экземпляров: дата проверяется по тем же правилам,
+# что и в RenewBookForm (метод clean_renewal_date наследуется)
+class BulkRenewForm(RenewBookForm):
+    copies = CopyIdsField()
+
+
 # создание формы на основе уже существующей модели
 # это намного легче на мой взгляд
 # этот класс явялется эквивалентом RenewBookForm, только он на основе модели
@@ -65,3 +119,20 @@ class RenewBookModelForm(ModelForm):
         # атребут = {поле: значене}
         labels = {'due_back': _('Renewal date custom'), }
         help_texts = {'due_back': _('Enter a date between now and 4 weeks (default 3).'), }
+
+
+# выдача экземпляра через catalog/services.py: кому и до какого числа
+# (если дата не указана - на LOAN_PERIOD от сегодняшнего дня)
+class CheckoutForm(forms.Form):
+    borrower = forms.ModelChoiceField(queryset=User.objects.filter(is_active=True), to_field_name='username')
+    due_back = forms.DateField(required=False)
+
+    def clean_due_back(self):
+        data = self.cleaned_data['due_back']
+        if data is None:
+            return data
+        if data < datetime.date.today():
+            raise ValidationError(_('Invalid date - due back in past'))
+        if data > datetime.date.today() + datetime.timedelta(weeks=4):
+            raise ValidationError(_('Invalid date - due back more than 4 weeks ahead'))
+        return data
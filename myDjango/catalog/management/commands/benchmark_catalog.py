@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.benchmark import run_benchmark, write_results
+
+
+class Command(BaseCommand):
+    help = ('Measures latency percentiles and query counts of every catalog URL and admin changelist '
+            'and writes them to a JSON file (fill the database with generate_catalog first).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Measured requests per URL')
+        parser.add_argument('--warmup', type=int, default=1, help='Unmeasured requests per URL')
+        parser.add_argument('--no-admin', action='store_true', help='Skip the admin changelists')
+        parser.add_argument('--user', metavar='USERNAME',
+                            help='Existing user to measure as (default: a temporary superuser)')
+        parser.add_argument('--label', default='', help='Free-form name of the run (commit, settings...)')
+        parser.add_argument('--output', metavar='PATH', default='benchmark.json')
+
+    def handle(self, *args, **options):
+        try:
+            data = run_benchmark(requests=options['requests'], warmup=options['warmup'],
+                                 include_admin=not options['no_admin'], label=options['label'],
+                                 username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError('User "%s" does not exist' % options['user'])
+        write_results(data, options['output'])
+        for result in data['results']:
+            if 'error' in result:
+                self.stdout.write(self.style.WARNING('%-40s %s' % (result['name'], result['error'])))
+            elif 'skipped' in result:
+                self.stdout.write('%-40s skipped: %s' % (result['name'], result['skipped']))
+            else:
+                self.stdout.write('%-40s %3s  p50 %8.1f ms  p95 %8.1f ms  %s queries' % (
+                    result['url'], result['status'], result['p50_ms'], result['p95_ms'], result['queries_max']))
+        self.stdout.write(self.style.SUCCESS('Results written to %s' % options['output']))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from catalog.benchmark import STARTUP_URLS, benchmark_startup, write_results
+
+
+class Command(BaseCommand):
+    help = ('Measures worker cold start: import time of the WSGI entry point and first-request '
+            'latency in fresh processes, with and without the warm-up (catalog/warmup.py).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=5, help='Fresh processes per mode')
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='URL to request (repeatable); default: %s' % ', '.join(STARTUP_URLS))
+        parser.add_argument('--entry', default='myDjango.wsgi', help='Module with the WSGI application')
+        parser.add_argument('--output', metavar='PATH', help='Also write the results to a JSON file')
+
+    def handle(self, *args, **options):
+        data = benchmark_startup(urls=options['urls'] or STARTUP_URLS, rounds=options['rounds'],
+                                 entry=options['entry'])
+        for mode, result in data['results'].items():
+            warmup = '%.1f ms' % result['warmup_ms'] if result['warmup_ms'] is not None else 'off'
+            self.stdout.write('%s: import %.1f ms (warm-up %s), process %.1f ms' % (
+                mode, result['import_ms'], warmup, result['process_ms']))
+            for request in result['requests']:
+                self.stdout.write('  %s [%s]: first %.1f ms, second %.1f ms' % (
+                    request['url'], request['status'], request['first_ms'], request['second_ms']))
+        if options['output']:
+            write_results(data, options['output'])
+            self.stdout.write(self.style.SUCCESS('Results written to %s' % options['output']))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from catalog.benchmark import benchmark_uuid_keys, write_results
+
+
+class Command(BaseCommand):
+    help = ('Compares insert throughput and primary key index size of random (UUIDv4) '
+            'and time-ordered (UUIDv7) keys on a temporary table.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--output', metavar='PATH', help='Also write the results to a JSON file')
+
+    def handle(self, *args, **options):
+        data = benchmark_uuid_keys(rows=options['rows'], batch_size=options['batch_size'])
+        for version, result in data['results'].items():
+            size = '%.1f MB' % (result['index_bytes'] / 2 ** 20) if result['index_bytes'] is not None else 'n/a'
+            self.stdout.write('%s: %s rows in %.2f s (%s rows/s), primary key index %s' % (
+                version, result['rows'], result['seconds'], result['rows_per_second'], size))
+        if options['output']:
+            write_results(data, options['output'])
+            self.stdout.write(self.style.SUCCESS('Results written to %s' % options['output']))
@@ -0,0 +1,47 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from catalog.synthetic import SyntheticCatalog
+
+
+class Command(BaseCommand):
+    help = ('Bulk-loads a deterministic synthetic catalog for benchmarks, '
+            'e.g. --authors 100000 --books 1000000 --instances 10000000.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--books', type=int, default=10000)
+        parser.add_argument('--instances', type=int, default=100000)
+        parser.add_argument('--genres', type=int, default=30)
+        parser.add_argument('--borrowers', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=1,
+                            help='Random seed; the same seed and volumes give the same catalog')
+        parser.add_argument('--today', help='Date (YYYY-MM-DD) the due dates are generated around')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Use INSERT instead of COPY for book instances on PostgreSQL')
+        parser.add_argument('--uuid-version', type=int, choices=(4, 7), default=7,
+                            help='Keys of book instances: time-ordered UUIDv7 (default) or random UUIDv4')
+
+    def handle(self, *args, **options):
+        today = datetime.date.today()
+        if options['today']:
+            today = parse_date(options['today'])
+            if today is None:
+                raise CommandError('Invalid date: %s' % options['today'])
+
+        def progress(kind, count):
+            if options['verbosity'] > 1:
+                self.stdout.write('%s: %s rows' % (kind, count))
+
+        generator = SyntheticCatalog(
+            authors=options['authors'], books=options['books'], instances=options['instances'],
+            genres=options['genres'], borrowers=options['borrowers'], seed=options['seed'],
+            batch_size=options['batch_size'], today=today, use_copy=not options['no_copy'], progress=progress,
+            key_version=options['uuid_version'])
+        volumes = generator.generate()
+        self.stdout.write(self.style.SUCCESS(
+            'Generated %(authors)s authors, %(books)s books, %(instances)s copies, '
+            '%(genres)s genres and %(borrowers)s borrowers.' % volumes))
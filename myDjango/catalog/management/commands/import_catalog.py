@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importers import KINDS, CatalogImporter, CatalogImportError, Checkpoint
+from catalog.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = ('Streams authors, genres, books and book instances from CSV or JSONL files into the catalog. '
+            'Files are loaded in dependency order; use --checkpoint to resume an interrupted import.')
+
+    def add_arguments(self, parser):
+        for kind in KINDS:
+            parser.add_argument('--%s' % kind, metavar='PATH', help='CSV or JSONL file with %s' % kind)
+        parser.add_argument('--format', choices=('csv', 'jsonl'),
+                            help='Input format (default: guessed from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--checkpoint', metavar='PATH',
+                            help='JSON file where progress is stored after every batch')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Use INSERT instead of COPY for book instances on PostgreSQL')
+
+    def handle(self, *args, **options):
+        sources = [(kind, options[kind]) for kind in KINDS if options[kind]]
+        if not sources:
+            raise CommandError('Nothing to import: pass at least one of %s.'
+                               % ', '.join('--%s' % kind for kind in KINDS))
+
+        def progress(kind, count):
+            if options['verbosity'] > 1:
+                self.stdout.write('%s: %s records processed' % (kind, count))
+
+        importer = CatalogImporter(batch_size=options['batch_size'], use_copy=not options['no_copy'],
+                                   checkpoint=Checkpoint(options['checkpoint']), progress=progress)
+        for kind, path in sources:
+            try:
+                created = importer.import_file(kind, path, options['format'])
+            except (CatalogImportError, KeyError) as e:
+                raise CommandError('Import of %s from %s failed: %s' % (kind, path, e))
+            self.stdout.write(self.style.SUCCESS('Imported %s new %s from %s.' % (created, kind, path)))
+
+        # bulk_create и COPY не вызывают сигналы, поэтому счетчики пересчитываются целиком
+        rebuild_stats()
@@ -0,0 +1,29 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from catalog.overdue import process_overdue
+
+
+class Command(BaseCommand):
+    help = 'Finds overdue loans in chunks, stores summary counts and writes a CSV report for librarians.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Treat this date (YYYY-MM-DD) as today')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--output', metavar='PATH',
+                            help='CSV report file (default: overdue-<date>.csv in the current directory)')
+
+    def handle(self, *args, **options):
+        today = datetime.date.today()
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError('Invalid date: %s' % options['date'])
+        output = options['output'] or 'overdue-%s.csv' % today.isoformat()
+
+        report = process_overdue(today=today, chunk_size=options['chunk_size'], report_path=output)
+        self.stdout.write(self.style.SUCCESS(
+            '%s overdue copies, %s borrowers, oldest due back %s. Report: %s' % (
+                report.total_overdue, report.borrowers, report.oldest_due_back or '-', report.report_file)))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from catalog.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the catalog counters shown on the home page from scratch.'
+
+    def handle(self, *args, **options):
+        stats = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(
+            'Catalog stats rebuilt: %s books, %s copies (%s available), %s authors.' % (
+                stats.num_books, stats.num_instances, stats.num_instances_available, stats.num_authors)))
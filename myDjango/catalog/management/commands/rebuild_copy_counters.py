@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from catalog.changes import rebuild_copy_counters
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the total/available/on loan copy counters of books from their copies. '
+            'Only books with wrong counters are updated.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('book_ids', nargs='*', type=int, metavar='BOOK_ID',
+                            help='Books to repair (default: all books)')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        fixed = rebuild_copy_counters(options['book_ids'] or None, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Copy counters repaired for %s books.' % fixed))
@@ -0,0 +1,370 @@
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth.decorators import user_passes_test
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import MemcachedCache, PyLibMCCache
+from django.db import connections
+from django.http import HttpResponse
+from django.template.backends.django import DjangoTemplates
+
+# Метрики запроса собираются в объект RequestMetrics, который PerformanceMiddleware
+# кладет в ContextVar; SQL считается через connection.execute_wrapper(), шаблоны -
+# через InstrumentedDjangoTemplates, кэш - через InstrumentedCacheMixin. Вне запроса
+# (команды, тесты без middleware) ничего не считается.
+#
+# Гистограммы накапливаются в памяти процесса. Если задан METRICS_DIR (общий для
+# всех воркеров каталог), каждый процесс не чаще раза в METRICS_WRITE_INTERVAL
+# секунд записывает туда свои значения в файл <pid>.json, а /metrics/ складывает
+# файлы всех процессов - ряды растут монотонно, сколько бы воркеров ни было.
+# Файлы завершившихся процессов остаются, чтобы счетчики не уменьшались после
+# перезапуска воркера (каталог очищается при деплое). Без METRICS_DIR каждый
+# процесс отдает только свои значения с меткой pid.
+METRICS_WRITE_INTERVAL = 1.0
+
+# границы корзин гистограммы времени ответа, в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('catalog_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Counters of one request.
+    """
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # вложенный render() (render_to_string внутри шаблона) не считается второй раз
+        self.template_depth = 0
+
+    def server_timing(self, total):
+        return ', '.join([
+            'sql;dur=%.1f;desc="%s queries"' % (self.sql_time * 1000, self.sql_count),
+            'tpl;dur=%.1f' % (self.template_time * 1000),
+            'cache;desc="%s hits, %s misses"' % (self.cache_hits, self.cache_misses),
+            'total;dur=%.1f' % (total * 1000),
+        ])
+
+
+def current_metrics():
+    return _current.get()
+
+
+class Histogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def state(self):
+        return {'counts': list(self.counts), 'count': self.count, 'sum': self.sum}
+
+    def merge(self, state):
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, state['counts'])]
+        self.count += state['count']
+        self.sum += state['sum']
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+
+class ViewStats:
+    """
+    Aggregated metrics of one view (URL name) in this process.
+    """
+    COUNTERS = ('sql_count', 'sql_time', 'template_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, metrics, total):
+        self.latency.observe(total)
+        self.sql_count += metrics.sql_count
+        self.sql_time += metrics.sql_time
+        self.template_time += metrics.template_time
+        self.cache_hits += metrics.cache_hits
+        self.cache_misses += metrics.cache_misses
+
+    def state(self):
+        state = {name: getattr(self, name) for name in self.COUNTERS}
+        state['latency'] = self.latency.state()
+        return state
+
+    def merge(self, state):
+        self.latency.merge(state['latency'])
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + state[name])
+
+
+def _merge(target, states):
+    for view, state in states.items():
+        stats = target.get(view)
+        if stats is None:
+            stats = target[view] = ViewStats()
+        stats.merge(state)
+
+
+class Registry:
+
+    def __init__(self):
+        self.views = {}
+        self.lock = threading.Lock()
+        self.written_at = 0.0
+
+    def record(self, view, metrics, total):
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = ViewStats()
+            stats.add(metrics, total)
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if directory and time.monotonic() - self.written_at >= METRICS_WRITE_INTERVAL:
+            self.write(directory)
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+    def write(self, directory):
+        """
+        Stores the values of this process in ``directory``/<pid>.json.
+        """
+        with self.lock:
+            data = json.dumps({view: stats.state() for view, stats in self.views.items()})
+            self.written_at = time.monotonic()
+        path = os.path.join(directory, '%s.json' % os.getpid())
+        # os.replace атомарен: читатель видит либо старый файл, либо новый целиком
+        with open(path + '.tmp', 'w') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        """
+        Returns the metrics to export and the extra labels of their series:
+        the sum over every process in METRICS_DIR, or this process only.
+        """
+        directory = getattr(settings, 'METRICS_DIR', None)
+        views = {}
+        if not directory:
+            with self.lock:
+                _merge(views, {view: stats.state() for view, stats in self.views.items()})
+            return views, 'pid="%s",' % os.getpid()
+        self.write(directory)
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as f:
+                    _merge(views, json.load(f))
+            except (OSError, ValueError):
+                # файл мог исчезнуть при очистке каталога
+                continue
+        return views, ''
+
+    def render(self):
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        views, labels = self.collect()
+        views = sorted(views.items())
+        lines = ['# HELP catalog_request_duration_seconds Wall time of requests per view.',
+                 '# TYPE catalog_request_duration_seconds histogram']
+        for view, stats in views:
+            for bound, count in stats.latency.cumulative():
+                lines.append('catalog_request_duration_seconds_bucket{%sview="%s",le="%s"} %s'
+                             % (labels, view, bound, count))
+            lines.append('catalog_request_duration_seconds_bucket{%sview="%s",le="+Inf"} %s'
+                         % (labels, view, stats.latency.count))
+            lines.append('catalog_request_duration_seconds_sum{%sview="%s"} %.6f' % (labels, view, stats.latency.sum))
+            lines.append('catalog_request_duration_seconds_count{%sview="%s"} %s'
+                         % (labels, view, stats.latency.count))
+        counters = [
+            ('catalog_sql_queries_total', 'SQL queries executed.', 'sql_count', '%s'),
+            ('catalog_sql_seconds_total', 'Time spent in SQL queries.', 'sql_time', '%.6f'),
+            ('catalog_template_seconds_total', 'Time spent rendering templates.', 'template_time', '%.6f'),
+            ('catalog_cache_hits_total', 'Cache hits.', 'cache_hits', '%s'),
+            ('catalog_cache_misses_total', 'Cache misses.', 'cache_misses', '%s'),
+        ]
+        for name, help_text, attribute, value_format in counters:
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s counter' % name)
+            for view, stats in views:
+                lines.append(('%s{%sview="%s"} ' + value_format) % (name, labels, view, getattr(stats, attribute)))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        # не разрешенные адреса (404) - одна метка, чтобы число рядов было ограничено
+        return 'unresolved'
+    return match.view_name
+
+
+def _sql_wrapper(metrics):
+    def wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.sql_count += 1
+            metrics.sql_time += time.perf_counter() - start
+    return wrapper
+
+
+class PerformanceMiddleware:
+    """
+    Measures every request (wall time, SQL, templates, cache), adds a
+    Server-Timing header for staff (or for everyone if SERVER_TIMING is on)
+    and records the numbers per view in ``registry``.
+    Should be the first middleware so that the wall time covers the others.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                wrapper = _sql_wrapper(metrics)
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+        # время SQL и число запросов - внутренние сведения: только для персонала
+        # или при SERVER_TIMING = True (например, на стенде для замеров)
+        if getattr(settings, 'SERVER_TIMING', False) or getattr(getattr(request, 'user', None), 'is_staff', False):
+            response['Server-Timing'] = metrics.server_timing(total)
+        registry.record(_view_name(request), metrics, total)
+        return response
+
+
+class InstrumentedTemplate:
+    """
+    Wrapper of a backend template that adds its render time to the request metrics.
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = current_metrics()
+        if metrics is None or metrics.template_depth:
+            return self.template.render(context, request)
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+            metrics.template_depth -= 1
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend with render time accounting.
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+class InstrumentedCacheMixin:
+    """
+    Counts cache hits and misses of get()/get_many(). Mix it into any cache
+    backend class, e.g. class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache).
+    """
+    _missing = object()
+    # BaseCache.get_many() вызывает get() для каждого ключа, а некоторые backend'ы
+    # реализуют get() через get_many() - внутренние вызовы не считаются второй раз
+    _counting = ContextVar('catalog_cache_counting', default=True)
+
+    def _uncounted(self, method, *args, **kwargs):
+        counting = self._counting.get()
+        token = self._counting.set(False)
+        try:
+            return counting, method(*args, **kwargs)
+        finally:
+            self._counting.reset(token)
+
+    def _count(self, hits, misses):
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.cache_hits += hits
+            metrics.cache_misses += misses
+
+    def get(self, key, default=None, version=None):
+        counting, value = self._uncounted(super().get, key, self._missing, version=version)
+        found = value is not self._missing
+        if counting:
+            self._count(int(found), int(not found))
+        return value if found else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        counting, found = self._uncounted(super().get_many, keys, version=version)
+        if counting:
+            self._count(len(found), len(keys) - len(found))
+        return found
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedMemcachedCache(InstrumentedCacheMixin, MemcachedCache):
+    pass
+
+
+class InstrumentedPyLibMCCache(InstrumentedCacheMixin, PyLibMCCache):
+    pass
+
+
+@user_passes_test(lambda user: user.is_active and user.is_staff)
+def metrics_view(request):
+    """
+    Aggregated metrics of every worker (METRICS_DIR) or of this process in the
+    Prometheus text format (staff only).
+    """
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
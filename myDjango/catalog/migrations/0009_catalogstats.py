@@ -0,0 +1,27 @@
+# Generated by Django 3.0.14 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_auto_20200422_0938'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_books', models.BigIntegerField(default=0)),
+                ('num_instances', models.BigIntegerField(default=0)),
+                ('num_instances_available', models.BigIntegerField(default=0)),
+                ('num_authors', models.BigIntegerField(default=0)),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'catalog stats',
+            },
+        ),
+    ]
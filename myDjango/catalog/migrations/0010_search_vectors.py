@@ -0,0 +1,82 @@
+from django.db import migrations
+
+from catalog.migration_operations import PostgresRunSQL
+
+# Колонки search_vector не описаны в моделях: их заполняют триггеры,
+# поэтому они всегда синхронны с title/summary и именами авторов,
+# в том числе при bulk_create/COPY и правках через admin.
+
+BOOK_VECTOR = ("setweight(to_tsvector('simple', coalesce({0}title, '')), 'A') || "
+               "setweight(to_tsvector('simple', coalesce({0}summary, '')), 'B')")
+AUTHOR_VECTOR = ("setweight(to_tsvector('simple', coalesce({0}last_name, '')), 'A') || "
+                 "setweight(to_tsvector('simple', coalesce({0}first_name, '')), 'A')")
+
+TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {vector};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER {table}_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF {columns} ON {table}
+    FOR EACH ROW EXECUTE PROCEDURE {table}_search_vector_update();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS {table}_search_vector_trigger ON {table};
+DROP FUNCTION IF EXISTS {table}_search_vector_update();
+"""
+
+
+def search_column_sql(table, vector, columns):
+    return [
+        'ALTER TABLE %s ADD COLUMN search_vector tsvector;' % table,
+        'UPDATE %s SET search_vector = %s;' % (table, vector.format('')),
+        TRIGGER_FUNCTION.format(table=table, vector=vector.format('NEW.'), columns=columns),
+        'CREATE INDEX %s_search_vector_idx ON %s USING gin (search_vector);' % (table, table),
+    ]
+
+
+def drop_search_column_sql(table):
+    return [
+        DROP_TRIGGER.format(table=table),
+        'DROP INDEX IF EXISTS %s_search_vector_idx;' % table,
+        'ALTER TABLE %s DROP COLUMN IF EXISTS search_vector;' % table,
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_catalogstats'),
+    ]
+
+    operations = [
+        PostgresRunSQL(
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm;',
+            migrations.RunSQL.noop,
+        ),
+        PostgresRunSQL(
+            search_column_sql('catalog_book', BOOK_VECTOR, 'title, summary'),
+            drop_search_column_sql('catalog_book'),
+        ),
+        PostgresRunSQL(
+            search_column_sql('catalog_author', AUTHOR_VECTOR, 'first_name, last_name'),
+            drop_search_column_sql('catalog_author'),
+        ),
+        # триграммные индексы для нечеткого поиска и ILIKE '%...%'
+        PostgresRunSQL(
+            [
+                'CREATE INDEX catalog_book_title_trgm_idx ON catalog_book USING gin (title gin_trgm_ops);',
+                'CREATE INDEX catalog_author_last_name_trgm_idx ON catalog_author '
+                'USING gin (last_name gin_trgm_ops);',
+                'CREATE INDEX catalog_genre_name_trgm_idx ON catalog_genre USING gin (name gin_trgm_ops);',
+            ],
+            [
+                'DROP INDEX IF EXISTS catalog_book_title_trgm_idx;',
+                'DROP INDEX IF EXISTS catalog_author_last_name_trgm_idx;',
+                'DROP INDEX IF EXISTS catalog_genre_name_trgm_idx;',
+            ],
+        ),
+    ]
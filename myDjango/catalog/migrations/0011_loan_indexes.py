@@ -0,0 +1,29 @@
+# Generated by Django 3.0.14 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+from catalog.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('catalog', '0010_search_vectors'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='bookinstance',
+            index=models.Index(condition=models.Q(status='o'), fields=['borrower', 'due_back', 'id'], name='bookinst_borrower_loan_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='bookinstance',
+            index=models.Index(condition=models.Q(status='o'), fields=['due_back', 'id'], name='bookinst_on_loan_due_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='bookinstance',
+            index=models.Index(condition=models.Q(status='a'), fields=['book'], name='bookinst_available_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.0.14 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_loan_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueReport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField(help_text='Copies due back before this date are overdue')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('total_overdue', models.PositiveIntegerField(default=0)),
+                ('borrowers', models.PositiveIntegerField(default=0, help_text='Number of borrowers with overdue copies')),
+                ('oldest_due_back', models.DateField(blank=True, null=True)),
+                ('report_file', models.CharField(blank=True, help_text='CSV report for librarians', max_length=500)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.0.14 on 2026-10-18 18:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# Только столбцы: индексы по last_modified строятся отдельно, CONCURRENTLY (0020).
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_overduereport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='last_modified',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='last_modified',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='bookinstance',
+            name='last_modified',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.0.14 on 2026-10-18 17:55
+
+from django.db import migrations, models, transaction
+
+# Начальные значения счетчиков; дальше их поддерживают сигналы. Заполняются
+# пачками по id, каждая в своей транзакции (миграция не атомарная): один UPDATE
+# всей таблицы держал бы блокировки всех строк catalog_book до конца миграции.
+# Частичный индекс book_available_idx создается отдельно, в 0019.
+FILL_BATCH_SIZE = 1000
+
+FILL_COUNTERS = """
+UPDATE catalog_book SET
+    total_copies = (SELECT COUNT(*) FROM catalog_bookinstance WHERE book_id = catalog_book.id),
+    available_copies = (SELECT COUNT(*) FROM catalog_bookinstance WHERE book_id = catalog_book.id AND status = 'a'),
+    on_loan_copies = (SELECT COUNT(*) FROM catalog_bookinstance WHERE book_id = catalog_book.id AND status = 'o')
+WHERE id > %s AND id <= %s
+"""
+
+
+def fill_counters(apps, schema_editor):
+    Book = apps.get_model('catalog', 'Book')
+    alias = schema_editor.connection.alias
+    ids = Book.objects.using(alias).order_by('id').values_list('id', flat=True)
+    last_id = 0
+    while True:
+        batch = list(ids.filter(id__gt=last_id)[:FILL_BATCH_SIZE])
+        if not batch:
+            break
+        with transaction.atomic(using=alias), schema_editor.connection.cursor() as cursor:
+            cursor.execute(FILL_COUNTERS, [last_id, batch[-1]])
+        last_id = batch[-1]
+
+
+class Migration(migrations.Migration):
+    # пачки заполнения коммитятся по отдельности
+    atomic = False
+
+    dependencies = [
+        ('catalog', '0014_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='available_copies',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='on_loan_copies',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='total_copies',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.0.14 on 2026-10-18 18:07
+
+import catalog.uuids
+from django.db import migrations, models
+
+# Значение по умолчанию вычисляется в Python, в базе оно не хранится, поэтому
+# меняется только состояние моделей: таблица не перестраивается (SQLite пересоздал
+# бы ее целиком), а существующие uuid4 остаются действительными ключами рядом с uuid7.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_copy_counters'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='bookinstance',
+                name='id',
+                field=models.UUIDField(default=catalog.uuids.uuid7, help_text='Unique ID for this particular book across whole library', primary_key=True, serialize=False),
+            ),
+        ]),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.0.14 on 2026-10-18 19:20
+
+from django.db import migrations
+
+# Промежуточная таблица Book.genre создается Django автоматически, поэтому индекс
+# добавляется SQL-ом. (genre_id, book_id): фильтр ?genre= и счет книг по жанрам
+# читают только индекс, книги жанра идут по возрастанию id - как страницы списка.
+# На PostgreSQL - CONCURRENTLY, чтобы таблица оставалась доступной для записи.
+INDEX_NAME = 'book_genre_genre_book_idx'
+
+
+def create_index(apps, schema_editor):
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    schema_editor.execute('CREATE INDEX %sIF NOT EXISTS %s ON catalog_book_genre (genre_id, book_id)'
+                          % (concurrently, INDEX_NAME))
+
+
+def drop_index(apps, schema_editor):
+    concurrently = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    schema_editor.execute('DROP INDEX %sIF EXISTS %s' % (concurrently, INDEX_NAME))
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('catalog', '0016_bookinstance_uuid7'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.0.14 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+# должно совпадать с catalog.stats.STATS_SHARDS
+STATS_SHARDS = 16
+
+
+def create_shards(apps, schema_editor):
+    CatalogStatsShard = apps.get_model('catalog', 'CatalogStatsShard')
+    CatalogStatsShard.objects.bulk_create([CatalogStatsShard(pk=shard) for shard in range(1, STATS_SHARDS + 1)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0017_book_genre_facet_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogStatsShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_instances', models.BigIntegerField(default=0)),
+                ('num_instances_available', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_shards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.0.14 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+from catalog.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('catalog', '0018_catalogstatsshard'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(condition=models.Q(available_copies__gt=0), fields=['id'], name='book_available_idx'),
+        ),
+    ]
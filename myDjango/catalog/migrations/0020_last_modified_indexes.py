@@ -0,0 +1,25 @@
+# Generated by Django 3.0.14 on 2026-10-18 22:55
+
+from django.db import migrations, models
+
+from catalog.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('catalog', '0019_book_available_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='author',
+            index=models.Index(fields=['last_modified'], name='author_last_modified_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='book',
+            index=models.Index(fields=['last_modified'], name='book_last_modified_idx'),
+        ),
+    ]
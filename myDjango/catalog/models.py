@@ -1,13 +1,48 @@
-import uuid
-
-from django.db import models
+from django.db import models, router, transaction
 from django.urls import reverse
 from django.contrib.auth.models import User
 from datetime import date
 
+from .uuids import uuid7
+
 # Create your models here.
 
 
+class TrackedFieldsMixin:
+    """
+    Remembers the values of TRACKED_FIELDS as they were loaded from the database,
+    so that the signal handlers in catalog.signals can tell what has changed.
+    """
+    TRACKED_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {name: getattr(instance, name)
+                                   for name in cls.TRACKED_FIELDS if name in field_names}
+        return instance
+
+
+class VersionedMixin:
+    """
+    For models with a ``version`` counter (and other COUNTER_FIELDS) that is only
+    changed with UPDATE ... SET version = version + 1 (see catalog/changes.py).
+    A regular save() of an existing object never writes the counters back, otherwise
+    an object loaded before the bump would roll them back and e.g. stale cached
+    fragments would be served.
+    """
+    COUNTER_FIELDS = ('version', )
+
+    def save(self, *args, **kwargs):
+        if not args and not self._state.adding and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.COUNTER_FIELDS
+                                       and field.attname not in deferred]
+        super().save(*args, **kwargs)
+
+
 class Genre(models.Model):
     """
     Model representing a book genre (e.g. Science Fiction, Non Fiction).
@@ -21,7 +56,7 @@ class Genre(models.Model):
         return self.name
 
 
-class Book(models.Model):
+class Book(TrackedFieldsMixin, VersionedMixin, models.Model):
     """
     Model representing a book (but not a specific copy of a book).
     """
@@ -37,10 +72,28 @@ class Book(models.Model):
     isbn = models.CharField('ISBN', max_length=13,
                             help_text='13 Character <a href="https://www.isbn-international.org/content/what-isbn">ISBN number</a>')
     genre = models.ManyToManyField(Genre, help_text="Select a genre for this book")
+    # время последнего изменения книги или ее экземпляров (для ETag/Last-Modified),
+    # индекс book_last_modified_idx (Meta) нужен для MAX(last_modified) при проверке списка книг
+    last_modified = models.DateTimeField(auto_now=True)
+    # номер версии списка экземпляров - входит в ключ кэша фрагмента в book_detail.html
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # счетчики экземпляров, чтобы не считать bookinstance_set для каждой книги;
+    # меняются в той же транзакции, что и экземпляр (catalog/signals.py),
+    # пересчитываются командой rebuild_copy_counters
+    total_copies = models.PositiveIntegerField(default=0, editable=False)
+    available_copies = models.PositiveIntegerField(default=0, editable=False)
+    on_loan_copies = models.PositiveIntegerField(default=0, editable=False)
 
     # ManyToManyField used because genre can contain many books. Books can cover many genres.
     # Genre class has already been defined so we can specify the object above.
 
+    # на PostgreSQL у таблицы есть еще колонка search_vector (tsvector), которую
+    # заполняет триггер из миграции 0010 - в модели она не описана (см. catalog/search.py)
+
+    # при смене автора нужно обновить last_modified и у старого автора
+    TRACKED_FIELDS = ('author_id', )
+    COUNTER_FIELDS = ('version', 'total_copies', 'available_copies', 'on_loan_copies')
+
     def __str__(self):
         """
         String for representing the Model object.
@@ -65,13 +118,44 @@ class Book(models.Model):
         permissions = (
             ("can_update_create_delete_book", "Access for update Book"),
         )
+        # - книги, которые можно взять прямо сейчас (BookListView ?available=1), по id курсора
+        # - MAX(last_modified) для ETag/Last-Modified списка книг
+        indexes = [
+            models.Index(fields=['id'], name='book_available_idx', condition=models.Q(available_copies__gt=0)),
+            models.Index(fields=['last_modified'], name='book_last_modified_idx'),
+        ]
+
 
+class BookInstanceQuerySet(models.QuerySet):
+    """
+    Set-based versions of the BookInstance checks, so they can be filtered and counted in SQL.
+    """
+
+    def on_loan(self):
+        return self.filter(status__exact='o')
+
+    def overdue(self, today=None):
+        """
+        Copies on loan whose due date has passed (served by the bookinst_on_loan_due_idx index).
+        """
+        return self.on_loan().filter(due_back__lt=today or date.today())
 
-class BookInstance(models.Model):
+    def with_overdue(self, today=None):
+        """
+        Annotates every copy with ``overdue`` - the same rule as BookInstance.is_overdue.
+        """
+        return self.annotate(overdue=models.Case(
+            models.When(due_back__lt=today or date.today(), then=models.Value(True)),
+            default=models.Value(False),
+            output_field=models.BooleanField()))
+
+
+class BookInstance(TrackedFieldsMixin, models.Model):
     """
     Model representing a specific copy of a book (i.e. that can be borrowed from the library).
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+    # uuid7 - упорядоченные по времени ключи (catalog/uuids.py); старые uuid4 остаются валидными
+    id = models.UUIDField(primary_key=True, default=uuid7,
                           help_text="Unique ID for this particular book across whole library")
     # help_text - это то что будет подписываться рядом с полем в формах
     book = models.ForeignKey('Book', on_delete=models.SET_NULL, null=True)
@@ -87,6 +171,13 @@ class BookInstance(models.Model):
 
     status = models.CharField(max_length=1, choices=LOAN_STATUS, blank=True, default='m', help_text='Book availability')
     borrower = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    last_modified = models.DateTimeField(auto_now=True)
+
+    objects = BookInstanceQuerySet.as_manager()
+
+    # поля, значения которых запоминаются при загрузке из базы,
+    # чтобы в сигналах понимать что именно поменялось (статус, книга)
+    TRACKED_FIELDS = ('status', 'book_id')
 
     class Meta:
         ordering = ["due_back"]
@@ -95,6 +186,26 @@ class BookInstance(models.Model):
             ("can_mark_returned", "Set book as returned"),
             ("can_check_all_borrowed_books", "Check all borrowed books")
                        )
+        # частичные индексы под конкретные запросы (только строки с нужным статусом):
+        # - книги пользователя на руках (LoanedBooksByUserListView)
+        # - все книги на руках по дате возврата (AllLoanedBooksForLibrarianView)
+        # - доступные экземпляры (счетчики доступных книг)
+        # id в конце индекса - tiebreaker курсорной пагинации (catalog/pagination.py)
+        indexes = [
+            models.Index(fields=['borrower', 'due_back', 'id'], name='bookinst_borrower_loan_idx',
+                         condition=models.Q(status='o')),
+            models.Index(fields=['due_back', 'id'], name='bookinst_on_loan_due_idx',
+                         condition=models.Q(status='o')),
+            models.Index(fields=['book'], name='bookinst_available_idx',
+                         condition=models.Q(status='a')),
+        ]
+
+    def save(self, *args, **kwargs):
+        # счетчики книги меняются в post_save (catalog/signals.py) - в той же транзакции;
+        # delete() и так выполняется в транзакции вместе с сигналами
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         """
@@ -104,12 +215,16 @@ class BookInstance(models.Model):
 
     @property
     def is_overdue(self):
+        # если значение уже посчитано в запросе (BookInstance.objects.with_overdue()),
+        # то берем его, чтобы все строки списка сравнивались с одной и той же датой
+        if 'overdue' in self.__dict__:
+            return self.overdue
         if self.due_back and date.today() > self.due_back:
             return True
         return False
 
 
-class Author(models.Model):
+class Author(VersionedMixin, models.Model):
     """
     Model representing an author.
     """
@@ -117,6 +232,10 @@ class Author(models.Model):
     last_name = models.CharField(max_length=100)
     date_of_birth = models.DateField(null=True, blank=True)
     date_of_death = models.DateField('died', null=True, blank=True)
+    # меняется и при изменении книг автора (см. catalog/changes.py)
+    last_modified = models.DateTimeField(auto_now=True)
+    # номер версии списка книг - входит в ключ кэша фрагмента в author_detail.html
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     def get_absolute_url(self):
         """
@@ -138,4 +257,68 @@ class Author(models.Model):
         permissions = (
             ("can_update_create_delete_author", "Access for update Author"),
         )
+        # MAX(last_modified) для ETag/Last-Modified списка авторов
+        indexes = [
+            models.Index(fields=['last_modified'], name='author_last_modified_idx'),
+        ]
+
+
 
+class CatalogStats(models.Model):
+    """
+    Model holding precomputed catalog counters for the home page (a single row).
+    Kept up to date by the signal handlers in catalog.signals and rebuilt
+    from scratch by the rebuild_catalog_stats management command.
+    """
+    num_books = models.BigIntegerField(default=0)
+    num_instances = models.BigIntegerField(default=0)
+    num_instances_available = models.BigIntegerField(default=0)
+    num_authors = models.BigIntegerField(default=0)
+    rebuilt_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        """
+        String for representing the Model object.
+        """
+        return 'Catalog stats (%s books, %s copies)' % (self.num_books, self.num_instances)
+
+    class Meta:
+        verbose_name_plural = 'catalog stats'
+
+
+class CatalogStatsShard(models.Model):
+    """
+    Model holding a share of the copy counters of CatalogStats. Copy changes
+    add their deltas to one of several shard rows instead of the single stats
+    row, so concurrent checkouts do not wait for each other on it; the totals
+    are the stats row plus the sum of the shards (catalog.stats.get_stats).
+    """
+    num_instances = models.BigIntegerField(default=0)
+    num_instances_available = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        """
+        String for representing the Model object.
+        """
+        return 'Catalog stats shard %s' % self.pk
+
+
+class OverdueReport(models.Model):
+    """
+    Model representing the summary of one run of the process_overdue command.
+    """
+    as_of = models.DateField(help_text='Copies due back before this date are overdue')
+    created_at = models.DateTimeField(auto_now_add=True)
+    total_overdue = models.PositiveIntegerField(default=0)
+    borrowers = models.PositiveIntegerField(default=0, help_text='Number of borrowers with overdue copies')
+    oldest_due_back = models.DateField(null=True, blank=True)
+    report_file = models.CharField(max_length=500, blank=True, help_text='CSV report for librarians')
+
+    def __str__(self):
+        """
+        String for representing the Model object.
+        """
+        return 'Overdue on %s: %s copies' % (self.as_of, self.total_overdue)
+
+    class Meta:
+        ordering = ['-created_at']
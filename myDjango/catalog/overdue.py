@@ -0,0 +1,55 @@
+import csv
+from collections import Counter
+from datetime import date
+
+from .models import BookInstance, OverdueReport
+from .pagination import KeysetPaginator
+
+REPORT_FIELDS = ('id', 'book__title', 'book__isbn', 'borrower__username', 'due_back', 'days_overdue')
+
+
+def overdue_chunks(today, chunk_size):
+    """
+    Yields lists of overdue copies as values() dicts, chunk by chunk. Every chunk is a
+    separate short read query that continues after the (due_back, id) key of the previous
+    one, walking the bookinst_on_loan_due_idx index - no long transaction and no row locks.
+    """
+    queryset = BookInstance.objects.overdue(today).values(
+        'id', 'due_back', 'book__title', 'book__isbn', 'borrower_id', 'borrower__username')
+    paginator = KeysetPaginator(queryset, chunk_size, ('due_back', 'id'))
+    page = paginator.page()
+    while page.object_list:
+        yield page.object_list
+        if not page.has_next():
+            break
+        page = paginator.page(page.next_cursor)
+
+
+def process_overdue(today=None, chunk_size=1000, report_path=None):
+    """
+    Finds all overdue copies, writes the librarian CSV report (if report_path is given)
+    and stores the summary counts as an OverdueReport.
+    """
+    today = today or date.today()
+    total, oldest, borrowers = 0, None, Counter()
+    report_file = open(report_path, 'w', newline='', encoding='utf-8') if report_path else None
+    try:
+        writer = csv.writer(report_file) if report_file else None
+        if writer:
+            writer.writerow(REPORT_FIELDS)
+        for chunk in overdue_chunks(today, chunk_size):
+            total += len(chunk)
+            if oldest is None:
+                # строки идут по возрастанию due_back, поэтому первая - самая старая
+                oldest = chunk[0]['due_back']
+            borrowers.update(row['borrower_id'] for row in chunk if row['borrower_id'])
+            if writer:
+                for row in chunk:
+                    row['days_overdue'] = (today - row['due_back']).days
+                    writer.writerow([row[field] for field in REPORT_FIELDS])
+    finally:
+        if report_file:
+            report_file.close()
+
+    return OverdueReport.objects.create(as_of=today, total_overdue=total, borrowers=len(borrowers),
+                                        oldest_due_back=oldest, report_file=report_path or '')
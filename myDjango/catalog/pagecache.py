@@ -0,0 +1,79 @@
+import hashlib
+import re
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from .conditional import ConditionalGetMixin
+from .permissions import get_snapshot
+
+# Кэш страниц списков, общий для пользователей с одинаковыми правами.
+# Страница рендерится один раз, а место под пользовательские части сайдбара
+# (имя, группы, флаги прав - {% user_hole %} в base_generic.html) остается
+# "дыркой": маркером <!--catalog:hole:имя шаблона-->. При каждом запросе
+# дырки заполняются шаблонами для текущего пользователя.
+#
+# Ключ: адрес со всеми параметрами (страница, курсор, фильтры), хэш набора прав
+# (от прав зависят ссылки внутри content) и отметки каталога из
+# get_modification_stamps() - той же одной выборки, что и для ETag. После
+# изменения книг или авторов отметки другие, и старая страница перестает читаться.
+PAGE_CACHE_TIMEOUT = 10 * 60
+PAGE_CACHE_KEY = 'catalog:page:%s'
+# контекстная переменная: страница рендерится для общего кэша
+HOLES_VAR = 'page_cache_holes'
+HOLE_MARKER = '<!--catalog:hole:%s-->'
+HOLE_RE = re.compile(r'<!--catalog:hole:([\w/.-]+)-->')
+
+
+def fill_holes(html, request):
+    """
+    Replaces the hole markers of a shared page with their templates rendered
+    for the current user. Hole templates see only what the context
+    processors provide (request, user, perms).
+    """
+    rendered = {}
+
+    def render_hole(match):
+        name = match.group(1)
+        if name not in rendered:
+            rendered[name] = render_to_string(name, request=request)
+        return rendered[name]
+
+    return HOLE_RE.sub(render_hole, html)
+
+
+class SharedPageCacheMixin(ConditionalGetMixin):
+    """
+    Caches the rendered page per URL, permission set and catalog version, and
+    fills in the user-specific holes on every request. The page must not
+    contain anything user-specific (csrf_token, messages) outside the holes.
+    """
+
+    def get_page_cache_key(self):
+        stamps = self._modification_stamps()
+        if stamps is None:
+            return None
+        key = repr((self.request.get_full_path(), get_snapshot(self.request.user).fingerprint, stamps))
+        return PAGE_CACHE_KEY % hashlib.md5(key.encode()).hexdigest()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context[HOLES_VAR] = True
+        return context
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_page_cache_key()
+        html = cache.get(key) if key else None
+        if html is not None:
+            # попадание: ни выборки страницы, ни рендеринга - только дырки
+            return HttpResponse(fill_holes(html, request))
+        response = super().get(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        response.render()
+        html = response.content.decode(response.charset)
+        if key:
+            cache.set(key, html, PAGE_CACHE_TIMEOUT)
+        response.content = fill_holes(html, request)
+        return response
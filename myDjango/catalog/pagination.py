@@ -0,0 +1,241 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPaginator:
+    """
+    Cursor (seek) paginator. Instead of COUNT(*) + OFFSET it remembers the ordering
+    key of the last row of the page and asks for the rows after it, so every page
+    costs the same no matter how deep it is.
+
+    ``ordering`` is a sequence of field names (a '-' prefix means descending); the
+    last field must be unique (usually 'id') and acts as a tiebreaker. NULL values
+    of nullable fields are always placed after the non-NULL ones.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.model = queryset.model
+        self.fields = []
+        for name in ordering:
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            if name == 'pk':
+                name = self.model._meta.pk.name
+            self.fields.append((name, descending, self.model._meta.get_field(name)))
+
+    @cached_property
+    def count(self):
+        """
+        Total number of rows. Only computed when a page explicitly asks for it.
+        """
+        return self.queryset.count()
+
+    def page(self, cursor=None):
+        if cursor:
+            backwards, key = self.decode_cursor(cursor)
+        else:
+            backwards, key = False, None
+
+        queryset = self.queryset
+        if key is not None:
+            queryset = queryset.filter(self._seek(key, backwards))
+        # берем на одну строку больше, чтобы узнать есть ли следующая страница
+        rows = list(queryset.order_by(*self._ordering(backwards))[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = key is not None, has_more
+        return KeysetPage(rows, self, has_next=has_next, has_previous=has_previous)
+
+    def _ordering(self, backwards):
+        ordering = []
+        for name, descending, field in self.fields:
+            # при движении назад порядок полностью переворачивается, и NULL оказываются первыми
+            nulls = {}
+            if field.null:
+                nulls = {'nulls_first': True} if backwards else {'nulls_last': True}
+            expression = F(name)
+            ordering.append(expression.desc(**nulls) if descending != backwards else expression.asc(**nulls))
+        return ordering
+
+    def _seek(self, key, backwards, position=0):
+        """
+        Builds the condition "the row comes after (or before) ``key``" for the
+        ordering fields starting at ``position``.
+        """
+        name, descending, field = self.fields[position]
+        value = key[position]
+        last = position == len(self.fields) - 1
+        lookup = '%s__%s' % (name, 'lt' if descending != backwards else 'gt')
+
+        if value is None:
+            # NULL идут после всех значений: вперед - только NULL, назад - все не NULL
+            condition = Q(**{'%s__isnull' % name: not backwards})
+            if not last:
+                tail = Q(**{'%s__isnull' % name: True}) & self._seek(key, backwards, position + 1)
+                condition = Q(**{'%s__isnull' % name: False}) | tail if backwards else tail
+            return condition
+
+        condition = Q(**{lookup: value})
+        if field.null and not backwards:
+            condition |= Q(**{'%s__isnull' % name: True})
+        if not last:
+            condition |= Q(**{name: value}) & self._seek(key, backwards, position + 1)
+        return condition
+
+    def key_for(self, row):
+        if isinstance(row, dict):
+            return [row[name] for name, _, _ in self.fields]
+        return [getattr(row, field.attname) for _, _, field in self.fields]
+
+    def encode_cursor(self, row, backwards):
+        payload = json.dumps([int(backwards), self.key_for(row)], cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            backwards, values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            key = [None if value is None else field.to_python(value)
+                   for value, (_, _, field) in zip(values, self.fields)]
+        except (ValueError, TypeError, binascii.Error, ValidationError) as e:
+            # to_python поднимает ValidationError для неправильных значений
+            raise InvalidCursor(cursor) from e
+        return bool(backwards), key
+
+
+class KeysetPage:
+    """
+    A page of a KeysetPaginator. Mimics the parts of django.core.paginator.Page
+    used by the templates, plus opaque next/previous cursors.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        # выставляется отображением, если страница явно попросила общее количество
+        self.count_requested = False
+
+    def __repr__(self):
+        return '<Keyset page of %s rows>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], backwards=False)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], backwards=True)
+
+
+class KeysetPaginationMixin:
+    """
+    Mixin for generic.ListView that paginates with KeysetPaginator.
+
+    The old ?page=N links keep working through the default Paginator; without
+    them the list is paginated by ?cursor=... tokens and ?count=1 asks for the
+    total number of rows.
+    """
+    keyset_ordering = ('id', )
+    cursor_kwarg = 'cursor'
+    count_kwarg = 'count'
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.request.GET.get(self.page_kwarg) or self.kwargs.get(self.page_kwarg):
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        page.count_requested = bool(self.request.GET.get(self.count_kwarg))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists of big tables that never runs a full COUNT(*).
+
+    An unfiltered queryset on PostgreSQL is counted by the planner statistics
+    (pg_class.reltuples, refreshed by ANALYZE/autovacuum); everything else is
+    counted up to ``count_limit`` rows, so a broad filter costs at most
+    ``count_limit`` index entries. Pages after the limit are not reachable -
+    the search or the filters have to narrow the list first.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        estimate = estimated_count(queryset)
+        # маленькие таблицы считаются точно - это дешево, а статистика бывает устаревшей
+        if estimate is not None and estimate > self.count_limit:
+            return estimate
+        return queryset.order_by()[:self.count_limit + 1].count()
+
+
+def estimated_count(queryset):
+    """
+    Number of rows of the queryset's table from the planner statistics, or None
+    if the queryset is filtered or the database is not PostgreSQL.
+    """
+    query = queryset.query
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or query.where or query.distinct or query.low_mark or query.high_mark:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    # -1 (PostgreSQL 14+) или 0 - таблицу еще ни разу не анализировали
+    if row is None or row[0] <= 0:
+        return None
+    return int(row[0])
@@ -0,0 +1,118 @@
+import hashlib
+import uuid
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Снимок групп и прав пользователя хранится в кэше (общем для всех воркеров,
+# см. CACHES в settings.py) под ключом с версией. Любое изменение
+# групп или прав меняет версию, и старый снимок просто перестает читаться.
+SNAPSHOT_TIMEOUT = 60 * 60
+GLOBAL_VERSION_KEY = 'catalog:perms:version'
+USER_VERSION_KEY = 'catalog:perms:version:%s'
+SNAPSHOT_KEY = 'catalog:perms:%s:%s:%s'
+
+
+class PermissionSnapshot:
+    """
+    Immutable set of group names and 'app_label.codename' permissions of a user.
+    """
+
+    def __init__(self, groups=(), permissions=()):
+        self.groups = tuple(sorted(groups))
+        self.permissions = frozenset(permissions)
+
+    def has_group(self, group_name):
+        return group_name in self.groups
+
+    def has_perm(self, perm):
+        return perm in self.permissions
+
+    @cached_property
+    def fingerprint(self):
+        # одинаковый у всех пользователей с одним набором прав (группы не входят)
+        return hashlib.md5(repr(sorted(self.permissions)).encode()).hexdigest()
+
+
+EMPTY_SNAPSHOT = PermissionSnapshot()
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def _get_versions(user_id):
+    user_key = USER_VERSION_KEY % user_id
+    versions = cache.get_many([GLOBAL_VERSION_KEY, user_key])
+    missing = {key: _new_version() for key in (GLOBAL_VERSION_KEY, user_key) if key not in versions}
+    if missing:
+        # версии не должны истекать раньше снимков, поэтому timeout=None
+        for key, version in missing.items():
+            cache.add(key, version, timeout=None)
+        versions.update(cache.get_many(list(missing)))
+    return versions.get(GLOBAL_VERSION_KEY), versions.get(user_key)
+
+
+def load_snapshot(user):
+    """
+    Reads the groups and permissions of the user from the database.
+    """
+    if not user.is_active:
+        return EMPTY_SNAPSHOT
+    groups = user.groups.values_list('name', flat=True)
+    if user.is_superuser:
+        permissions = Permission.objects.all()
+    else:
+        permissions = Permission.objects.filter(Q(user=user) | Q(group__user=user)).distinct()
+    permissions = permissions.values_list('content_type__app_label', 'codename')
+    return PermissionSnapshot(groups, ['%s.%s' % (app_label, codename) for app_label, codename in permissions])
+
+
+def get_snapshot(user):
+    """
+    Returns the snapshot of the user, loading it at most once per request (it is
+    remembered on the user object) and at most once per version across workers.
+    """
+    if not user.is_authenticated:
+        return EMPTY_SNAPSHOT
+    snapshot = getattr(user, '_catalog_perm_snapshot', None)
+    if snapshot is None:
+        key = SNAPSHOT_KEY % ((user.pk, ) + _get_versions(user.pk))
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = load_snapshot(user)
+            cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+        user._catalog_perm_snapshot = snapshot
+    return snapshot
+
+
+def snapshot_version(user):
+    """
+    Returns a string that changes whenever the groups or permissions of the user
+    may have changed (read from the cache only, no database queries).
+    """
+    if not user.is_authenticated:
+        return 'anonymous'
+    return '%s:%s:%s' % ((user.pk, ) + _get_versions(user.pk))
+
+
+def _bump(key):
+    cache.set(key, _new_version(), timeout=None)
+
+
+def _bump_now_and_on_commit(key):
+    # сразу - чтобы текущий процесс не читал старый снимок,
+    # после коммита - чтобы другой воркер не закэшировал данные, которые еще не закоммичены
+    _bump(key)
+    transaction.on_commit(lambda: _bump(key))
+
+
+def invalidate_user(user_id):
+    _bump_now_and_on_commit(USER_VERSION_KEY % user_id)
+
+
+def invalidate_all():
+    _bump_now_and_on_commit(GLOBAL_VERSION_KEY)
@@ -0,0 +1,172 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Чтения моделей catalog идут на реплики (settings.DATABASE_REPLICAS), записи -
+# на primary (default). Чтобы пользователь сразу видел свои изменения, после
+# записи его чтения "прилипают" к primary: до конца запроса - через состояние
+# в ContextVar, в следующих запросах - через cookie (ReplicaStickinessMiddleware).
+
+STICKY_COOKIE = 'catalog_primary_until'
+
+
+class RoutingState:
+    """
+    Routing decisions of the current request (or management command run).
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        # реплика выбирается один раз, чтобы все чтения запроса видели одно и то же состояние
+        self.replica = None
+
+
+_state = ContextVar('catalog_routing_state', default=None)
+
+
+def get_state():
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+@contextmanager
+def use_primary():
+    """
+    Sends every read inside the block to the primary.
+    """
+    state = get_state()
+    pinned = state.pinned
+    state.pinned = True
+    try:
+        yield
+    finally:
+        state.pinned = pinned
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+# alias -> (время проверки, отставание в секундах)
+_lag_cache = {}
+
+
+def replica_lag(alias):
+    """
+    Replication lag of the replica in seconds (None if it cannot be checked).
+    The result is remembered for REPLICA_LAG_CHECK_INTERVAL seconds per process.
+    """
+    interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 1)
+    checked_at, lag = _lag_cache.get(alias, (None, None))
+    now = time.monotonic()
+    if checked_at is None or now - checked_at >= interval:
+        lag = _query_lag(alias)
+        _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def _query_lag(alias):
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        # у SQLite и тестовых зеркал (TEST MIRROR) отставания нет
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            # если все полученное с primary уже применено - отставания нет,
+            # даже когда на primary давно не было записей
+            cursor.execute(
+                "SELECT CASE WHEN NOT pg_is_in_recovery() "
+                "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END")
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        # недоступная реплика считается отставшей
+        return None
+    return float(lag or 0)
+
+
+class PrimaryReplicaRouter:
+    """
+    Database router: reads of catalog models go to a replica that is no more than
+    REPLICA_MAX_LAG_SECONDS behind, everything else to the primary. Reads inside
+    transaction.atomic() and after a write in the same request stay on the primary.
+    """
+    app_label = 'catalog'
+
+    def lag(self, alias):
+        return replica_lag(alias)
+
+    def _healthy(self, alias):
+        lag = self.lag(alias)
+        return lag is not None and lag <= getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != self.app_label:
+            return None
+        state = get_state()
+        # внутри транзакции на primary чтения должны видеть ее же изменения
+        if state.pinned or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None or not self._healthy(state.replica):
+            healthy = [alias for alias in replicas() if self._healthy(alias)]
+            # все реплики отстали - читаем с primary
+            state.replica = random.choice(healthy) if healthy else None
+        return state.replica or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != self.app_label:
+            return None
+        # db_for_write вызывается и для select_for_update()/get_or_create() - они тоже
+        # должны видеть свежие данные, поэтому дальше читаем с primary
+        get_state().wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики содержат те же данные, что и primary
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схема реплик приходит с primary вместе с репликацией
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Reads of a request go to the primary if the request is not GET/HEAD/OPTIONS or
+    the user wrote something in the last REPLICA_STICKY_SECONDS seconds (remembered
+    in a cookie). The cookie is not signed: forging it only moves reads to the primary.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        now = time.time()
+        try:
+            pinned_until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        state = RoutingState(pinned=request.method not in ('GET', 'HEAD', 'OPTIONS') or pinned_until > now)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            sticky = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(STICKY_COOKIE, '%.3f' % (now + sticky), max_age=sticky, httponly=True,
+                                samesite='Lax')
+        return response
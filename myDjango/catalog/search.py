@@ -0,0 +1,164 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.db import connection
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.html import escape
+
+from .models import Author, Book, Genre
+
+# дальше этой страницы результаты не листаются: OFFSET растет с номером страницы,
+# а огромный номер переполнил бы integer в базе
+MAX_PAGE = 1000
+HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2'
+
+# На PostgreSQL поиск идет по колонкам search_vector (tsvector + GIN, см. миграцию 0010)
+# и по триграммным GIN-индексам, поэтому не нужен последовательный просмотр таблиц.
+# Внутренний запрос (page) выбирает только вид, id и ранг и режет их LIMIT/OFFSET;
+# ts_headline - самая дорогая часть - считается во внешнем запросе только для
+# строк страницы, а не для каждого совпадения.
+# Текст экранируется до ts_headline, чтобы в подсветку не попал чужой HTML.
+POSTGRES_SEARCH_SQL = """
+WITH q AS (SELECT plainto_tsquery('simple', %(query)s) AS query),
+page AS (
+    SELECT 'book' AS kind, b.id, ts_rank_cd(b.search_vector, q.query) + similarity(b.title, %(query)s) AS rank
+      FROM catalog_book b, q
+     WHERE b.search_vector @@ q.query OR b.title %% %(query)s
+    UNION ALL
+    SELECT 'author', a.id, ts_rank_cd(a.search_vector, q.query) + similarity(a.last_name, %(query)s)
+      FROM catalog_author a, q
+     WHERE a.search_vector @@ q.query OR a.last_name %% %(query)s
+    UNION ALL
+    SELECT 'genre', g.id, similarity(g.name, %(query)s)
+      FROM catalog_genre g
+     WHERE g.name %% %(query)s OR g.name ILIKE '%%' || %(query)s || '%%'
+    ORDER BY rank DESC, kind, id
+    LIMIT %(limit)s OFFSET %(offset)s
+)
+SELECT page.kind, page.id,
+       CASE page.kind WHEN 'book' THEN b.title
+                      WHEN 'author' THEN a.last_name || ', ' || a.first_name
+                      ELSE g.name END,
+       page.rank,
+       CASE page.kind WHEN 'book' THEN ts_headline('simple', {escaped_summary}, q.query, %(options)s)
+                      WHEN 'author' THEN ts_headline('simple', {escaped_name}, q.query, %(options)s)
+                      ELSE '' END
+  FROM page CROSS JOIN q
+  LEFT JOIN catalog_book b ON page.kind = 'book' AND b.id = page.id
+  LEFT JOIN catalog_author a ON page.kind = 'author' AND a.id = page.id
+  LEFT JOIN catalog_genre g ON page.kind = 'genre' AND g.id = page.id
+ ORDER BY page.rank DESC, page.kind, page.id
+""".format(
+    escaped_summary="replace(replace(replace(b.summary, '&', '&amp;'), '<', '&lt;'), '>', '&gt;')",
+    escaped_name="replace(replace(replace(a.last_name || ', ' || a.first_name, "
+                 "'&', '&amp;'), '<', '&lt;'), '>', '&gt;')",
+)
+
+
+class SearchResults:
+    """
+    One page of search results: a list of dicts with kind, id, label, url, rank
+    and a headline (HTML-safe, matches wrapped in <mark>).
+    """
+
+    def __init__(self, query, results, page, per_page, has_next):
+        self.query = query
+        self.results = results
+        self.page = page
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_previous = page > 1
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+
+def _url(kind, pk):
+    if kind == 'book':
+        return reverse('book-detail', args=[pk])
+    if kind == 'author':
+        return reverse('author-detail', args=[pk])
+    return None
+
+
+def search_catalog(query, page=1, per_page=10):
+    """
+    Searches books (title, summary), authors (names) and genres (name).
+    Pagination asks for one extra row instead of counting all matches.
+    """
+    query = ' '.join(query.split())
+    page = min(max(int(page), 1), MAX_PAGE)
+    if not query:
+        return SearchResults(query, [], page, per_page, has_next=False)
+
+    offset = (page - 1) * per_page
+    if connection.vendor == 'postgresql':
+        rows = _search_postgres(query, offset, per_page + 1)
+    else:
+        rows = _search_fallback(query, offset, per_page + 1)
+
+    results = [dict(row, url=_url(row['kind'], row['id'])) for row in rows[:per_page]]
+    return SearchResults(query, results, page, per_page, has_next=len(rows) > per_page)
+
+
+def _search_postgres(query, offset, limit):
+    params = {'query': query, 'options': HEADLINE_OPTIONS, 'limit': limit, 'offset': offset}
+    with connection.cursor() as cursor:
+        cursor.execute(POSTGRES_SEARCH_SQL, params)
+        return [{'kind': kind, 'id': pk, 'label': label, 'rank': rank, 'headline': headline}
+                for kind, pk, label, rank, headline in cursor.fetchall()]
+
+
+def _highlight(text, terms):
+    # одно регулярное выражение на все слова, чтобы не подсвечивать уже вставленные <mark>
+    pattern = '|'.join(re.escape(escape(term)) for term in sorted(terms, key=len, reverse=True))
+    return re.sub('(%s)' % pattern, r'<mark>\1</mark>', escape(text), flags=re.IGNORECASE)
+
+
+def _rank(terms, weighted_texts):
+    # совпадение целого слова весит больше, чем совпадение части слова
+    rank = 0.0
+    for text, weight in weighted_texts:
+        text = text.lower()
+        for term in terms:
+            term = term.lower()
+            words = len(re.findall(r'\b%s\b' % re.escape(term), text))
+            rank += weight * (words + 0.5 * text.count(term))
+    return rank
+
+
+def _search_fallback(query, offset, limit):
+    """
+    icontains search for databases without tsvector/pg_trgm (SQLite in the tests).
+    Every word of the query must match; ranking and highlighting are done in Python
+    over the first matches of each kind, so it is only meant for small databases.
+    """
+    terms = query.split()
+    wanted = offset + limit
+
+    def matching(fields):
+        return reduce(and_, [reduce(or_, [Q(**{'%s__icontains' % field: term}) for field in fields])
+                             for term in terms])
+
+    rows = []
+    for pk, title, summary in (Book.objects.filter(matching(('title', 'summary')))
+                               .values_list('id', 'title', 'summary')[:wanted]):
+        rows.append({'kind': 'book', 'id': pk, 'label': title,
+                     'rank': _rank(terms, [(title, 1.0), (summary, 0.4)]),
+                     'headline': _highlight(summary[:300], terms)})
+    for pk, first_name, last_name in (Author.objects.filter(matching(('first_name', 'last_name')))
+                                      .values_list('id', 'first_name', 'last_name')[:wanted]):
+        label = '%s, %s' % (last_name, first_name)
+        rows.append({'kind': 'author', 'id': pk, 'label': label,
+                     'rank': _rank(terms, [(label, 1.0)]), 'headline': _highlight(label, terms)})
+    for pk, name in Genre.objects.filter(matching(('name', ))).values_list('id', 'name')[:wanted]:
+        rows.append({'kind': 'genre', 'id': pk, 'label': name, 'rank': _rank(terms, [(name, 1.0)]),
+                     'headline': ''})
+
+    rows.sort(key=lambda row: (-row['rank'], row['kind'], row['id']))
+    return rows[offset:offset + limit]
@@ -0,0 +1,121 @@
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .changes import copy_changed, touch_books
+from .models import BookInstance
+
+# Выдача и возврат экземпляров. Свободный экземпляр захватывается через
+# SELECT ... FOR UPDATE SKIP LOCKED: параллельные выдачи одной книги берут
+# разные строки, не дожидаясь друг друга. Сама смена статуса - UPDATE с условием
+# на прежний статус (compare-and-set), поэтому экземпляр не выдается дважды и на
+# базах без блокировок строк (SQLite), и при правках мимо сервиса (admin).
+#
+# Счетчики книги обновляются в той же транзакции, что и экземпляр, поэтому всегда
+# с ним согласованы. Счетчики каталога пишутся в шард CatalogStatsShard книги
+# (catalog/stats.py), а не в единственную строку CatalogStats: выдачи разных книг
+# не ждут друг друга, а выдачи одной книги и так идут по очереди из-за строки книги.
+#
+# Порядок блокировок всегда один: экземпляр, книга (счетчики), шард статистики -
+# так транзакции могут ждать друг друга, но не взаимно блокироваться.
+
+LOAN_PERIOD = datetime.timedelta(weeks=3)
+# сколько свободных экземпляров пробовать, если их статус успели поменять
+CHECKOUT_ATTEMPTS = 5
+
+
+class LoanError(Exception):
+    pass
+
+
+class NoCopyAvailable(LoanError):
+    pass
+
+
+class NotOnLoan(LoanError):
+    pass
+
+
+def _transition(copy_id, book_id, old_status, new_status, **fields):
+    """
+    Moves the copy from ``old_status`` to ``new_status`` if it is still in
+    ``old_status`` and updates the counters. Returns False if another
+    transaction changed the status first.
+    """
+    changed = (BookInstance.objects.filter(pk=copy_id, status=old_status)
+               .update(status=new_status, last_modified=timezone.now(), **fields))
+    if changed:
+        # update() не посылает сигналов - счетчики обновляются здесь
+        copy_changed(book_id, new=new_status, old=old_status)
+    return bool(changed)
+
+
+def checkout(book_id, borrower, due_back=None):
+    """
+    Lends any available copy of the book to ``borrower`` until ``due_back``
+    (LOAN_PERIOD from today by default) and returns the copy.
+    Raises NoCopyAvailable if every copy is taken.
+    """
+    due_back = due_back or datetime.date.today() + LOAN_PERIOD
+    tried = []
+    with transaction.atomic():
+        for attempt in range(CHECKOUT_ATTEMPTS):
+            # строки, заблокированные другими выдачами, пропускаются (SKIP LOCKED)
+            copy_id = (BookInstance.objects.select_for_update(skip_locked=True)
+                       .filter(book_id=book_id, status='a').exclude(pk__in=tried)
+                       .order_by('pk').values_list('pk', flat=True).first())
+            if copy_id is None:
+                break
+            if _transition(copy_id, book_id, 'a', 'o', borrower=borrower, due_back=due_back):
+                return BookInstance.objects.get(pk=copy_id)
+            tried.append(copy_id)
+    raise NoCopyAvailable('No available copies of book %s' % book_id)
+
+
+def return_copy(copy_id):
+    """
+    Marks the copy as returned and available again and returns it.
+    Raises BookInstance.DoesNotExist or NotOnLoan.
+    """
+    with transaction.atomic():
+        row = BookInstance.objects.select_for_update().filter(pk=copy_id).values_list('book_id', 'status').first()
+        if row is None:
+            raise BookInstance.DoesNotExist('No copy %s' % copy_id)
+        book_id, status = row
+        if status != 'o' or not _transition(copy_id, book_id, 'o', 'a', borrower=None, due_back=None):
+            raise NotOnLoan('Copy %s is not on loan' % copy_id)
+        return BookInstance.objects.get(pk=copy_id)
+
+
+# результаты продления по каждому экземпляру
+RENEWED = 'renewed'
+NOT_ON_LOAN = 'not_on_loan'
+NOT_FOUND = 'not_found'
+
+
+def renew_loans(copy_ids, due_back):
+    """
+    Moves the due date of every copy on loan among ``copy_ids`` to ``due_back``
+    with a single UPDATE and returns {copy_id: RENEWED | NOT_ON_LOAN | NOT_FOUND}
+    in the order of ``copy_ids``. The date is validated by the caller
+    (BulkRenewForm).
+    """
+    copy_ids = list(copy_ids)
+    with transaction.atomic():
+        # блокировка строк, чтобы отчет совпадал с тем, что изменит UPDATE
+        rows = list(BookInstance.objects.select_for_update().filter(pk__in=copy_ids).order_by('pk')
+                    .values_list('pk', 'status', 'book_id'))
+        found = {pk: status for pk, status, _ in rows}
+        on_loan = [pk for pk, status, _ in rows if status == 'o']
+        if on_loan:
+            BookInstance.objects.filter(pk__in=on_loan).update(due_back=due_back, last_modified=timezone.now())
+            # срок возврата виден на странице книги (кэш фрагмента по версии книги)
+            touch_books(book_id for _, status, book_id in rows if status == 'o')
+    results = {}
+    for pk in copy_ids:
+        if pk not in found:
+            results[pk] = NOT_FOUND
+        else:
+            results[pk] = RENEWED if found[pk] == 'o' else NOT_ON_LOAN
+    return results
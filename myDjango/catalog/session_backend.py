@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+
+# Служебный ключ внутри закэшированных данных сессии: сколько изменений
+# накоплено только в кэше и когда сессия последний раз записывалась в базу
+FLUSH_STATE_KEY = '_catalog_flush_state'
+MISSING = object()
+
+
+class SessionStore(cached_db.SessionStore):
+    """
+    cached_db session store that coalesces writes of counter-like keys.
+
+    When a request changes only keys listed in settings.SESSION_COALESCED_KEYS
+    (e.g. num_visits) the session is written to the cache alone; the database row
+    is updated every SESSION_FLUSH_EVERY such saves or SESSION_FLUSH_INTERVAL
+    seconds, whichever comes first. Any other change (login, logout, messages...)
+    is written through to the database at once, so authentication survives a
+    restart of the workers or of the cache. If the cache loses a session, at most
+    the coalesced changes since the last flush are lost.
+    """
+    cache_key_prefix = 'catalog.session_backend'
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # данные в том виде, в каком они были загружены - для поиска изменений
+        self._loaded_data = None
+        self._flush_state = None
+
+    def _new_flush_state(self):
+        return {'pending': 0, 'flushed_at': time.time()}
+
+    def load(self):
+        data = super().load()
+        self._flush_state = data.pop(FLUSH_STATE_KEY, None) or self._new_flush_state()
+        self._loaded_data = dict(data)
+        return data
+
+    def _changed_keys(self):
+        keys = set(self._session) | set(self._loaded_data)
+        return {key for key in keys if self._session.get(key, MISSING) != self._loaded_data.get(key, MISSING)}
+
+    def _can_coalesce(self):
+        # загружает сессию, если ее еще не читали (несуществующая сессия сбрасывает ключ)
+        self._get_session()
+        if self.session_key is None or self._loaded_data is None:
+            return False
+        if not self._changed_keys() <= set(getattr(settings, 'SESSION_COALESCED_KEYS', ())):
+            return False
+        state = self._flush_state
+        return (state['pending'] + 1 < getattr(settings, 'SESSION_FLUSH_EVERY', 20)
+                and time.time() - state['flushed_at'] < getattr(settings, 'SESSION_FLUSH_INTERVAL', 300))
+
+    def save(self, must_create=False):
+        if not must_create and self._can_coalesce():
+            self._flush_state['pending'] += 1
+            data = dict(self._session)
+            data[FLUSH_STATE_KEY] = self._flush_state
+            self._cache.set(self.cache_key, data, self.get_expiry_age())
+            return
+        super().save(must_create)
+        self._flush_state = self._new_flush_state()
+        self._loaded_data = dict(self._session)
@@ -0,0 +1,182 @@
+from django.contrib.auth.models import Group, Permission, User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .changes import bump_catalog_version, copy_changed, touch_authors, touch_books
+from .models import Author, Book, BookInstance, Genre
+from .permissions import invalidate_all, invalidate_user
+from .stats import bump_stats
+
+
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=BookInstance)
+def tracked_pre_save(sender, instance, raw, **kwargs):
+    """
+    Makes sure the previous values of TRACKED_FIELDS are known for objects that were
+    not loaded with them (e.g. loaded with only()/defer()), so that post_save can
+    compute the counter deltas and touch the previous parent too.
+    """
+    if instance._state.adding or raw:
+        return
+    loaded_values = dict(getattr(instance, '_loaded_values', None) or {})
+    missing = [name for name in sender.TRACKED_FIELDS if name not in loaded_values]
+    if missing:
+        row = sender.objects.filter(pk=instance.pk).values(*missing).first()
+        loaded_values.update(row or dict.fromkeys(missing))
+    instance._loaded_values = loaded_values
+
+
+def _remember_tracked(instance):
+    # запоминаем текущие значения, чтобы следующий save() считался от них
+    instance._loaded_values = {name: getattr(instance, name) for name in instance.TRACKED_FIELDS}
+
+
+@receiver(post_save, sender=BookInstance)
+def bookinstance_saved(sender, instance, created, **kwargs):
+    loaded_values = getattr(instance, '_loaded_values', {})
+    if created:
+        copy_changed(instance.book_id, new=instance.status)
+    else:
+        old_status, old_book_id = loaded_values.get('status'), loaded_values.get('book_id')
+        if old_book_id == instance.book_id:
+            copy_changed(instance.book_id, new=instance.status, old=old_status)
+        else:
+            # экземпляр перенесли к другой книге - меняются обе
+            copy_changed(old_book_id, old=old_status)
+            copy_changed(instance.book_id, new=instance.status)
+    _remember_tracked(instance)
+
+
+@receiver(post_delete, sender=BookInstance)
+def bookinstance_deleted(sender, instance, **kwargs):
+    loaded_values = getattr(instance, '_loaded_values', {})
+    copy_changed(loaded_values.get('book_id', instance.book_id), old=loaded_values.get('status', instance.status))
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, created, **kwargs):
+    if created:
+        bump_stats(num_books=1)
+    bump_catalog_version()
+    touch_authors([instance.author_id, getattr(instance, '_loaded_values', {}).get('author_id')])
+    _remember_tracked(instance)
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    bump_stats(num_books=-1)
+    bump_catalog_version()
+    touch_authors([instance.author_id])
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def book_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    bump_catalog_version()
+    if not reverse:
+        touch_books([instance.pk])
+    elif pk_set:
+        touch_books(pk_set)
+    else:
+        # genre.book_set.clear() - список книг уже не известен
+        touch_books(Book.objects.filter(genre=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Genre)
+def genre_saved(sender, instance, created, **kwargs):
+    bump_catalog_version()
+    # название жанра показывается на странице книги
+    if not created:
+        Book.objects.filter(genre=instance).update(last_modified=timezone.now())
+
+
+@receiver(pre_delete, sender=Genre)
+def genre_deleted(sender, instance, **kwargs):
+    bump_catalog_version()
+    # после удаления связи с жанром уже не найти
+    Book.objects.filter(genre=instance).update(last_modified=timezone.now())
+
+
+@receiver(post_save, sender=Author)
+def author_saved(sender, instance, created, **kwargs):
+    bump_catalog_version()
+    if created:
+        bump_stats(num_authors=1)
+
+
+@receiver(post_delete, sender=Author)
+def author_deleted(sender, instance, **kwargs):
+    bump_catalog_version()
+    bump_stats(num_authors=-1)
+
+
+@receiver(pre_delete, sender=Author)
+def author_pre_delete(sender, instance, **kwargs):
+    # книги удаленного автора остаются (SET_NULL), но уже без автора
+    Book.objects.filter(author=instance).update(last_modified=timezone.now())
+
+
+# Инвалидация снимков прав (catalog/permissions.py)
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_membership_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, User):
+        invalidate_user(instance.pk)
+    elif action == 'post_clear' or not pk_set:
+        # group.user_set.clear() - неизвестно какие пользователи были в группе
+        invalidate_all()
+    else:
+        for user_id in pk_set:
+            invalidate_user(user_id)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_all()
+
+
+# поля пользователя, от которых зависит снимок прав
+USER_SNAPSHOT_FIELDS = ('is_active', 'is_superuser')
+
+
+@receiver(pre_save, sender=User)
+def user_pre_save(sender, instance, raw, update_fields, **kwargs):
+    """
+    Remembers the previous is_active / is_superuser of the user, unless the
+    save cannot change them (a new user, or update_fields without them, e.g.
+    the last_login update on every login).
+    """
+    instance._snapshot_fields = None
+    if instance._state.adding or raw:
+        return
+    if update_fields is not None and not set(USER_SNAPSHOT_FIELDS) & set(update_fields):
+        return
+    instance._snapshot_fields = User.objects.filter(pk=instance.pk).values_list(*USER_SNAPSHOT_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_snapshot_fields', None)
+    # у нового пользователя может оказаться id строки из откаченной транзакции,
+    # для которой в кэше остался снимок
+    if created or (previous is not None
+                   and previous != tuple(getattr(instance, name) for name in USER_SNAPSHOT_FIELDS)):
+        invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def group_or_permission_changed(sender, **kwargs):
+    invalidate_all()
@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import Author, Book, BookInstance, CatalogStats, CatalogStatsShard
+
+# Счетчики хранятся в строке таблицы CatalogStats, поэтому домашняя страница
+# читает одну строку вместо COUNT(*) по таблицам. Счетчики экземпляров меняет
+# каждая выдача и возврат: их изменения пишутся не в эту строку, а в одну из
+# STATS_SHARDS строк CatalogStatsShard (по id книги), и параллельные выдачи
+# разных книг не ждут друг друга на одной строке. Итог - строка плюс сумма шардов,
+# все в одной выборке. rebuild_stats() переносит итог в строку и обнуляет шарды.
+STATS_PK = 1
+STATS_SHARDS = 16
+SHARDED_FIELDS = ('num_instances', 'num_instances_available')
+
+
+def _shard_sum(field):
+    return RawSQL('SELECT COALESCE(SUM(%s), 0) FROM %s' % (field, CatalogStatsShard._meta.db_table), ())
+
+
+def get_stats():
+    """
+    Returns the counters row with the shards added to its copy counters,
+    rebuilding it from scratch if it does not exist yet. The returned object
+    holds totals and must not be saved.
+    """
+    stats = (CatalogStats.objects.filter(pk=STATS_PK)
+             .annotate(**{'shard_%s' % name: _shard_sum(name) for name in SHARDED_FIELDS}).first())
+    if stats is None:
+        return rebuild_stats()
+    for name in SHARDED_FIELDS:
+        setattr(stats, name, getattr(stats, name) + getattr(stats, 'shard_%s' % name))
+    return stats
+
+
+def rebuild_stats():
+    """
+    Recomputes every counter with COUNT(*) queries, stores the result and
+    resets the shards.
+    """
+    with transaction.atomic():
+        CatalogStatsShard.objects.bulk_create([CatalogStatsShard(pk=shard) for shard in range(1, STATS_SHARDS + 1)],
+                                              ignore_conflicts=True)
+        CatalogStatsShard.objects.update(**{name: 0 for name in SHARDED_FIELDS})
+        stats, _ = CatalogStats.objects.update_or_create(
+            pk=STATS_PK,
+            defaults={
+                'num_books': Book.objects.count(),
+                'num_instances': BookInstance.objects.count(),
+                'num_instances_available': BookInstance.objects.filter(status__exact='a').count(),
+                'num_authors': Author.objects.count(),
+                'rebuilt_at': timezone.now(),
+            })
+    return stats
+
+
+def bump_stats(shard_key=None, **deltas):
+    """
+    Atomically adds the given deltas to the counters, e.g. bump_stats(num_books=1).
+    Copy counters go to the shard chosen by ``shard_key`` (the book id).
+    If the row does not exist yet nothing is written: get_stats() will rebuild it.
+    """
+    changes = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    sharded = {name: change for name, change in changes.items() if name in SHARDED_FIELDS}
+    if sharded and shard_key is not None:
+        shard = shard_key % STATS_SHARDS + 1
+        if CatalogStatsShard.objects.filter(pk=shard).update(**sharded):
+            changes = {name: change for name, change in changes.items() if name not in sharded}
+        # шарда нет (не создан после очистки таблицы) - изменение пишется в строку
+    if changes:
+        CatalogStats.objects.filter(pk=STATS_PK).update(**changes)
@@ -0,0 +1,182 @@
+import gzip
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Статика каталога (свои css и Bootstrap/jQuery из catalog/static/catalog/vendor)
+# собирается collectstatic в STATIC_ROOT:
+# - ManifestStaticFilesStorage добавляет к имени каждого файла хэш содержимого
+#   (style.css -> style.1a2b3c4d5e6f.css) и переписывает url() внутри css,
+#   {% static %} отдает имена с хэшем
+# - рядом с текстовыми файлами кладутся сжатые варианты .gz и .br, чтобы не сжимать
+#   их на каждый запрос. Для .br нужен пакет brotli (pip install brotli); без него
+#   collectstatic пишет предупреждение и сохраняет только .gz
+# Раз имя меняется вместе с содержимым, файлы с хэшем кэшируются браузером навсегда.
+
+# расширения, которые имеет смысл сжимать (woff2, png, jpg уже сжаты)
+COMPRESSIBLE = ('.css', '.js', '.svg', '.eot', '.ttf', '.txt', '.html', '.json', '.xml', '.map', '.ico')
+# сжатый вариант сохраняется, только если он заметно меньше оригинала
+MIN_SAVING = 0.95
+# год - дольше браузеры все равно не хранят
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# name.0123456789ab.ext - имя, к которому ManifestStaticFilesStorage добавил хэш
+HASHED_NAME = re.compile(r'^(?P<root>.+)\.[0-9a-f]{12}(?P<ext>\.[^./]+)?$')
+# суффикс сжатого варианта -> Content-Encoding
+ENCODINGS = {'.br': 'br', '.gz': 'gzip'}
+
+
+def _compressors():
+    # (расширение, функция) - в порядке предпочтения при выборе варианта
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+    # mtime=0 - одинаковое содержимое дает одинаковый .gz при каждом collectstatic
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also writes gzip and Brotli variants of every
+    compressible file next to it at collectstatic time.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = {}
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                names[name] = hashed_name
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        if brotli is None:
+            logger.warning('brotli is not installed: static files get only .gz variants, no .br')
+        for name, hashed_name in names.items():
+            # копия без хэша тоже отдается (например, ссылки из чужих файлов) - сжимаются обе
+            for path in dict.fromkeys([name, hashed_name]):
+                for compressed_name in self.compress(path):
+                    yield name, compressed_name, True
+
+    def compress(self, name):
+        """
+        Writes the compressed variants of ``name`` that are noticeably smaller
+        than the file and returns their names.
+        """
+        if not name.lower().endswith(COMPRESSIBLE):
+            return []
+        with self.open(name) as original:
+            data = original.read()
+        written = []
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            if len(compressed) >= len(data) * MIN_SAVING:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            written.append(self._save(name + suffix, ContentFile(compressed)))
+        return written
+
+    def url(self, name, force=False):
+        # без collectstatic манифеста нет (тесты, свежий checkout) - тогда ссылка без хэша,
+        # а не ValueError на каждой странице
+        if not self.hashed_files:
+            return FileSystemStorage.url(self, name)
+        return super().url(name, force)
+
+
+def accepted_encodings(header):
+    """
+    Content codings from an Accept-Encoding header that the client accepts
+    (q > 0).
+    """
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def is_hashed(name):
+    """
+    True if ``name`` is a fingerprinted name from the staticfiles manifest.
+    """
+    match = HASHED_NAME.match(name)
+    if match is None:
+        return False
+    original = match.group('root') + (match.group('ext') or '')
+    return staticfiles_storage.hashed_files.get(original) == name
+
+
+@require_safe
+def serve_static(request, path):
+    """
+    Serves a collected static file from STATIC_ROOT: the Brotli or gzip
+    variant if the client accepts it, and a year of immutable caching for
+    fingerprinted names. In DEBUG falls back to the app directories, as
+    django.contrib.staticfiles does.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path) if settings.STATIC_ROOT else None
+    except SuspiciousFileOperation:
+        raise Http404('"%s" does not exist' % path)
+    if fullpath is None or not os.path.isfile(fullpath):
+        if settings.DEBUG:
+            from django.contrib.staticfiles.views import serve
+            return serve(request, path)
+        raise Http404('"%s" does not exist' % path)
+
+    statobj = os.stat(fullpath)
+    hashed = is_hashed(path)
+    if not hashed and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                                             statobj.st_mtime, statobj.st_size):
+        return HttpResponseNotModified()
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    encoding = None
+    for suffix, compress in _compressors():
+        if ENCODINGS[suffix] in accepted and os.path.isfile(fullpath + suffix):
+            fullpath, encoding = fullpath + suffix, ENCODINGS[suffix]
+            break
+
+    response = FileResponse(open(fullpath, 'rb'), content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if path.lower().endswith(COMPRESSIBLE):
+        # кэши между клиентом и сервером должны хранить варианты отдельно
+        response['Vary'] = 'Accept-Encoding'
+    if hashed:
+        response['Cache-Control'] = 'public, max-age=%s, immutable' % IMMUTABLE_MAX_AGE
+    else:
+        # имя без хэша может указывать на новое содержимое - браузер каждый раз проверяет
+        response['Cache-Control'] = 'no-cache'
+        response['Last-Modified'] = http_date(statobj.st_mtime)
+    return response
@@ -0,0 +1,150 @@
+import datetime
+import random
+import uuid
+from array import array
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .changes import rebuild_copy_counters
+from .importers import CatalogImporter
+from .models import Author, Book, Genre
+from .stats import rebuild_stats
+from .uuids import uuid7_from
+
+# Распределения подобраны "как в настоящей библиотеке": у немногих авторов много
+# книг, у популярных книг много экземпляров, большая часть экземпляров на полке,
+# заметная часть на руках, и примерно каждый пятый выданный экземпляр просрочен.
+STATUS_WEIGHTS = (('a', 60), ('o', 25), ('m', 10), ('r', 5))
+OVERDUE_SHARE = 0.2
+FIRST_NAMES = ('Anna', 'Boris', 'Clara', 'David', 'Elena', 'Fedor', 'Grace', 'Henry', 'Irina', 'John',
+               'Karl', 'Lev', 'Maria', 'Nikolai', 'Olga', 'Peter', 'Rosa', 'Sergei', 'Tatiana', 'Victor')
+WORDS = ('war', 'peace', 'river', 'night', 'garden', 'winter', 'city', 'stone', 'light', 'house',
+         'letters', 'storm', 'island', 'journey', 'silence', 'mirror', 'road', 'summer', 'forest', 'sea')
+
+
+def _skewed(rng, size, power=2.0):
+    # индекс в [0, size) с перекосом к началу: первые элементы выбираются чаще
+    return min(int(size * rng.random() ** power), size - 1)
+
+
+class SyntheticCatalog:
+    """
+    Deterministic generator of a large catalog: the same seed and volumes give
+    the same rows. Everything is inserted with bulk_create (COPY for book
+    instances on PostgreSQL) in batches, so memory does not grow with the volume
+    except for the lists of author and book ids.
+    """
+
+    def __init__(self, authors=1000, books=10000, instances=100000, genres=30, borrowers=500, seed=1,
+                 batch_size=10000, today=None, use_copy=True, progress=None, key_version=7):
+        self.volumes = {'authors': authors, 'books': books, 'instances': instances, 'genres': genres,
+                        'borrowers': borrowers}
+        self.seed = seed
+        self.batch_size = batch_size
+        self.today = today or datetime.date.today()
+        self.importer = CatalogImporter(batch_size=batch_size, use_copy=use_copy)
+        self.progress = progress or (lambda kind, count: None)
+        self.rng = random.Random(seed)
+        # ключи экземпляров: 7 - упорядоченные по времени, как у BookInstance по умолчанию, 4 - случайные
+        self.key_version = key_version
+        # "часы" детерминированных uuid7: полночь ``today``, по миллисекунде на экземпляр
+        self.clock_ms = int(datetime.datetime.combine(self.today, datetime.time()).timestamp() * 1000)
+
+    def generate(self):
+        genre_ids = self.create_genres()
+        borrower_ids = self.create_borrowers()
+        author_ids = self.create_authors()
+        book_ids = self.create_books(author_ids, genre_ids)
+        self.create_instances(book_ids, borrower_ids)
+        # bulk_create и COPY не вызывают сигналы, поэтому счетчики пересчитываются целиком
+        rebuild_copy_counters(batch_size=self.batch_size)
+        rebuild_stats()
+        return dict(self.volumes)
+
+    def _batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(start + self.batch_size, total)
+
+    def _ids(self, queryset, created):
+        # последние ``created`` строк - только что вставленные (id растут)
+        ids = array('q', queryset.order_by('-pk').values_list('pk', flat=True)[:created])
+        ids.reverse()
+        return ids
+
+    def create_genres(self):
+        count = self.volumes['genres']
+        Genre.objects.bulk_create([Genre(name='Genre %s-%s' % (self.seed, num)) for num in range(count)])
+        return self._ids(Genre.objects.all(), count)
+
+    def create_borrowers(self):
+        count = self.volumes['borrowers']
+        for start, stop in self._batches(count):
+            # без пароля (set_unusable_password) - хэширование миллиона паролей заняло бы часы
+            users = [User(username='reader-%s-%s' % (self.seed, num)) for num in range(start, stop)]
+            for user in users:
+                user.set_unusable_password()
+            User.objects.bulk_create(users)
+        self.progress('borrowers', count)
+        return self._ids(User.objects.all(), count)
+
+    def create_authors(self):
+        count, rng = self.volumes['authors'], self.rng
+        for start, stop in self._batches(count):
+            authors = []
+            for num in range(start, stop):
+                born = datetime.date(1700, 1, 1) + datetime.timedelta(days=rng.randrange(300 * 365))
+                died = born + datetime.timedelta(days=rng.randrange(30 * 365, 90 * 365)) if rng.random() < 0.7 else None
+                authors.append(Author(first_name=rng.choice(FIRST_NAMES), last_name='Author %s-%s' % (self.seed, num),
+                                      date_of_birth=born, date_of_death=died))
+            Author.objects.bulk_create(authors)
+            self.progress('authors', stop)
+        return self._ids(Author.objects.all(), count)
+
+    def create_books(self, author_ids, genre_ids):
+        count, rng = self.volumes['books'], self.rng
+        Through = Book.genre.through
+        book_ids = array('q')
+        for start, stop in self._batches(count):
+            books = []
+            for num in range(start, stop):
+                title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).capitalize()
+                books.append(Book(title=title, summary=' '.join(rng.choice(WORDS) for _ in range(rng.randint(10, 60))),
+                                  isbn='%013d' % (self.seed * 10 ** 9 + num),
+                                  author_id=author_ids[_skewed(rng, len(author_ids))] if author_ids else None))
+            with transaction.atomic():
+                Book.objects.bulk_create(books)
+                ids = self._ids(Book.objects.all(), len(books))
+                links = [Through(book_id=book_id, genre_id=genre_id) for book_id in ids
+                         for genre_id in rng.sample(list(genre_ids), min(len(genre_ids), rng.randint(1, 3)))]
+                Through.objects.bulk_create(links)
+            book_ids.extend(ids)
+            self.progress('books', stop)
+        return book_ids
+
+    def _key(self):
+        if self.key_version == 4:
+            return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+        self.clock_ms += 1
+        return uuid7_from(self.clock_ms, self.rng.getrandbits(12), self.rng.getrandbits(62))
+
+    def _instance_row(self, book_ids, borrower_ids):
+        rng = self.rng
+        status = rng.choices([status for status, _ in STATUS_WEIGHTS], [weight for _, weight in STATUS_WEIGHTS])[0]
+        due_back, borrower_id = None, None
+        if status == 'o':
+            if rng.random() < OVERDUE_SHARE:
+                due_back = self.today - datetime.timedelta(days=rng.randint(1, 60))
+            else:
+                due_back = self.today + datetime.timedelta(days=rng.randint(0, 21))
+            borrower_id = borrower_ids[rng.randrange(len(borrower_ids))] if borrower_ids else None
+        return (self._key(), book_ids[_skewed(rng, len(book_ids))],
+                'Imprint %s' % rng.randint(1950, 2020), status, due_back, borrower_id)
+
+    def create_instances(self, book_ids, borrower_ids):
+        count = self.volumes['instances'] if book_ids else 0
+        for start, stop in self._batches(count):
+            rows = [self._instance_row(book_ids, borrower_ids) for _ in range(start, stop)]
+            with transaction.atomic():
+                self.importer.insert_instances(rows)
+            self.progress('instances', stop)
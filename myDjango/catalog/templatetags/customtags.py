@@ -1,8 +1,46 @@
 from django import template
+from django.utils.safestring import mark_safe
+
+from ..pagecache import HOLE_MARKER, HOLES_VAR
+from ..permissions import get_snapshot
 
 register = template.Library()
 
 
+# группы берутся из снимка прав пользователя (catalog/permissions.py),
+# а не отдельным EXISTS-запросом на каждый вызов
 @register.filter(name='has_group')
 def has_group(user, group_name):
-    return user.groups.filter(name=group_name).exists()
+    return get_snapshot(user).has_group(group_name)
+
+
+@register.filter(name='group_names')
+def group_names(user):
+    return get_snapshot(user).groups
+
+
+# формирует query string текущего запроса с замененными параметрами,
+# чтобы ссылки пагинации не теряли остальные GET-параметры
+# пример: {% url_replace request cursor=page_obj.next_cursor %}
+@register.simple_tag
+def url_replace(request, **kwargs):
+    query = request.GET.copy()
+    # ?page=N и ?cursor=... взаимоисключающие
+    query.pop('page', None)
+    for key, value in kwargs.items():
+        if value is None:
+            query.pop(key, None)
+        else:
+            query[key] = value
+    return query.urlencode()
+
+
+# часть страницы, которая зависит от пользователя: при рендеринге для общего
+# кэша страниц (catalog/pagecache.py) вместо нее остается маркер, который
+# заполняется при каждом запросе, иначе шаблон рендерится на месте
+# пример: {% user_hole "catalog/includes/user_nav.html" %}
+@register.simple_tag(takes_context=True)
+def user_hole(context, template_name):
+    if context.get(HOLES_VAR):
+        return mark_safe(HOLE_MARKER % template_name)
+    return context.template.engine.get_template(template_name).render(context)
@@ -0,0 +1,114 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..changes import rebuild_copy_counters
+from ..models import Author, Book, BookInstance, Genre
+from ..pagination import EstimatedCountPaginator
+
+
+class AdminChangelistTest(TestCase):
+
+    def setUp(self):
+        User.objects.create_superuser(username='admin', password='12345', email='admin@example.com')
+        self.client.login(username='admin', password='12345')
+        self.genres = [Genre.objects.create(name='Genre %s' % num) for num in range(4)]
+        self.authors = [Author.objects.create(first_name='John', last_name='Author %s' % num) for num in range(3)]
+
+    def add_books(self, count):
+        for num in range(count):
+            book = Book.objects.create(title='Book %s' % num, summary='Summary', isbn='%013d' % num,
+                                       author=self.authors[num % len(self.authors)])
+            book.genre.set(self.genres[:3])
+            BookInstance.objects.create(book=book, imprint='Imprint', status='o', borrower=User.objects.get())
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for name in ('book', 'bookinstance', 'author', 'genre'):
+            url = reverse('admin:catalog_%s_changelist' % name)
+            self.add_books(2)
+            few = self.count_queries(url)
+            self.add_books(20)
+            self.assertEqual(self.count_queries(url), few, name)
+
+    def test_genres_are_displayed_from_prefetch(self):
+        self.add_books(3)
+        response = self.client.get(reverse('admin:catalog_book_changelist'))
+        self.assertContains(response, 'Genre 0, Genre 1, Genre 2', count=3)
+
+    def test_author_filter_loads_only_selected_author(self):
+        self.add_books(6)
+        url = reverse('admin:catalog_book_changelist')
+        response = self.client.get(url)
+        self.assertContains(response, 'data-ajax--url="%s"' % reverse('admin:catalog_author_autocomplete'))
+        # в фильтре нет списка авторов - только пустой вариант виджета
+        self.assertNotContains(response, 'John</option>')
+
+        author = self.authors[1]
+        response = self.client.get(url, {'author__id__exact': author.pk})
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertContains(response, '<option value="%s" selected>Author 1, John</option>' % author.pk, html=True)
+        self.assertNotContains(response, 'Author 2, John</option>')
+
+    def test_genre_filter(self):
+        self.add_books(2)
+        other = Book.objects.create(title='Other', summary='Summary', isbn='X', author=self.authors[0])
+        other.genre.set([self.genres[3]])
+        url = reverse('admin:catalog_book_changelist')
+        self.assertContains(self.client.get(url), 'data-ajax--url="%s"' % reverse('admin:catalog_genre_autocomplete'))
+        response = self.client.get(url, {'genre__id__exact': self.genres[3].pk})
+        self.assertEqual(list(response.context['cl'].result_list), [other])
+
+    def test_invalid_filter_value(self):
+        url = reverse('admin:catalog_book_changelist')
+        for parameter in ('author__id__exact', 'genre__id__exact'):
+            response = self.client.get(url, {parameter: 'abc'})
+            self.assertRedirects(response, url + '?e=1', fetch_redirect_response=False)
+
+    def test_author_autocomplete(self):
+        response = self.client.get(reverse('admin:catalog_author_autocomplete'), {'term': 'Author 2'})
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Author 2, John'])
+
+
+class LimitedInlineTest(TestCase):
+
+    def setUp(self):
+        User.objects.create_superuser(username='admin', password='12345', email='admin@example.com')
+        self.client.login(username='admin', password='12345')
+        self.book = Book.objects.create(title='Book', summary='Summary', isbn='1234567890123')
+        BookInstance.objects.bulk_create([BookInstance(book=self.book, imprint='Imprint %s' % num, status='a')
+                                          for num in range(25)])
+        rebuild_copy_counters([self.book.pk])
+
+    def test_only_first_copies_are_edited(self):
+        response = self.client.get(reverse('admin:catalog_book_change', args=[self.book.pk]))
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(len(formset.forms), 20)
+        self.assertContains(response, 'View all 25 book instances')
+        self.assertContains(response, '%s?book__id__exact=%s' % (reverse('admin:catalog_bookinstance_changelist'),
+                                                                 self.book.pk))
+
+    def test_short_inline_has_no_link(self):
+        BookInstance.objects.filter(pk__in=BookInstance.objects.values_list('pk', flat=True)[:10]).delete()
+        response = self.client.get(reverse('admin:catalog_book_change', args=[self.book.pk]))
+        self.assertEqual(len(response.context['inline_admin_formsets'][0].formset.forms), 15)
+        self.assertNotContains(response, 'View all')
+
+
+class EstimatedCountPaginatorTest(TestCase):
+
+    def test_count_is_bounded(self):
+        Genre.objects.bulk_create([Genre(name='Genre %s' % num) for num in range(8)])
+        paginator = EstimatedCountPaginator(Genre.objects.order_by('pk'), 2)
+        paginator.count_limit = 5
+        self.assertEqual(paginator.count, 6)
+        paginator = EstimatedCountPaginator(Genre.objects.order_by('pk'), 2)
+        self.assertEqual(paginator.count, 8)
+        self.assertEqual(paginator.num_pages, 4)
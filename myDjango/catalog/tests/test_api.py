@@ -0,0 +1,125 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from unittest import mock
+
+from .. import api
+
+from ..models import Author, Book, BookInstance, Genre
+
+
+class CatalogApiTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='testuser1', password='12345')
+        genres = [Genre.objects.create(name='Genre %s' % genre_num) for genre_num in range(3)]
+        cls.authors = [Author.objects.create(first_name='First %s' % author_num, last_name='Last %s' % author_num)
+                       for author_num in range(5)]
+        cls.books = []
+        for book_num in range(12):
+            book = Book.objects.create(title='Title %s' % book_num, summary='Summary %s' % book_num,
+                                       isbn='ISBN%s' % book_num, author=cls.authors[book_num % 5])
+            book.genre.set(genres[:book_num % 3 + 1])
+            cls.books.append(book)
+        for copy_num in range(6):
+            BookInstance.objects.create(book=cls.books[0], imprint='Imprint', status='a' if copy_num % 2 else 'o')
+
+    def setUp(self):
+        self.client.login(username='testuser1', password='12345')
+
+    def get(self, resource, queries=None, **params):
+        url = reverse('api-collection', args=[resource])
+        if queries is None:
+            resp = self.client.get(url, params)
+        else:
+            with self.assertNumQueries(queries):
+                resp = self.client.get(url, params)
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_anonymous_gets_json_401(self):
+        self.client.logout()
+        resp = self.client.get(reverse('api-collection', args=['books']))
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(resp.json(), {'error': 'Authentication required'})
+
+    def test_read_only(self):
+        resp = self.client.post(reverse('api-collection', args=['books']))
+        self.assertEqual(resp.status_code, 405)
+
+    def test_default_fields(self):
+        data = self.get('books', limit=2)
+        self.assertEqual(data['results'][0], {'id': self.books[0].pk, 'title': 'Title 0', 'isbn': 'ISBN0',
+                                              'author_id': self.authors[0].pk})
+
+    def test_sparse_fields(self):
+        data = self.get('books', fields='title')
+        self.assertEqual(set(data['results'][0]), {'id', 'title'})
+
+    def test_unknown_field_is_400(self):
+        resp = self.client.get(reverse('api-collection', args=['books']), {'fields': 'title,password'})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('password', resp.json()['error'])
+
+    def test_cursor_pagination(self):
+        seen = []
+        data = self.get('books', limit=5)
+        while True:
+            seen.extend(row['id'] for row in data['results'])
+            if not data['next']:
+                break
+            data = self.client.get(data['next']).json()
+        self.assertEqual(seen, [book.pk for book in self.books])
+        previous = self.client.get(data['previous']).json()
+        self.assertEqual([row['id'] for row in previous['results']], seen[5:10])
+
+    def test_embeds_use_constant_queries(self):
+        # пользователь, страница книг, авторы, жанры - независимо от размера страницы
+        # (сессия читается из кэша)
+        small = self.get('books', queries=4, include='author,genres', fields='title', limit=2)
+        large = self.get('books', queries=4, include='author,genres', fields='title', limit=12)
+        self.assertEqual(len(large['results']), 12)
+        self.assertEqual(small['results'][0]['author'],
+                         {'id': self.authors[0].pk, 'first_name': 'First 0', 'last_name': 'Last 0'})
+        self.assertEqual([genre['name'] for genre in large['results'][2]['genres']],
+                         ['Genre 0', 'Genre 1', 'Genre 2'])
+        # author_id нужен для вложения, но не был запрошен
+        self.assertNotIn('author_id', small['results'][0])
+
+    def test_author_books(self):
+        data = self.get('authors', queries=3, include='books')
+        self.assertEqual([row['last_name'] for row in data['results']], ['Last %s' % n for n in range(5)])
+        self.assertEqual(len(data['results'][0]['books']), 3)
+        self.assertEqual(data['results'][0]['books_count'], 3)
+        self.assertEqual(data['results'][0]['books'][0], {'id': self.books[0].pk, 'title': 'Title 0', 'isbn': 'ISBN0'})
+
+    def test_author_books_are_capped(self):
+        with mock.patch.object(api, 'EMBEDDED_BOOKS_LIMIT', 2):
+            data = self.get('authors', queries=3, include='books')
+        # первые по названию: Title 0, Title 10, Title 5
+        self.assertEqual([book['title'] for book in data['results'][0]['books']], ['Title 0', 'Title 10'])
+        self.assertEqual([len(row['books']) for row in data['results']], [2, 2, 2, 2, 2])
+        # сколько книг у автора всего - клиент видит, что список обрезан
+        self.assertEqual([row['books_count'] for row in data['results']], [3, 3, 2, 2, 2])
+
+    def test_genres(self):
+        self.assertEqual([row['name'] for row in self.get('genres')['results']], ['Genre 0', 'Genre 1', 'Genre 2'])
+
+    def test_availability(self):
+        data = self.get('availability', ids='%s,%s' % (self.books[0].pk, self.books[1].pk))
+        self.assertEqual(data['results'], [
+            {'id': self.books[0].pk, 'total': 6, 'available': 3, 'on_loan': 3},
+            {'id': self.books[1].pk, 'total': 0, 'available': 0, 'on_loan': 0},
+        ])
+
+    def test_detail(self):
+        resp = self.client.get(reverse('api-detail', args=['books', self.books[3].pk]), {'include': 'genres'})
+        self.assertEqual(resp.json()['genres'][0]['name'], 'Genre 0')
+        resp = self.client.get(reverse('api-detail', args=['books', 999999]))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_invalid_cursor_is_400(self):
+        resp = self.client.get(reverse('api-collection', args=['books']), {'cursor': 'garbage'})
+        self.assertEqual(resp.status_code, 400)
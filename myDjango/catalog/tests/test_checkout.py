@@ -0,0 +1,154 @@
+from unittest import skipUnless
+
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth.models import Permission, User
+from django.db import connection, connections, transaction
+from django.urls import reverse
+
+import datetime
+import threading
+import uuid
+
+from ..changes import rebuild_copy_counters
+from ..models import Book, BookInstance
+from ..services import NoCopyAvailable, NotOnLoan, _transition, checkout, return_copy
+from ..stats import get_stats, rebuild_stats
+
+
+def counters(book):
+    return tuple(Book.objects.filter(pk=book.pk).values_list('total_copies', 'available_copies',
+                                                               'on_loan_copies').get())
+
+
+class CheckoutServiceTest(TestCase):
+
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', password='12345')
+        self.book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        self.copies = [BookInstance.objects.create(book=self.book, imprint='Imprint', status=status)
+                       for status in 'aam']
+        rebuild_stats()
+
+    def test_checkout_until_no_copies_left(self):
+        first = checkout(self.book.pk, self.reader)
+        second = checkout(self.book.pk, self.reader, due_back=datetime.date(2030, 1, 1))
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertEqual((first.status, first.borrower, first.due_back),
+                         ('o', self.reader, datetime.date.today() + datetime.timedelta(weeks=3)))
+        self.assertEqual(second.due_back, datetime.date(2030, 1, 1))
+        self.assertEqual(counters(self.book), (3, 0, 2))
+        self.assertEqual(get_stats().num_instances_available, 0)
+        with self.assertRaises(NoCopyAvailable):
+            checkout(self.book.pk, self.reader)
+
+    def test_counters_change_with_the_copy(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            checkout(self.book.pk, self.reader)
+            # счетчики обновлены в той же транзакции, что и экземпляр
+            self.assertEqual(counters(self.book), (3, 1, 1))
+            self.assertEqual(get_stats().num_instances_available, 1)
+            raise RuntimeError
+        # и откатываются вместе с ним
+        self.assertEqual(counters(self.book), (3, 2, 0))
+        self.assertEqual(get_stats().num_instances_available, 2)
+        self.assertEqual(BookInstance.objects.filter(status='o').count(), 0)
+
+    def test_transition_is_compare_and_set(self):
+        copy = self.copies[0]
+        BookInstance.objects.filter(pk=copy.pk).update(status='r')
+        self.assertFalse(_transition(copy.pk, self.book.pk, 'a', 'o', borrower=self.reader))
+        self.assertEqual(BookInstance.objects.get(pk=copy.pk).status, 'r')
+
+    def test_return(self):
+        copy = checkout(self.book.pk, self.reader)
+        returned = return_copy(copy.pk)
+        self.assertEqual((returned.status, returned.borrower, returned.due_back), ('a', None, None))
+        self.assertEqual(counters(self.book), (3, 2, 0))
+        with self.assertRaises(NotOnLoan):
+            return_copy(copy.pk)
+        with self.assertRaises(BookInstance.DoesNotExist):
+            return_copy(uuid.uuid4())
+
+
+class CheckoutViewTest(TestCase):
+
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='12345')
+        self.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.reader = User.objects.create_user(username='reader', password='12345')
+        self.book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        self.copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        self.url = reverse('book-checkout', args=[self.book.pk])
+
+    def test_requires_permission(self):
+        self.client.login(username='reader', password='12345')
+        self.assertEqual(self.client.post(self.url, {'borrower': 'reader'}).status_code, 403)
+
+    def test_checkout_and_return(self):
+        self.client.login(username='librarian', password='12345')
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertEqual(self.client.post(self.url, {'borrower': 'nobody'}).status_code, 400)
+
+        response = self.client.post(self.url, {'borrower': 'reader'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['id'], str(self.copy.pk))
+        self.assertEqual(response.json()['borrower'], self.reader.pk)
+        self.assertEqual(self.client.post(self.url, {'borrower': 'reader'}).status_code, 409)
+
+        return_url = reverse('return-copy', args=[self.copy.pk])
+        response = self.client.post(return_url)
+        self.assertEqual(response.json()['status'], 'a')
+        self.assertEqual(self.client.post(return_url).status_code, 409)
+        self.assertEqual(self.client.post(reverse('return-copy', args=[uuid.uuid4()])).status_code, 404)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SELECT ... FOR UPDATE SKIP LOCKED needs PostgreSQL')
+class CheckoutConcurrencyTest(TransactionTestCase):
+    threads = 16
+    checkouts_per_thread = 10
+    copies = 100
+
+    def setUp(self):
+        self.readers = [User.objects.create_user(username='reader%s' % num) for num in range(self.threads)]
+        self.book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        BookInstance.objects.bulk_create([BookInstance(book=self.book, imprint='Imprint', status='a')
+                                          for _ in range(self.copies)])
+        rebuild_copy_counters([self.book.pk])
+        rebuild_stats()
+
+    def test_parallel_checkouts(self):
+        results, errors = [], []
+        start = threading.Barrier(self.threads)
+
+        def worker(reader):
+            try:
+                start.wait()
+                for _ in range(self.checkouts_per_thread):
+                    try:
+                        results.append((reader.pk, checkout(self.book.pk, reader).pk))
+                    except NoCopyAvailable:
+                        results.append((reader.pk, None))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                # у каждого потока свое соединение с базой
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(reader, )) for reader in self.readers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        lent = [copy_id for _, copy_id in results if copy_id is not None]
+        # 160 попыток на 100 экземпляров: каждый выдан ровно один раз, остальные получили отказ
+        self.assertEqual(len(lent), self.copies)
+        self.assertEqual(len(set(lent)), self.copies)
+        self.assertEqual(BookInstance.objects.filter(status='o').count(), self.copies)
+        borrowers = dict(BookInstance.objects.values_list('pk', 'borrower_id'))
+        for reader_id, copy_id in results:
+            if copy_id is not None:
+                self.assertEqual(borrowers[copy_id], reader_id)
+        self.assertEqual(counters(self.book), (self.copies, 0, self.copies))
+        self.assertEqual(get_stats().num_instances_available, 0)
@@ -0,0 +1,108 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User, Permission
+
+import datetime
+
+from ..models import Author, Book, BookInstance, Genre
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser1', password='12345')
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.other_author = Author.objects.create(first_name='Jane', last_name='Doe')
+        self.genre = Genre.objects.create(name='Fantasy')
+        self.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG',
+                                        author=self.author)
+        self.book.genre.add(self.genre)
+        self.copy = BookInstance.objects.create(book=self.book, imprint='Unlikely Imprint, 2016', status='a')
+        self.client.login(username='testuser1', password='12345')
+
+    def assertNotModified(self, url):
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.has_header('ETag'))
+        self.assertTrue(resp.has_header('Last-Modified'))
+        # проверка ETag - один запрос (плюс пользователь; сессия - из кэша), без загрузки объектов
+        with self.assertNumQueries(2):
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=resp['ETag'])
+        self.assertEqual(resp.status_code, 304)
+        return resp
+
+    def etag(self, url):
+        return self.client.get(url)['ETag']
+
+    def test_detail_and_list_pages_answer_304(self):
+        for url in (self.book.get_absolute_url(), self.author.get_absolute_url(),
+                    reverse('books'), reverse('authors')):
+            self.assertNotModified(url)
+
+    def test_if_modified_since(self):
+        url = self.book.get_absolute_url()
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_missing_object_is_404(self):
+        self.assertEqual(self.client.get(reverse('book-detail', args=[999999])).status_code, 404)
+
+    def test_copy_change_bumps_book(self):
+        url = self.book.get_absolute_url()
+        etag = self.etag(url)
+        self.copy.status = 'o'
+        self.copy.due_back = datetime.date.today()
+        self.copy.save()
+        self.assertNotEqual(self.etag(url), etag)
+
+        etag = self.etag(url)
+        BookInstance.objects.get(pk=self.copy.pk).delete()
+        self.assertNotEqual(self.etag(url), etag)
+
+    def test_copy_moved_to_other_book_bumps_both(self):
+        other = Book.objects.create(title='Other', summary='Other', isbn='123', author=self.author)
+        etags = [self.etag(self.book.get_absolute_url()), self.etag(other.get_absolute_url())]
+        copy = BookInstance.objects.only('id', 'imprint').get(pk=self.copy.pk)
+        copy.book = other
+        copy.save()
+        self.assertNotEqual(self.etag(self.book.get_absolute_url()), etags[0])
+        self.assertNotEqual(self.etag(other.get_absolute_url()), etags[1])
+
+    def test_book_change_bumps_authors(self):
+        urls = [self.author.get_absolute_url(), self.other_author.get_absolute_url()]
+        etags = [self.etag(url) for url in urls]
+        book = Book.objects.get(pk=self.book.pk)
+        book.author = self.other_author
+        book.save()
+        self.assertNotEqual([self.etag(url) for url in urls][0], etags[0])
+        self.assertNotEqual([self.etag(url) for url in urls][1], etags[1])
+
+    def test_genre_rename_bumps_book(self):
+        url = self.book.get_absolute_url()
+        etag = self.etag(url)
+        self.genre.name = 'Fairy tales'
+        self.genre.save()
+        self.assertNotEqual(self.etag(url), etag)
+
+    def test_author_change_bumps_book_list(self):
+        etag = self.etag(reverse('books'))
+        self.author.first_name = 'Johnny'
+        self.author.save()
+        self.assertNotEqual(self.etag(reverse('books')), etag)
+
+    def test_delete_bumps_list(self):
+        Book.objects.create(title='Other', summary='Other', isbn='123', author=self.author)
+        etag = self.etag(reverse('books'))
+        Book.objects.get(title='Other').delete()
+        self.assertNotEqual(self.etag(reverse('books')), etag)
+
+    def test_etag_depends_on_user_and_permissions(self):
+        url = self.book.get_absolute_url()
+        etag = self.etag(url)
+        self.user.user_permissions.add(Permission.objects.get(codename='can_update_create_delete_book'))
+        self.assertNotEqual(self.etag(url), etag)
+
+        User.objects.create_user(username='testuser2', password='12345')
+        self.client.login(username='testuser2', password='12345')
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
@@ -0,0 +1,112 @@
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from ..changes import rebuild_copy_counters
+from ..models import Author, Book, BookInstance
+
+
+def counters(book):
+    return tuple(Book.objects.filter(pk=book.pk).values_list('total_copies', 'available_copies',
+                                                               'on_loan_copies').get())
+
+
+class CopyCountersTest(TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.book = Book.objects.create(title='Book', summary='Summary', isbn='1', author=self.author)
+        self.other = Book.objects.create(title='Other', summary='Summary', isbn='2', author=self.author)
+
+    def test_create_change_status_and_delete(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='m')
+        self.assertEqual(counters(self.book), (2, 1, 0))
+
+        copy.status = 'o'
+        copy.save()
+        self.assertEqual(counters(self.book), (2, 0, 1))
+
+        copy.delete()
+        self.assertEqual(counters(self.book), (1, 0, 0))
+
+    def test_move_to_another_book(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        copy.book = self.other
+        copy.status = 'o'
+        copy.save()
+        self.assertEqual(counters(self.book), (0, 0, 0))
+        self.assertEqual(counters(self.other), (1, 0, 1))
+
+    def test_deferred_copy(self):
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        copy = BookInstance.objects.only('imprint').get()
+        copy.status = 'r'
+        copy.save()
+        self.assertEqual(counters(self.book), (1, 0, 0))
+
+    def test_stale_book_does_not_roll_counters_back(self):
+        stale = Book.objects.get(pk=self.book.pk)
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        stale.title = 'New title'
+        stale.save()
+        self.assertEqual(counters(self.book), (1, 1, 0))
+
+    def test_rebuild_fixes_only_stale_books(self):
+        BookInstance.objects.create(book=self.other, imprint='Imprint', status='o')
+        # bulk_create не посылает сигналов - счетчики отстают
+        BookInstance.objects.bulk_create([BookInstance(book=self.book, imprint='Imprint', status=status)
+                                          for status in 'aaom'])
+        self.assertEqual(counters(self.book), (0, 0, 0))
+        other_version = Book.objects.get(pk=self.other.pk).version
+
+        self.assertEqual(rebuild_copy_counters(batch_size=1), 1)
+        self.assertEqual(counters(self.book), (4, 2, 1))
+        self.assertEqual(counters(self.other), (1, 0, 1))
+        self.assertEqual(Book.objects.get(pk=self.other.pk).version, other_version)
+        self.assertEqual(rebuild_copy_counters(), 0)
+
+    def test_repair_command(self):
+        BookInstance.objects.bulk_create([BookInstance(book=self.book, imprint='Imprint', status='a')])
+        out = StringIO()
+        call_command('rebuild_copy_counters', str(self.book.pk), stdout=out)
+        self.assertIn('repaired for 1 books', out.getvalue())
+        self.assertEqual(counters(self.book), (1, 1, 0))
+
+    def test_migration_fills_counters_in_batches(self):
+        migration = import_module('catalog.migrations.0015_copy_counters')
+        BookInstance.objects.bulk_create([BookInstance(book=book, imprint='Imprint', status=status)
+                                          for book in (self.book, self.other) for status in 'aom'])
+        with mock.patch.object(migration, 'FILL_BATCH_SIZE', 1):
+            migration.fill_counters(apps, mock.Mock(connection=connection))
+        self.assertEqual(counters(self.book), (3, 1, 1))
+        self.assertEqual(counters(self.other), (3, 1, 1))
+
+
+class BookListAvailabilityTest(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(username='testuser1', password='12345')
+        self.client.login(username='testuser1', password='12345')
+        self.available = Book.objects.create(title='Available book', summary='Summary', isbn='1')
+        self.loaned = Book.objects.create(title='Loaned book', summary='Summary', isbn='2')
+        BookInstance.objects.create(book=self.available, imprint='Imprint', status='a')
+        BookInstance.objects.create(book=self.available, imprint='Imprint', status='o')
+        BookInstance.objects.create(book=self.loaned, imprint='Imprint', status='o')
+
+    def test_availability_is_shown(self):
+        response = self.client.get(reverse('books'))
+        self.assertContains(response, '1 of 2 available, 1 on loan')
+        self.assertContains(response, '0 of 1 available, 1 on loan')
+
+    def test_available_filter(self):
+        response = self.client.get(reverse('books'), {'available': '1'})
+        self.assertEqual(list(response.context['book_list']), [self.available])
+        self.assertContains(response, '<strong>Available now</strong>')
@@ -0,0 +1,56 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.http import StreamingHttpResponse
+from django.contrib.auth.models import User, Permission
+
+import csv
+import datetime
+import json
+
+from ..models import Author, Book, BookInstance
+
+
+class ExportViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(username='testuser1', password='12345')
+        librarian = User.objects.create_user(username='librarian', password='12345')
+        librarian.user_permissions.add(Permission.objects.get(codename='can_check_all_borrowed_books'))
+
+        author = Author.objects.create(first_name='Лев', last_name='Толстой')
+        book = Book.objects.create(title='Война и мир', summary='Роман', isbn='ABCDEFG', author=author)
+        for copy_num in range(25):
+            BookInstance.objects.create(book=book, imprint='Imprint %s' % copy_num, borrower=librarian,
+                                        status='o' if copy_num % 5 else 'a',
+                                        due_back=datetime.date.today() + datetime.timedelta(days=copy_num))
+
+    def export(self, kind, fmt):
+        self.client.login(username='librarian', password='12345')
+        resp = self.client.get(reverse('export', args=[kind, fmt]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsInstance(resp, StreamingHttpResponse)
+        return b''.join(resp.streaming_content).decode('utf-8')
+
+    def test_requires_permission(self):
+        self.client.login(username='testuser1', password='12345')
+        resp = self.client.get(reverse('export', args=['loans', 'csv']))
+        self.assertEqual(resp.status_code, 302)
+
+    def test_loans_csv(self):
+        rows = list(csv.reader(self.export('loans', 'csv').splitlines()))
+        self.assertEqual(rows[0], ['id', 'book_id', 'book__title', 'book__isbn', 'imprint', 'due_back',
+                                   'borrower__username'])
+        self.assertEqual(len(rows), 21)
+        self.assertEqual(rows[1][2], 'Война и мир')
+        due_dates = [row[5] for row in rows[1:]]
+        self.assertEqual(due_dates, sorted(due_dates))
+
+    def test_books_jsonl(self):
+        rows = [json.loads(line) for line in self.export('books', 'jsonl').splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['author__last_name'], 'Толстой')
+
+    def test_authors_csv(self):
+        rows = list(csv.reader(self.export('authors', 'csv').splitlines()))
+        self.assertEqual(rows[1][1:3], ['Толстой', 'Лев'])
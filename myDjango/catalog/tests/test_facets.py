@@ -0,0 +1,144 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.db import connection
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from unittest import mock
+
+from .. import facets
+
+from ..changes import catalog_stamps
+from ..facets import book_facets, facet_counts
+from ..models import Author, Book, BookInstance, Genre
+
+
+class BookFacetsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='testuser1', password='12345')
+        self.client.login(username='testuser1', password='12345')
+        self.fantasy = Genre.objects.create(name='Fantasy')
+        self.horror = Genre.objects.create(name='Horror')
+        self.smith = Author.objects.create(first_name='John', last_name='Smith')
+        self.doe = Author.objects.create(first_name='Jane', last_name='Doe')
+        self.books = []
+        # (автор, жанры, есть свободный экземпляр)
+        for num, (author, genres, available) in enumerate([
+                (self.smith, [self.fantasy], True),
+                (self.smith, [self.fantasy, self.horror], False),
+                (self.doe, [self.horror], True),
+                (self.doe, [self.fantasy], False),
+                (self.doe, [], True)]):
+            book = Book.objects.create(title='Book %s' % num, summary='Summary', isbn='ISBN%s' % num, author=author)
+            book.genre.set(genres)
+            BookInstance.objects.create(book=book, imprint='Imprint', status='a' if available else 'o')
+            self.books.append(book)
+
+    def filters(self, genre=None, author=None, available=None):
+        return {'genre': genre, 'author': author, 'available': available}
+
+    def test_all_facets_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = facet_counts(self.filters())
+        self.assertEqual(counts['genre'], [(self.fantasy.pk, 'Fantasy', 3), (self.horror.pk, 'Horror', 2)])
+        self.assertEqual(counts['author'], [(self.doe.pk, 'Doe', 'Jane', 3), (self.smith.pk, 'Smith', 'John', 2)])
+        self.assertEqual(counts['available'], 3)
+
+    def test_facet_ignores_its_own_filter(self):
+        counts = facet_counts(self.filters(genre=self.horror.pk, available=True))
+        # жанры - по доступным книгам любого жанра
+        self.assertEqual(sorted(counts['genre']), [(self.fantasy.pk, 'Fantasy', 1), (self.horror.pk, 'Horror', 1)])
+        # авторы - по доступным книгам жанра Horror
+        self.assertEqual(counts['author'], [(self.doe.pk, 'Doe', 'Jane', 1)])
+        # доступность - по книгам жанра Horror
+        self.assertEqual(counts['available'], 1)
+
+    def test_selected_value_is_kept_beyond_limit(self):
+        with mock.patch.object(facets, 'FACET_LIMIT', 1):
+            counts = facet_counts(self.filters(author=self.smith.pk))
+        self.assertEqual(counts['author'], [(self.smith.pk, 'Smith', 'John', 2)])
+
+    def test_facets_are_cached_by_catalog_stamps(self):
+        book_facets(self.filters(), catalog_stamps())
+        stamps = catalog_stamps()
+        with self.assertNumQueries(0):
+            values = book_facets(self.filters(), stamps)
+        self.assertEqual([(value.label, value.count) for value in values['genre']], [('Fantasy', 3), ('Horror', 2)])
+        # связь с жанром меняет отметки каталога (m2m_changed поднимает last_modified книги)
+        self.books[4].genre.add(self.horror)
+        values = book_facets(self.filters(), catalog_stamps())
+        self.assertEqual([(value.label, value.count) for value in values['genre']], [('Fantasy', 3), ('Horror', 3)])
+
+    def test_copy_changes_recount_only_availability(self):
+        book_facets(self.filters(), catalog_stamps())
+        copy = self.books[1].bookinstance_set.get()
+        copy.status = 'a'
+        copy.save()
+        stamps = catalog_stamps()
+        with CaptureQueriesContext(connection) as queries:
+            values = book_facets(self.filters(), stamps)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('GROUP BY', queries[0]['sql'])
+        self.assertEqual(values['available'], 4)
+        self.assertEqual([(value.label, value.count) for value in values['author']], [('Doe, Jane', 3), ('Smith, John', 2)])
+        # с фильтром доступности количества по жанрам и авторам тоже зависят от экземпляров
+        values = book_facets(self.filters(available=True), stamps)
+        copy.status = 'o'
+        copy.save()
+        values = book_facets(self.filters(available=True), catalog_stamps())
+        self.assertEqual([(value.label, value.count) for value in values['author']], [('Doe, Jane', 2), ('Smith, John', 1)])
+
+    def test_author_edit_recounts_authors(self):
+        book_facets(self.filters(), catalog_stamps())
+        self.doe.first_name = 'Janet'
+        self.doe.save()
+        values = book_facets(self.filters(), catalog_stamps())
+        self.assertEqual(values['author'][0].label, 'Doe, Janet')
+
+    def test_combined_filters_on_book_list(self):
+        response = self.client.get(reverse('books'), {'genre': self.fantasy.pk, 'author': self.smith.pk})
+        self.assertEqual(list(response.context['book_list']), self.books[:2])
+        response = self.client.get(reverse('books'), {'genre': self.fantasy.pk, 'author': self.smith.pk,
+                                                      'available': 1})
+        self.assertEqual(list(response.context['book_list']), self.books[:1])
+        self.assertContains(response, '<strong>Fantasy</strong> (1)')
+        self.assertContains(response, '<strong>Smith, John</strong> (1)')
+
+    def test_facet_links_keep_other_filters(self):
+        response = self.client.get(reverse('books'), {'genre': self.fantasy.pk, 'available': 1})
+        self.assertContains(response, '?genre=%s&amp;available=1&amp;author=%s' % (self.fantasy.pk, self.smith.pk))
+        self.assertContains(response, '?genre=%s&amp;available=1">Horror</a> (1)' % self.horror.pk)
+        self.assertContains(response, '?available=1">All genres</a>')
+        self.assertContains(response, '?genre=%s">All books</a>' % self.fantasy.pk)
+
+    def test_pagination_keeps_filters(self):
+        for num in range(3):
+            Book.objects.create(title='More %s' % num, summary='Summary', isbn='M%s' % num,
+                                author=self.doe).genre.add(self.fantasy)
+        response = self.client.get(reverse('books'), {'genre': self.fantasy.pk, 'page': 1})
+        self.assertContains(response, '?genre=%s&amp;page=2' % self.fantasy.pk)
+        response = self.client.get(reverse('books'), {'author': self.doe.pk})
+        self.assertContains(response, '?author=%s&amp;cursor=' % self.doe.pk)
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(reverse('books'), {'author': self.doe.pk, 'cursor': cursor})
+        self.assertEqual([book.author for book in response.context['book_list']], [self.doe, self.doe])
+
+    def test_invalid_filters_are_ignored(self):
+        response = self.client.get(reverse('books'), {'genre': 'fantasy', 'author': '-1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['book_list']), 4)
+        # больше integer в базе
+        response = self.client.get(reverse('books'), {'genre': '99999999999999999999', 'author': 2 ** 31})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['book_list']), 4)
+
+    def test_genre_filter_uses_genre_book_index(self):
+        if connection.vendor == 'postgresql':
+            # на маленькой таблице планировщик PostgreSQL предпочел бы seq scan
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = Book.genre.through.objects.filter(genre=self.fantasy).order_by('book_id').values('book_id').explain()
+        self.assertIn('book_genre_genre_book_idx', plan)
@@ -0,0 +1,85 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.contrib.auth.models import User
+
+import datetime
+
+from ..changes import touch_books
+from ..models import Author, Book, BookInstance
+
+
+class FragmentCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='testuser1', password='12345')
+        self.client.login(username='testuser1', password='12345')
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG',
+                                        author=self.author)
+        self.copy = BookInstance.objects.create(book=self.book, imprint='First Imprint', status='a')
+
+    def get(self, obj):
+        return self.client.get(obj.get_absolute_url()).content.decode()
+
+    def test_copies_are_not_queried_on_cache_hit(self):
+        self.get(self.book)
+        with self.assertNumQueries(4):
+            # пользователь, проверка ETag, книга, жанры - без экземпляров (сессия - из кэша)
+            content = self.get(self.book)
+        self.assertIn('First Imprint', content)
+
+    def test_bibliography_is_not_queried_on_cache_hit(self):
+        self.get(self.author)
+        with self.assertNumQueries(3):
+            content = self.get(self.author)
+        self.assertIn('My book summary', content)
+
+    def test_copy_changes_bump_book_version(self):
+        self.get(self.book)
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        copy.imprint = 'Second Imprint'
+        copy.save()
+        self.assertIn('Second Imprint', self.get(self.book))
+
+        BookInstance.objects.create(book=self.book, imprint='Third Imprint', status='m')
+        self.assertIn('Third Imprint', self.get(self.book))
+
+        copy.delete()
+        self.assertNotIn('Second Imprint', self.get(self.book))
+
+    def test_bulk_update_with_touch(self):
+        self.get(self.book)
+        BookInstance.objects.filter(book=self.book).update(status='o', due_back=datetime.date(2030, 1, 1))
+        touch_books([self.book.pk])
+        self.assertIn('On loan', self.get(self.book))
+
+    def test_book_changes_bump_author_version(self):
+        self.get(self.author)
+        book = Book.objects.get(pk=self.book.pk)
+        book.summary = 'New summary'
+        book.save()
+        self.assertIn('New summary', self.get(self.author))
+
+        other = Author.objects.create(first_name='Jane', last_name='Doe')
+        book.author = other
+        book.save()
+        self.assertNotIn('New summary', self.get(self.author))
+        self.assertIn('New summary', self.get(other))
+
+    def test_sidebar_is_not_cached(self):
+        self.assertIn('testuser1', self.get(self.book))
+        User.objects.create_user(username='testuser2', password='12345')
+        self.client.login(username='testuser2', password='12345')
+        content = self.get(self.book)
+        self.assertIn('testuser2', content)
+        self.assertNotIn('testuser1', content)
+
+    def test_stale_object_does_not_roll_version_back(self):
+        stale = Book.objects.get(pk=self.book.pk)
+        touch_books([self.book.pk])
+        version = Book.objects.get(pk=self.book.pk).version
+        self.assertEqual(version, stale.version + 1)
+        stale.title = 'New Title'
+        stale.save()
+        self.assertEqual(Book.objects.get(pk=self.book.pk).version, version)
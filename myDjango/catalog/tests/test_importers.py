@@ -0,0 +1,99 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth.models import User
+
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from ..models import Author, Book, BookInstance, Genre
+from ..stats import get_stats
+
+
+class ImportCatalogCommandTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        User.objects.create_user(username='reader', password='12345')
+
+        self.authors = self.write('authors.csv', 'first_name,last_name,date_of_birth\n'
+                                                 'Joanne,Rowling,1965-07-31\n'
+                                                 'Leo,Tolstoy,\n'
+                                                 'Leo,Tolstoy,\n')
+        self.books = self.write('books.jsonl', '\n'.join(json.dumps(record) for record in [
+            {'title': 'Harry Potter', 'summary': 'Wizards', 'isbn': '111',
+             'author_first_name': 'Joanne', 'author_last_name': 'Rowling', 'genres': ['Fantasy', 'Kids']},
+            {'title': 'War and Peace', 'summary': 'War', 'isbn': '222', 'author': 'Tolstoy, Leo',
+             'genres': ['Classic']},
+            {'title': 'Anna Karenina', 'summary': 'Love', 'isbn': '333', 'author': 'Tolstoy, Leo',
+             'genres': ['Classic', 'Romance']},
+        ]))
+        self.instances = self.write('instances.csv', 'book_isbn,imprint,status,due_back,borrower\n'
+                                                     '111,First,a,,\n'
+                                                     '111,Second,o,2030-01-01,reader\n'
+                                                     '222,Third,m,,\n'
+                                                     '333,Fourth,a,,\n'
+                                                     '333,Fifth,r,,\n')
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def run_import(self, **options):
+        out = StringIO()
+        call_command('import_catalog', authors=self.authors, books=self.books, instances=self.instances,
+                     batch_size=2, stdout=out, **options)
+        return out.getvalue()
+
+    def test_imports_all_kinds(self):
+        self.run_import()
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Author.objects.get(last_name='Rowling').date_of_birth.year, 1965)
+        self.assertEqual(Book.objects.count(), 3)
+        tolstoy = Author.objects.get(last_name='Tolstoy')
+        self.assertEqual(tolstoy.book_set.count(), 2)
+        self.assertEqual(Genre.objects.count(), 4)
+        self.assertEqual(sorted(Book.objects.get(isbn='333').genre.values_list('name', flat=True)),
+                         ['Classic', 'Romance'])
+        self.assertEqual(BookInstance.objects.count(), 5)
+        loan = BookInstance.objects.get(imprint='Second')
+        self.assertEqual(loan.borrower.username, 'reader')
+        self.assertEqual(str(loan.due_back), '2030-01-01')
+
+    def test_counters_are_rebuilt(self):
+        self.run_import()
+        stats = get_stats()
+        self.assertEqual((stats.num_authors, stats.num_books, stats.num_instances, stats.num_instances_available),
+                         (2, 3, 5, 2))
+
+    def test_rerun_does_not_duplicate(self):
+        self.run_import()
+        self.run_import()
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(Book.genre.through.objects.count(), 5)
+
+    def test_checkpoint_resumes(self):
+        checkpoint = os.path.join(self.tmpdir, 'progress.json')
+        self.run_import(checkpoint=checkpoint)
+        with open(checkpoint) as f:
+            progress = json.load(f)
+        self.assertEqual(progress['instances:%s' % self.instances], 5)
+
+        # дописываем новые строки - при возобновлении загружаются только они
+        with open(self.instances, 'a', encoding='utf-8') as f:
+            f.write('222,Sixth,a,,\n')
+        out = self.run_import(checkpoint=checkpoint)
+        self.assertIn('Imported 1 new instances', out)
+        self.assertEqual(BookInstance.objects.count(), 6)
+
+    def test_unknown_book_fails(self):
+        self.instances = self.write('bad.csv', 'book_isbn,imprint,status\n999,Imprint,a\n')
+        with self.assertRaises(CommandError):
+            self.run_import()
@@ -0,0 +1,67 @@
+from django.test import TestCase
+from django.db import connection
+from django.contrib.auth.models import User
+
+import datetime
+from unittest import skipUnless
+
+from ..models import Author, Book, BookInstance
+from ..pagination import KeysetPaginator
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'EXPLAIN output is checked for SQLite and PostgreSQL')
+class LoanIndexesTest(TestCase):
+    # проверяем по плану запроса (EXPLAIN), что запросы списков книг на руках
+    # используют частичные индексы из BookInstance.Meta.indexes
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser1', password='12345')
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG', author=author)
+        statuses = ['o', 'a', 'm', 'r']
+        BookInstance.objects.bulk_create([
+            BookInstance(book=book, imprint='Imprint', status=statuses[copy_num % 4],
+                         due_back=datetime.date.today() + datetime.timedelta(days=copy_num % 10),
+                         borrower=cls.user if copy_num % 2 else None)
+            for copy_num in range(200)])
+        # статистика для планировщика, иначе он не знает насколько избирательны индексы
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # на маленькой таблице планировщик PostgreSQL предпочел бы seq scan
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def page_query(self, queryset):
+        # тот же запрос, что выполняет KeysetPaginator для первой страницы
+        paginator = KeysetPaginator(queryset, 10, ('due_back', 'id'))
+        return queryset.order_by(*paginator._ordering(backwards=False))[:11]
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_loans_by_user_use_borrower_index(self):
+        queryset = BookInstance.objects.filter(borrower=self.user).filter(status__exact='o')
+        self.assertUsesIndex(self.page_query(queryset), 'bookinst_borrower_loan_idx')
+
+    def test_all_loans_use_due_back_index(self):
+        queryset = BookInstance.objects.filter(status__exact='o')
+        self.assertUsesIndex(self.page_query(queryset), 'bookinst_on_loan_due_idx')
+
+    def test_available_count_uses_available_index(self):
+        self.assertUsesIndex(BookInstance.objects.filter(status__exact='a').values('pk'), 'bookinst_available_idx')
+
+
+@skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'EXPLAIN output is checked for SQLite and PostgreSQL')
+class LastModifiedIndexesTest(TestCase):
+    # MAX(last_modified) для ETag/Last-Modified списков читает только индекс
+
+    def test_max_last_modified_uses_index(self):
+        for model, index_name in ((Book, 'book_last_modified_idx'), (Author, 'author_last_modified_idx')):
+            with self.subTest(model=model.__name__):
+                plan = model.objects.order_by('-last_modified').values('last_modified')[:1].explain()
+                self.assertIn(index_name, plan)
@@ -0,0 +1,125 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+
+import os
+import json
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from ..metrics import Histogram, InstrumentedLocMemCache, RequestMetrics, _current, registry
+from ..models import Author
+
+
+class PerformanceMiddlewareTest(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(username='testuser1', password='12345', is_staff=True)
+        self.client.login(username='testuser1', password='12345')
+        Author.objects.create(first_name='John', last_name='Smith')
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('authors'))
+        timing = resp['Server-Timing']
+        self.assertIn('sql;dur=', timing)
+        self.assertIn('desc="%s queries"' % len(queries), timing)
+        self.assertRegex(timing, r'tpl;dur=\d+\.\d')
+        self.assertRegex(timing, r'cache;desc="\d+ hits, \d+ misses"')
+        self.assertRegex(timing, r'total;dur=\d+\.\d')
+
+    def test_cache_hits_are_counted(self):
+        self.client.get(reverse('authors'))
+        # снимок прав и сессия уже в кэше
+        resp = self.client.get(reverse('authors'))
+        hits = int(re.search(r'(\d+) hits', resp['Server-Timing']).group(1))
+        self.assertGreater(hits, 0)
+
+    def test_server_timing_is_staff_only(self):
+        self.user.is_staff = False
+        self.user.save()
+        self.assertNotIn('Server-Timing', self.client.get(reverse('authors')))
+        self.client.logout()
+        self.assertNotIn('Server-Timing', self.client.get(reverse('login')))
+        with override_settings(SERVER_TIMING=True):
+            self.assertIn('Server-Timing', self.client.get(reverse('login')))
+
+    def test_metrics_are_staff_only(self):
+        self.user.is_staff = False
+        self.user.save()
+        resp = self.client.get(reverse('metrics'))
+        self.assertEqual(resp.status_code, 302)
+
+    def test_prometheus_histograms_per_view(self):
+        for _ in range(3):
+            self.client.get(reverse('authors'))
+        self.client.get('/catalog/no-such-page/')
+        resp = self.client.get(reverse('metrics'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = resp.content.decode()
+        # без METRICS_DIR - только этот процесс, с меткой pid
+        pid = 'pid="%s",' % os.getpid()
+        self.assertIn('# TYPE catalog_request_duration_seconds histogram', text)
+        self.assertIn('catalog_request_duration_seconds_count{%sview="authors"} 3' % pid, text)
+        self.assertIn('catalog_request_duration_seconds_bucket{%sview="authors",le="+Inf"} 3' % pid, text)
+        self.assertIn('catalog_request_duration_seconds_count{%sview="unresolved"} 1' % pid, text)
+        self.assertRegex(text, r'catalog_sql_queries_total\{%sview="authors"\} [1-9]' % re.escape(pid))
+
+    def test_metrics_are_summed_over_workers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # значения другого воркера
+        other = {'authors': {'latency': {'counts': [2] + [0] * 10, 'count': 2, 'sum': 0.002},
+                             'sql_count': 10, 'sql_time': 0.001, 'template_time': 0.0,
+                             'cache_hits': 1, 'cache_misses': 0}}
+        with open(os.path.join(directory, '1.json'), 'w') as f:
+            json.dump(other, f)
+        with override_settings(METRICS_DIR=directory):
+            for _ in range(3):
+                self.client.get(reverse('authors'))
+            text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('catalog_request_duration_seconds_count{view="authors"} 5', text)
+        self.assertNotIn('pid=', text)
+        self.assertTrue(os.path.exists(os.path.join(directory, '%s.json' % os.getpid())))
+
+
+class HistogramTest(TestCase):
+
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 5.0):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.cumulative()), [(0.1, 1), (1.0, 3)])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 6.25)
+
+
+class SharedCacheTest(TestCase):
+
+    def test_settings_require_a_shared_cache(self):
+        env = {name: value for name, value in os.environ.items() if not name.startswith('CACHE_')}
+        result = subprocess.run([sys.executable, '-c', 'import myDjango.settings'], cwd=settings.BASE_DIR,
+                                env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('ImproperlyConfigured: Set CACHE_LOCATION', result.stderr)
+
+    def test_cache_hits_are_counted_once(self):
+        backend = InstrumentedLocMemCache('catalog-metrics-test', {})
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            backend.set('key', 'value')
+            self.assertEqual(backend.get('key'), 'value')
+            self.assertIsNone(backend.get('missing'))
+            self.assertEqual(backend.get_many(['key', 'missing']), {'key': 'value'})
+        finally:
+            _current.reset(token)
+        self.assertEqual((metrics.cache_hits, metrics.cache_misses), (2, 2))
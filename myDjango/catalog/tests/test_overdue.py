@@ -0,0 +1,63 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth.models import User
+
+import csv
+import datetime
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from ..models import Book, BookInstance, OverdueReport
+
+
+class OverdueTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = datetime.date(2020, 5, 20)
+        users = [User.objects.create_user(username='reader%s' % num, password='12345') for num in range(3)]
+        book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        # 10 просроченных (due_back раньше today), 5 в срок, 3 доступных с прошедшей датой, 1 без даты
+        for copy_num in range(10):
+            BookInstance.objects.create(book=book, imprint='Late', status='o', borrower=users[copy_num % 3],
+                                        due_back=cls.today - datetime.timedelta(days=copy_num + 1))
+        for copy_num in range(5):
+            BookInstance.objects.create(book=book, imprint='In time', status='o', borrower=users[0],
+                                        due_back=cls.today + datetime.timedelta(days=copy_num))
+        for copy_num in range(3):
+            BookInstance.objects.create(book=book, imprint='Returned', status='a',
+                                        due_back=cls.today - datetime.timedelta(days=30))
+        BookInstance.objects.create(book=book, imprint='No date', status='o', borrower=users[1])
+
+    def test_overdue_queryset(self):
+        self.assertEqual(BookInstance.objects.overdue(self.today).count(), 10)
+        self.assertEqual(BookInstance.objects.overdue(self.today).filter(borrower__username='reader0').count(), 4)
+
+    def test_with_overdue_annotation_matches_property(self):
+        for copy in BookInstance.objects.with_overdue(self.today):
+            self.assertEqual(copy.overdue, bool(copy.due_back and copy.due_back < self.today))
+        # свойство модели берет значение из аннотации
+        copy = BookInstance.objects.with_overdue(self.today).get(imprint='No date')
+        self.assertFalse(copy.is_overdue)
+
+    def test_process_overdue_command(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        output = os.path.join(tmpdir, 'report.csv')
+        out = StringIO()
+        call_command('process_overdue', date='2020-05-20', chunk_size=3, output=output, stdout=out)
+
+        report = OverdueReport.objects.get()
+        self.assertEqual(report.total_overdue, 10)
+        self.assertEqual(report.borrowers, 3)
+        self.assertEqual(report.oldest_due_back, self.today - datetime.timedelta(days=10))
+        self.assertIn('10 overdue copies', out.getvalue())
+
+        with open(output, encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(len({row['id'] for row in rows}), 10)
+        self.assertEqual(rows[0]['days_overdue'], '10')
+        self.assertEqual([row['due_back'] for row in rows], sorted(row['due_back'] for row in rows))
@@ -0,0 +1,76 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.contrib.auth.models import Group, Permission, User
+from django.urls import reverse
+
+from ..models import Author, Book, BookInstance
+from ..pagecache import HOLE_RE
+
+
+class SharedPageCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.reader1 = User.objects.create_user(username='reader1', password='12345')
+        self.reader2 = User.objects.create_user(username='reader2', password='12345')
+        self.reader2.groups.add(Group.objects.create(name='Readers club'))
+        self.editor = User.objects.create_user(username='editor', password='12345')
+        self.editor.user_permissions.add(Permission.objects.get(codename='can_update_create_delete_author'))
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        Book.objects.create(title='First Book', summary='Summary', isbn='ISBN1', author=self.author)
+
+    def get(self, user, url=None):
+        self.client.force_login(user)
+        return self.client.get(url or reverse('books'))
+
+    def test_users_with_same_permissions_share_the_page(self):
+        first = self.get(self.reader1)
+        self.assertTemplateUsed(first, 'catalog/book_list.html')
+        # попадание: пользователь, отметки каталога и снимок прав reader2 (права, группы) -
+        # без книг и без рендеринга списка
+        self.client.force_login(self.reader2)
+        with self.assertNumQueries(4):
+            second = self.client.get(reverse('books'))
+        self.assertTemplateNotUsed(second, 'catalog/book_list.html')
+        content = second.content.decode()
+        self.assertIn('First Book', content)
+        self.assertIn('User: reader2', content)
+        self.assertNotIn('reader1', content)
+        self.assertIn('Readers club', content)
+        self.assertFalse(HOLE_RE.search(content))
+
+    def test_permission_set_is_part_of_the_key(self):
+        self.get(self.reader1)
+        content = self.get(self.editor).content.decode()
+        self.assertIn('Update Book', content)
+        self.assertIn('User: editor', content)
+        self.assertNotIn('Update Book', self.get(self.reader2).content.decode())
+
+    def test_catalog_changes_invalidate_the_page(self):
+        self.get(self.reader1)
+        Book.objects.create(title='Second Book', summary='Summary', isbn='ISBN2', author=self.author)
+        self.assertContains(self.get(self.reader2), 'Second Book')
+
+        self.get(self.reader1, reverse('authors'))
+        author = Author.objects.get(pk=self.author.pk)
+        author.last_name = 'Jones'
+        author.save()
+        self.assertContains(self.get(self.reader2, reverse('authors')), 'Jones')
+
+    def test_query_string_is_part_of_the_key(self):
+        self.get(self.reader1)
+        response = self.get(self.reader2, reverse('books') + '?available=1')
+        self.assertTemplateUsed(response, 'catalog/book_list.html')
+        self.assertNotContains(response, 'First Book')
+
+    def test_copy_changes_keep_the_author_list(self):
+        copy = BookInstance.objects.create(book=Book.objects.get(), imprint='Imprint', status='a')
+        self.get(self.reader1, reverse('authors'))
+        copy.status = 'o'
+        copy.save()
+        self.assertTemplateNotUsed(self.get(self.reader2, reverse('authors')), 'catalog/author_list.html')
+        # а список книг показывает число свободных экземпляров - его страница другая
+        self.get(self.reader1)
+        copy.status = 'a'
+        copy.save()
+        self.assertContains(self.get(self.reader2), '1 of 1 available')
@@ -0,0 +1,126 @@
+from django.test import TestCase
+from django.core.cache import cache
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+import datetime
+
+from ..models import Author, Book, BookInstance
+from ..pagination import KeysetPaginator, InvalidCursor
+
+
+class KeysetPaginatorTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # однофамильцы проверяют tiebreaker по id
+        for author_num in range(7):
+            Author.objects.create(first_name='Christian %s' % author_num, last_name='Surname %s' % (author_num % 3))
+
+        test_book = Book.objects.create(title='Book Title', summary='My book summary', isbn='ABCDEFG')
+        # часть экземпляров без due_back, чтобы проверить обработку NULL
+        for copy_num in range(9):
+            due_back = None if copy_num % 4 == 0 else datetime.date.today() + datetime.timedelta(days=copy_num % 3)
+            BookInstance.objects.create(book=test_book, imprint='Imprint %s' % copy_num, due_back=due_back)
+
+    def walk(self, paginator):
+        """
+        Goes through all pages forwards and then backwards, returning the pks seen.
+        """
+        forward, page = [], paginator.page()
+        pages = [page]
+        forward.extend(obj.pk for obj in page)
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            pages.append(page)
+            forward.extend(obj.pk for obj in page)
+
+        backward = [obj.pk for obj in page]
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            backward = [obj.pk for obj in page] + backward
+        return forward, backward, pages
+
+    def test_walks_authors_in_ordering(self):
+        paginator = KeysetPaginator(Author.objects.all(), 2, ('last_name', 'id'))
+        forward, backward, pages = self.walk(paginator)
+        expected = list(Author.objects.order_by('last_name', 'id').values_list('pk', flat=True))
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+        self.assertEqual(len(pages), 4)
+        self.assertFalse(pages[0].has_previous())
+        self.assertFalse(pages[-1].has_next())
+
+    def test_walks_descending_ordering(self):
+        paginator = KeysetPaginator(Author.objects.all(), 3, ('-last_name', '-id'))
+        forward, backward, _ = self.walk(paginator)
+        expected = list(Author.objects.order_by('-last_name', '-id').values_list('pk', flat=True))
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+
+    def test_walks_nullable_key_with_nulls_last(self):
+        paginator = KeysetPaginator(BookInstance.objects.all(), 2, ('due_back', 'id'))
+        forward, backward, _ = self.walk(paginator)
+        self.assertEqual(len(forward), 9)
+        self.assertEqual(len(set(forward)), 9)
+        self.assertEqual(forward, backward)
+        due_dates = [BookInstance.objects.get(pk=pk).due_back for pk in forward]
+        dated = [d for d in due_dates if d is not None]
+        self.assertEqual(due_dates[:len(dated)], sorted(dated))
+        self.assertTrue(all(d is None for d in due_dates[len(dated):]))
+
+    def test_values_rows(self):
+        paginator = KeysetPaginator(Author.objects.values('id', 'last_name'), 4, ('last_name', 'id'))
+        page = paginator.page()
+        page = paginator.page(page.next_cursor)
+        self.assertEqual(len(page), 3)
+        self.assertFalse(page.has_next())
+
+    def test_count_is_lazy(self):
+        paginator = KeysetPaginator(Author.objects.all(), 2, ('last_name', 'id'))
+        with self.assertNumQueries(1):
+            paginator.page()
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, 7)
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(Author.objects.all(), 2, ('last_name', 'id'))
+        with self.assertRaises(InvalidCursor):
+            paginator.page('not-a-cursor')
+
+
+class KeysetPaginationViewTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for author_num in range(13):
+            Author.objects.create(first_name='Christian %s' % author_num, last_name='Surname %s' % author_num, )
+
+    def setUp(self):
+        # без страниц из общего кэша, оставшихся от других тестов класса
+        cache.clear()
+        User.objects.create_user(username='testuser1', password='12345')
+        self.client.login(username='testuser1', password='12345')
+
+    def test_next_cursor_pages_through_authors(self):
+        seen = []
+        resp = self.client.get(reverse('authors'))
+        seen.extend(resp.context['author_list'])
+        while resp.context['page_obj'].has_next():
+            resp = self.client.get(reverse('authors'), {'cursor': resp.context['page_obj'].next_cursor})
+            self.assertEqual(resp.status_code, 200)
+            seen.extend(resp.context['author_list'])
+        self.assertEqual(seen, list(Author.objects.order_by('last_name', 'id')))
+
+    def test_pagination_links_use_cursor(self):
+        resp = self.client.get(reverse('authors'))
+        self.assertContains(resp, '?cursor=%s' % resp.context['page_obj'].next_cursor)
+        self.assertNotContains(resp, 'Total:')
+
+    def test_count_only_when_requested(self):
+        resp = self.client.get(reverse('authors'), {'count': 1})
+        self.assertContains(resp, 'Total: 13.')
+
+    def test_invalid_cursor_is_404(self):
+        resp = self.client.get(reverse('authors'), {'cursor': 'garbage'})
+        self.assertEqual(resp.status_code, 404)
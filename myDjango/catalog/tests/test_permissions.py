@@ -0,0 +1,86 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User, Group, Permission, update_last_login
+
+from ..permissions import get_snapshot, snapshot_version
+
+
+class PermissionSnapshotTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser1', password='12345')
+        self.group = Group.objects.create(name='Librarian')
+        self.permission = Permission.objects.get(codename='can_check_all_borrowed_books')
+
+    def fresh_user(self):
+        # новый объект пользователя - как в следующем запросе
+        return User.objects.get(pk=self.user.pk)
+
+    def test_snapshot_contains_groups_and_permissions(self):
+        self.user.groups.add(self.group)
+        self.group.permissions.add(self.permission)
+        snapshot = get_snapshot(self.fresh_user())
+        self.assertTrue(snapshot.has_group('Librarian'))
+        self.assertTrue(snapshot.has_perm('catalog.can_check_all_borrowed_books'))
+        self.assertFalse(snapshot.has_perm('catalog.can_mark_returned'))
+
+    def test_snapshot_is_loaded_once(self):
+        get_snapshot(self.fresh_user())
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertFalse(user.has_perm('catalog.can_check_all_borrowed_books'))
+            self.assertFalse(user.has_perm('catalog.can_mark_returned'))
+            get_snapshot(user)
+
+    def test_group_membership_change_invalidates(self):
+        self.assertFalse(get_snapshot(self.fresh_user()).has_group('Librarian'))
+        self.user.groups.add(self.group)
+        self.assertTrue(get_snapshot(self.fresh_user()).has_group('Librarian'))
+        self.group.user_set.remove(self.user)
+        self.assertFalse(get_snapshot(self.fresh_user()).has_group('Librarian'))
+
+    def test_permission_change_invalidates(self):
+        self.assertFalse(self.fresh_user().has_perm('catalog.can_check_all_borrowed_books'))
+        self.user.user_permissions.add(self.permission)
+        self.assertTrue(self.fresh_user().has_perm('catalog.can_check_all_borrowed_books'))
+
+    def test_group_permission_change_invalidates(self):
+        self.user.groups.add(self.group)
+        self.assertFalse(self.fresh_user().has_perm('catalog.can_check_all_borrowed_books'))
+        self.group.permissions.add(self.permission)
+        self.assertTrue(self.fresh_user().has_perm('catalog.can_check_all_borrowed_books'))
+
+    def test_superuser_and_inactive(self):
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertTrue(self.fresh_user().has_perm('catalog.can_mark_returned'))
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.fresh_user().has_perm('catalog.can_mark_returned'))
+
+    def test_other_user_fields_keep_the_snapshot(self):
+        version = snapshot_version(self.user)
+        # вход сохраняет только last_login
+        update_last_login(None, self.user)
+        self.user.first_name = 'John'
+        self.user.save()
+        self.assertEqual(snapshot_version(self.fresh_user()), version)
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertNotEqual(snapshot_version(self.fresh_user()), version)
+
+    def test_permission_required_view_uses_snapshot(self):
+        self.client.login(username='testuser1', password='12345')
+        resp = self.client.get(reverse('all-borrowed'))
+        self.assertEqual(resp.status_code, 403)
+        self.user.user_permissions.add(self.permission)
+        resp = self.client.get(reverse('all-borrowed'))
+        self.assertEqual(resp.status_code, 200)
+
+    def test_sidebar_lists_groups(self):
+        self.user.groups.add(self.group)
+        self.client.login(username='testuser1', password='12345')
+        resp = self.client.get(reverse('index'))
+        self.assertContains(resp, 'Группы в которые входит пользователь Librarian')
+        # библиотекарю не показывается ссылка "My Borrowed"
+        self.assertNotContains(resp, 'My Borrowed')
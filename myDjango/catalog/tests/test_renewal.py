@@ -0,0 +1,93 @@
+from django.test import TestCase
+from django.contrib.auth.models import Permission, User
+from django.urls import reverse
+
+import datetime
+import json
+import uuid
+
+from .. import views
+from ..models import Book, BookInstance
+from ..services import NOT_FOUND, NOT_ON_LOAN, RENEWED, renew_loans
+
+
+class BulkRenewalTest(TestCase):
+
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='12345')
+        self.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.reader = User.objects.create_user(username='reader', password='12345')
+        self.book = Book.objects.create(title='Book Title', summary='Summary', isbn='1')
+        today = datetime.date.today()
+        self.loans = [BookInstance.objects.create(book=self.book, imprint='Imprint', status='o', borrower=self.reader,
+                                                  due_back=today) for _ in range(30)]
+        self.available = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        self.date = today + datetime.timedelta(weeks=2)
+
+    def test_service_reports_every_copy(self):
+        missing = uuid.uuid4()
+        version = Book.objects.get(pk=self.book.pk).version
+        with self.assertNumQueries(5):
+            # SELECT ... FOR UPDATE, UPDATE экземпляров, UPDATE книги
+            # (и SAVEPOINT/RELEASE - в тестах транзакция вложенная)
+            results = renew_loans([self.loans[0].pk, self.available.pk, missing], self.date)
+        self.assertEqual(list(results.items()),
+                         [(self.loans[0].pk, RENEWED), (self.available.pk, NOT_ON_LOAN), (missing, NOT_FOUND)])
+        self.assertEqual(BookInstance.objects.get(pk=self.loans[0].pk).due_back, self.date)
+        self.assertIsNone(BookInstance.objects.get(pk=self.available.pk).due_back)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).version, version + 1)
+
+    def test_api(self):
+        self.client.login(username='librarian', password='12345')
+        url = reverse('api-renew-loans')
+        body = {'copies': [str(copy.pk) for copy in self.loans] + [str(self.available.pk)],
+                'renewal_date': self.date.isoformat()}
+        response = self.client.post(url, json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['renewed'], 30)
+        self.assertEqual(data['results'][str(self.available.pk)], NOT_ON_LOAN)
+        self.assertEqual(BookInstance.objects.filter(due_back=self.date).count(), 30)
+
+    def test_api_validates_like_renew_form(self):
+        self.client.login(username='librarian', password='12345')
+        url = reverse('api-renew-loans')
+        too_far = datetime.date.today() + datetime.timedelta(weeks=5)
+        response = self.client.post(url, json.dumps({'copies': [str(self.loans[0].pk)],
+                                                     'renewal_date': too_far.isoformat()}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('renewal_date', response.json()['errors'])
+        response = self.client.post(url, json.dumps({'copies': ['nope'], 'renewal_date': self.date.isoformat()}),
+                                    content_type='application/json')
+        self.assertIn('copies', response.json()['errors'])
+        # не строки и не списки из JSON - 400, а не 500
+        response = self.client.post(url, json.dumps({'copies': 5, 'renewal_date': self.date.isoformat()}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('copies', response.json()['errors'])
+        response = self.client.post(url, json.dumps({'copies': [str(self.loans[0].pk)], 'renewal_date': 20261025}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('renewal_date', response.json()['errors'])
+        self.assertEqual(self.client.post(url, 'nope', content_type='application/json').status_code, 400)
+        self.assertEqual(BookInstance.objects.filter(due_back=self.date).count(), 0)
+
+    def test_requires_permission(self):
+        self.client.login(username='reader', password='12345')
+        response = self.client.post(reverse('api-renew-loans'), '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(reverse('renew-books-bulk'), {'copies': [self.loans[0].pk]})
+        self.assertEqual(response.status_code, 302)
+
+    def test_form_view(self):
+        self.client.login(username='librarian', password='12345')
+        data = {'copies': [copy.pk for copy in self.loans], 'renewal_date': self.date.isoformat()}
+        # запросов не больше при 30 экземплярах, чем при одном
+        with self.assertNumQueries(views.renew_books_bulk.query_budget):
+            response = self.client.post(reverse('renew-books-bulk'), data)
+        self.assertContains(response, 'renewed', count=30)
+        self.assertEqual(BookInstance.objects.filter(due_back=self.date).count(), 30)
+
+        response = self.client.post(reverse('renew-books-bulk'), {'renewal_date': self.date.isoformat()})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,143 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import time
+
+from .. import routers
+from ..models import Author, Book
+
+
+class FixedLagRouter(routers.PrimaryReplicaRouter):
+    # отставание реплик задается тестом, а не запросом к базе
+    lags = {}
+
+    def lag(self, alias):
+        return self.lags.get(alias, 0.0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_MAX_LAG_SECONDS=5,
+                   REPLICA_STICKY_SECONDS=10)
+class PrimaryReplicaRouterTest(SimpleTestCase):
+    # SimpleTestCase не открывает транзакцию, иначе все чтения шли бы на primary
+
+    def setUp(self):
+        self.router = FixedLagRouter()
+        self.router.lags = {}
+        token = routers._state.set(routers.RoutingState())
+        self.addCleanup(routers._state.reset, token)
+
+    def test_catalog_reads_go_to_one_replica(self):
+        alias = self.router.db_for_read(Book)
+        self.assertIn(alias, ['replica1', 'replica2'])
+        # весь запрос читает с одной и той же реплики
+        self.assertEqual({self.router.db_for_read(Author) for _ in range(20)}, {alias})
+
+    def test_other_apps_and_writes(self):
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertEqual(self.router.db_for_write(Book), 'default')
+
+    def test_reads_stick_to_primary_after_write(self):
+        self.router.db_for_write(Book)
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_use_primary(self):
+        with routers.use_primary():
+            self.assertEqual(self.router.db_for_read(Book), 'default')
+        self.assertNotEqual(self.router.db_for_read(Book), 'default')
+
+    def test_lagging_replica_is_skipped(self):
+        self.router.lags = {'replica1': 30.0}
+        self.assertEqual({self.router.db_for_read(Book) for _ in range(20)}, {'replica2'})
+
+    def test_falls_back_to_primary(self):
+        self.router.lags = {'replica1': 30.0, 'replica2': None}
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_replica_that_starts_lagging_is_replaced(self):
+        self.router.lags = {'replica2': 30.0}
+        self.assertEqual(self.router.db_for_read(Book), 'replica1')
+        self.router.lags = {'replica1': 30.0}
+        self.assertEqual(self.router.db_for_read(Book), 'replica2')
+
+    def test_reads_in_transaction_stay_on_primary(self):
+        # то же состояние соединения, что и внутри transaction.atomic()
+        connection = connections['default']
+        self.addCleanup(setattr, connection, 'in_atomic_block', connection.in_atomic_block)
+        connection.in_atomic_block = True
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_no_migrations_on_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'catalog'))
+        self.assertIsNone(self.router.allow_migrate('default', 'catalog'))
+
+
+@override_settings(REPLICA_STICKY_SECONDS=10)
+class ReplicaStickinessMiddlewareTest(SimpleTestCase):
+
+    def run_middleware(self, request, write=False):
+        seen = {}
+
+        def get_response(request):
+            state = routers.get_state()
+            seen['pinned'] = state.pinned
+            if write:
+                routers.PrimaryReplicaRouter().db_for_write(Book)
+            return HttpResponse()
+
+        response = routers.ReplicaStickinessMiddleware(get_response)(request)
+        return seen['pinned'], response
+
+    def test_get_is_not_pinned(self):
+        pinned, response = self.run_middleware(RequestFactory().get('/'))
+        self.assertFalse(pinned)
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+    def test_post_is_pinned_and_write_sets_cookie(self):
+        pinned, response = self.run_middleware(RequestFactory().post('/'), write=True)
+        self.assertTrue(pinned)
+        cookie = response.cookies[routers.STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+        self.assertGreater(float(cookie.value), time.time())
+
+    def test_cookie_pins_next_requests(self):
+        request = RequestFactory().get('/')
+        request.COOKIES[routers.STICKY_COOKIE] = str(time.time() + 5)
+        self.assertTrue(self.run_middleware(request)[0])
+        request.COOKIES[routers.STICKY_COOKIE] = str(time.time() - 5)
+        self.assertFalse(self.run_middleware(request)[0])
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'no read replicas configured (DATABASE_REPLICA_HOSTS)')
+class ReplicaRoutingIntegrationTest(TransactionTestCase):
+    # реплики в тестах - зеркала тестовой базы default (TEST MIRROR)
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        self.replica = settings.DATABASE_REPLICAS[0]
+        self.user = User.objects.create_user(username='testuser1', password='12345')
+        self.client.login(username='testuser1', password='12345')
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+
+    def test_detail_page_reads_from_replica(self):
+        with CaptureQueriesContext(connections[self.replica]) as queries:
+            resp = self.client.get(self.author.get_absolute_url())
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(queries.captured_queries)
+
+    def test_reads_stick_to_primary_after_write(self):
+        self.user.user_permissions.add(Permission.objects.get(codename='can_update_create_delete_author'))
+        resp = self.client.post(reverse('author_update', args=[self.author.pk]),
+                                {'first_name': 'Johnny', 'last_name': 'Smith'})
+        self.assertEqual(resp.status_code, 302)
+        self.assertIn(routers.STICKY_COOKIE, resp.cookies)
+        with CaptureQueriesContext(connections[self.replica]) as queries:
+            resp = self.client.get(self.author.get_absolute_url())
+        self.assertContains(resp, 'Johnny')
+        self.assertFalse(queries.captured_queries)
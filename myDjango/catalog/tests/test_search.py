@@ -0,0 +1,102 @@
+from django.test import TestCase
+from django.db import connection
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from unittest import skipUnless
+
+from ..models import Author, Book, Genre
+from ..search import MAX_PAGE, search_catalog
+
+
+class SearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Joanne', last_name='Rowling')
+        cls.book = Book.objects.create(title='Гарри Поттер', summary='Мальчик <b>волшебник</b> и его друзья',
+                                       isbn='1234567890123', author=cls.author)
+        Book.objects.create(title='Other book', summary='Nothing about wizards', isbn='1234567890124')
+        Genre.objects.create(name='Ужасы')
+        for book_num in range(12):
+            Book.objects.create(title='Series %s' % book_num, summary='Series summary', isbn='SER%s' % book_num)
+
+    # SQLite сравнивает без учета регистра только латиницу, поэтому кириллица в нужном регистре
+    def test_finds_books_authors_and_genres(self):
+        self.assertEqual([(r['kind'], r['id']) for r in search_catalog('Гарри')], [('book', self.book.pk)])
+        self.assertEqual([r['kind'] for r in search_catalog('rowling')], ['author'])
+        self.assertEqual([r['label'] for r in search_catalog('Ужас')], ['Ужасы'])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(len(search_catalog('волшебник друзья')), 1)
+        self.assertEqual(len(search_catalog('волшебник wizards')), 0)
+
+    def test_highlight_is_escaped(self):
+        headline = search_catalog('волшебник').results[0]['headline']
+        self.assertIn('<mark>волшебник</mark>', headline)
+        self.assertIn('&lt;b&gt;', headline)
+
+    def test_ranking_prefers_title_matches(self):
+        results = search_catalog('series 1')
+        self.assertEqual(results.results[0]['label'], 'Series 1')
+
+    def test_pagination_without_count(self):
+        first = search_catalog('series', page=1, per_page=10)
+        second = search_catalog('series', page=2, per_page=10)
+        self.assertTrue(first.has_next)
+        self.assertFalse(second.has_next)
+        self.assertEqual(len(first) + len(second), 12)
+
+    def test_page_is_clamped(self):
+        results = search_catalog('series', page=10 ** 20)
+        self.assertEqual((results.page, len(results)), (MAX_PAGE, 0))
+        User.objects.create_user(username='testuser1', password='12345')
+        self.client.login(username='testuser1', password='12345')
+        resp = self.client.get(reverse('search'), {'q': 'a', 'page': '99999999999999999999'})
+        self.assertEqual(resp.status_code, 200)
+
+    def test_empty_query(self):
+        self.assertEqual(len(search_catalog('   ')), 0)
+
+    def test_search_view(self):
+        User.objects.create_user(username='testuser1', password='12345')
+        self.client.login(username='testuser1', password='12345')
+        resp = self.client.get(reverse('search'), {'q': 'Гарри'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTemplateUsed(resp, 'catalog/search_results.html')
+        self.assertContains(resp, self.book.get_absolute_url())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'tsvector, ts_headline and pg_trgm need PostgreSQL')
+class PostgresSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Joanne', last_name='Rowling')
+        cls.book = Book.objects.create(title='Wizard school', summary='A boy <b>wizard</b> and his friends',
+                                       isbn='1234567890123', author=cls.author)
+        for book_num in range(15):
+            Book.objects.create(title='Wizard tales %s' % book_num, summary='More wizard stories',
+                                isbn='WIZ%s' % book_num)
+        Genre.objects.create(name='Wizardry')
+
+    def test_finds_and_highlights_escaped_text(self):
+        results = search_catalog('wizard friends')
+        self.assertEqual((results.results[0]['kind'], results.results[0]['id']), ('book', self.book.pk))
+        headline = results.results[0]['headline']
+        self.assertIn('<mark>friends</mark>', headline)
+        self.assertIn('&lt;b&gt;', headline)
+        self.assertEqual([r['label'] for r in search_catalog('rowling')], ['Rowling, Joanne'])
+
+    def test_pages_have_labels_and_headlines(self):
+        first = search_catalog('wizard', page=1, per_page=10)
+        second = search_catalog('wizard', page=2, per_page=10)
+        self.assertTrue(first.has_next)
+        rows = first.results + second.results
+        self.assertEqual(len({(row['kind'], row['id']) for row in rows}), len(rows))
+        self.assertEqual([row['rank'] for row in first.results],
+                         sorted((row['rank'] for row in first.results), reverse=True))
+        for row in rows:
+            self.assertTrue(row['label'])
+            if row['kind'] == 'book':
+                self.assertIn('<mark>', row['headline'])
@@ -0,0 +1,76 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+
+from ..session_backend import SessionStore
+
+
+@override_settings(SESSION_ENGINE='catalog.session_backend', SESSION_COALESCED_KEYS=['num_visits'],
+                   SESSION_FLUSH_EVERY=5, SESSION_FLUSH_INTERVAL=300)
+class CoalescingSessionTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='testuser1', password='12345')
+        self.client.login(username='testuser1', password='12345')
+        self.session_key = self.client.session.session_key
+
+    def stored_visits(self):
+        # то, что записано в базу (без кэша)
+        data = Session.objects.get(session_key=self.session_key).get_decoded()
+        return data.get('num_visits', 0)
+
+    def session_writes(self, queries):
+        return [q['sql'] for q in queries if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')]
+
+    def test_visits_are_coalesced(self):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(10):
+                self.client.get(reverse('index'))
+        # 10 просмотров - 2 записи в базу (каждое пятое сохранение)
+        self.assertEqual(len(self.session_writes(queries)), 2)
+        self.assertEqual(self.stored_visits(), 10)
+
+    def test_counter_is_visible_before_flush(self):
+        for _ in range(3):
+            self.client.get(reverse('index'))
+        self.assertEqual(self.stored_visits(), 0)
+        resp = self.client.get(reverse('index'))
+        self.assertEqual(resp.context['num_visits'], 3)
+
+    def test_login_is_written_through(self):
+        data = Session.objects.get(session_key=self.session_key).get_decoded()
+        self.assertIn('_auth_user_id', data)
+
+    def test_other_keys_are_written_through(self):
+        session = SessionStore(self.session_key)
+        session['num_visits'] = 1
+        session.save()
+        self.assertEqual(self.stored_visits(), 0)
+        session = SessionStore(self.session_key)
+        session['theme'] = 'dark'
+        session.save()
+        data = Session.objects.get(session_key=self.session_key).get_decoded()
+        self.assertEqual((data['theme'], data['num_visits']), ('dark', 1))
+
+    def test_survives_lost_cache(self):
+        for _ in range(7):
+            self.client.get(reverse('index'))
+        # перезапуск воркеров с LocMemCache (или потеря общего кэша)
+        cache.clear()
+        resp = self.client.get(reverse('index'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['user'].username, 'testuser1')
+        # потеряны только изменения счетчика после последней записи в базу
+        self.assertEqual(resp.context['num_visits'], 5)
+
+    def test_logout(self):
+        self.client.get(reverse('index'))
+        self.client.logout()
+        self.assertFalse(Session.objects.filter(session_key=self.session_key).exists())
+        resp = self.client.get(reverse('index'))
+        self.assertEqual(resp.status_code, 302)
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from .. import storage
+from ..storage import accepted_encodings, brotli
+
+
+class StaticPipelineTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(STATIC_ROOT=cls.static_root, DEBUG=False)
+        cls.settings_override.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.static_root)
+        super().tearDownClass()
+
+    def setUp(self):
+        User.objects.create_user(username='testuser1', password='12345')
+        self.client.login(username='testuser1', password='12345')
+        self.css = staticfiles_storage.stored_name('catalog/vendor/bootstrap-3.3.7/css/bootstrap.min.css')
+        self.css_url = settings.STATIC_URL + self.css
+
+    def test_pages_link_fingerprinted_vendored_assets(self):
+        content = self.client.get(reverse('index')).content.decode()
+        self.assertNotIn('bootstrapcdn', content)
+        self.assertNotIn('googleapis', content)
+        self.assertIn(self.css_url, content)
+        self.assertRegex(content, r'/static/catalog/css/style\.[0-9a-f]{12}\.css')
+        self.assertRegex(content, r'/static/catalog/vendor/jquery-1\.12\.4/jquery\.min\.[0-9a-f]{12}\.js')
+
+    def test_compressed_variants_are_written(self):
+        path = os.path.join(self.static_root, self.css)
+        with open(path, 'rb') as f, gzip.open(path + '.gz') as compressed:
+            self.assertEqual(compressed.read(), f.read())
+        self.assertEqual(os.path.exists(path + '.br'), brotli is not None)
+        # шрифты woff2 уже сжаты
+        fonts = os.listdir(os.path.join(self.static_root, 'catalog/vendor/bootstrap-3.3.7/fonts'))
+        self.assertFalse([name for name in fonts if name.endswith('.woff2.gz')])
+
+    def test_missing_brotli_is_reported(self):
+        # без brotli файлы .br молча не появились бы
+        with mock.patch.object(storage, 'brotli', None), self.assertLogs('catalog.storage', 'WARNING') as logs:
+            call_command('collectstatic', interactive=False, verbosity=0)
+        self.assertIn('brotli is not installed', logs.output[0])
+
+    def test_css_references_are_fingerprinted(self):
+        with open(os.path.join(self.static_root, self.css)) as f:
+            css = f.read()
+        self.assertRegex(css, r'glyphicons-halflings-regular\.[0-9a-f]{12}\.woff2')
+
+    def test_fingerprinted_file_is_immutable(self):
+        resp = self.client.get(self.css_url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'text/css')
+        self.assertEqual(resp['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(resp['Vary'], 'Accept-Encoding')
+        self.assertFalse(resp.has_header('Content-Encoding'))
+        with open(os.path.join(self.static_root, self.css), 'rb') as f:
+            self.assertEqual(b''.join(resp.streaming_content), f.read())
+
+    def test_gzip_variant_is_negotiated(self):
+        resp = self.client.get(self.css_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(resp['Content-Type'], 'text/css')
+        with open(os.path.join(self.static_root, self.css), 'rb') as f:
+            self.assertEqual(gzip.decompress(b''.join(resp.streaming_content)), f.read())
+        # q=0 - клиент отказался от gzip
+        resp = self.client.get(self.css_url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(resp.has_header('Content-Encoding'))
+
+    def test_unhashed_name_is_revalidated(self):
+        url = settings.STATIC_URL + 'catalog/vendor/bootstrap-3.3.7/css/bootstrap.min.css'
+        resp = self.client.get(url)
+        self.assertEqual(resp['Cache-Control'], 'no-cache')
+        resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified'])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_missing_and_outside_files_are_404(self):
+        self.assertEqual(self.client.get(settings.STATIC_URL + 'catalog/missing.css').status_code, 404)
+        self.assertEqual(self.client.get(settings.STATIC_URL + '../manage.py').status_code, 404)
+        self.assertEqual(self.client.post(self.css_url).status_code, 405)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('gzip, deflate, br'), {'gzip', 'deflate', 'br'})
+        self.assertEqual(accepted_encodings('br;q=0, GZIP;q=0.5'), {'gzip'})
+        self.assertEqual(accepted_encodings(''), set())
@@ -0,0 +1,98 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from io import StringIO
+
+from ..models import Author, Book, BookInstance, CatalogStats, CatalogStatsShard
+from ..stats import STATS_SHARDS, bump_stats, get_stats, rebuild_stats
+
+
+class CatalogStatsTest(TestCase):
+
+    def setUp(self):
+        # строка счетчиков создается с нуля, дальше ее поддерживают сигналы
+        rebuild_stats()
+        self.author = Author.objects.create(first_name='John', last_name='Smith')
+        self.book = Book.objects.create(title='Book Title', summary='My book summary',
+                                        isbn='ABCDEFG', author=self.author)
+
+    def test_create_updates_counters(self):
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='m')
+        stats = get_stats()
+        self.assertEqual(stats.num_authors, 1)
+        self.assertEqual(stats.num_books, 1)
+        self.assertEqual(stats.num_instances, 2)
+        self.assertEqual(stats.num_instances_available, 1)
+
+    def test_status_change_updates_available_counter(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        copy = BookInstance.objects.get(pk=copy.pk)
+        copy.status = 'o'
+        copy.save()
+        self.assertEqual(get_stats().num_instances_available, 0)
+        # повторное сохранение того же объекта не должно менять счетчик еще раз
+        copy.save()
+        self.assertEqual(get_stats().num_instances_available, 0)
+        copy.status = 'a'
+        copy.save()
+        self.assertEqual(get_stats().num_instances_available, 1)
+
+    def test_status_change_of_deferred_instance(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        copy = BookInstance.objects.only('id', 'book').get(pk=copy.pk)
+        copy.status = 'm'
+        copy.save()
+        self.assertEqual(get_stats().num_instances_available, 0)
+
+    def test_delete_updates_counters(self):
+        copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        copy.delete()
+        self.book.delete()
+        self.author.delete()
+        stats = get_stats()
+        self.assertEqual((stats.num_authors, stats.num_books, stats.num_instances,
+                          stats.num_instances_available), (0, 0, 0, 0))
+
+    def test_copy_counters_go_to_the_book_shard(self):
+        BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        self.assertEqual(CatalogStats.objects.get().num_instances, 0)
+        shard = CatalogStatsShard.objects.get(pk=self.book.pk % STATS_SHARDS + 1)
+        self.assertEqual((shard.num_instances, shard.num_instances_available), (1, 1))
+        with self.assertNumQueries(1):
+            stats = get_stats()
+        self.assertEqual((stats.num_instances, stats.num_instances_available), (1, 1))
+        # пересчет переносит итог в строку и обнуляет шарды
+        rebuild_stats()
+        self.assertEqual(CatalogStats.objects.get().num_instances, 1)
+        self.assertFalse(CatalogStatsShard.objects.exclude(num_instances=0).exists())
+        self.assertEqual(get_stats().num_instances, 1)
+
+    def test_missing_shard_falls_back_to_the_row(self):
+        CatalogStatsShard.objects.all().delete()
+        bump_stats(shard_key=self.book.pk, num_instances=2)
+        self.assertEqual(get_stats().num_instances, 2)
+
+    def test_missing_row_is_rebuilt(self):
+        CatalogStats.objects.all().delete()
+        self.assertEqual(get_stats().num_books, 1)
+
+    def test_rebuild_command(self):
+        # имитируем рассинхронизацию счетчиков
+        CatalogStats.objects.update(num_books=100, num_authors=100)
+        out = StringIO()
+        call_command('rebuild_catalog_stats', stdout=out)
+        stats = get_stats()
+        self.assertEqual(stats.num_books, 1)
+        self.assertEqual(stats.num_authors, 1)
+        self.assertIn('1 books', out.getvalue())
+
+    def test_index_reads_counters_row(self):
+        User.objects.create_user(username='testuser1', password='12345')
+        self.client.login(username='testuser1', password='12345')
+        CatalogStats.objects.update(num_books=42)
+        resp = self.client.get(reverse('index'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['num_books'], 42)
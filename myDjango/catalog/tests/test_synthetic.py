@@ -0,0 +1,108 @@
+from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.contrib.auth.models import User
+
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from .. import urls as catalog_urls
+from ..models import Author, Book, BookInstance, Genre
+from ..stats import get_stats
+from ..synthetic import SyntheticCatalog
+
+
+class SyntheticCatalogTest(TestCase):
+    today = datetime.date(2030, 1, 1)
+
+    def generate(self, **volumes):
+        options = dict(authors=20, books=60, instances=400, genres=5, borrowers=10, batch_size=25,
+                       today=self.today, use_copy=False)
+        options.update(volumes)
+        return SyntheticCatalog(**options).generate()
+
+    def test_volumes_and_counters(self):
+        self.generate()
+        self.assertEqual((Author.objects.count(), Book.objects.count(), BookInstance.objects.count()),
+                         (20, 60, 400))
+        self.assertEqual(Genre.objects.count(), 5)
+        self.assertEqual(User.objects.count(), 10)
+        stats = get_stats()
+        self.assertEqual((stats.num_books, stats.num_instances), (60, 400))
+        self.assertEqual(sum(Book.objects.values_list('total_copies', flat=True)), 400)
+        self.assertEqual(sum(Book.objects.values_list('available_copies', flat=True)),
+                         BookInstance.objects.filter(status='a').count())
+
+    def test_distributions(self):
+        self.generate()
+        on_loan = BookInstance.objects.filter(status='o')
+        self.assertTrue(150 < BookInstance.objects.filter(status='a').count() < 330)
+        self.assertTrue(on_loan.exists())
+        self.assertFalse(on_loan.filter(due_back=None).exists())
+        self.assertFalse(BookInstance.objects.exclude(status='o').exclude(due_back=None).exists())
+        self.assertTrue(on_loan.filter(due_back__lt=self.today).exists())
+        self.assertTrue(on_loan.filter(due_back__gte=self.today).exists())
+        self.assertFalse(Book.objects.filter(genre=None).exists())
+
+    def test_same_seed_same_catalog(self):
+        def snapshot():
+            return (list(Book.objects.order_by('isbn').values_list('isbn', 'title', 'author__last_name')),
+                    sorted(BookInstance.objects.values_list('id', 'book__isbn', 'status', 'due_back')))
+
+        self.generate(seed=7)
+        first = snapshot()
+        BookInstance.objects.all().delete()
+        Book.objects.all().delete()
+        Author.objects.all().delete()
+        Genre.objects.all().delete()
+        User.objects.all().delete()
+        self.generate(seed=7)
+        self.assertEqual(snapshot(), first)
+
+
+class BenchmarkCommandTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def test_generate_and_benchmark(self):
+        call_command('generate_catalog', authors=5, books=10, instances=30, genres=3, borrowers=3,
+                     no_copy=True, stdout=StringIO())
+        output = os.path.join(self.tmpdir, 'results.json')
+        call_command('benchmark_catalog', requests=2, output=output, label='test', stdout=StringIO())
+
+        with open(output) as f:
+            data = json.load(f)
+        self.assertEqual(data['label'], 'test')
+        self.assertEqual(data['volumes']['books'], 10)
+        results = {result['name']: result for result in data['results']}
+        # каждый именованный адрес catalog/urls.py и списки в админке
+        for pattern in catalog_urls.urlpatterns:
+            self.assertIn(pattern.name, results)
+            self.assertNotIn('error', results[pattern.name])
+        self.assertIn('admin:catalog_book_changelist', results)
+        for result in data['results']:
+            if 'skipped' in result:
+                continue
+            self.assertEqual(result['status'], 200, result['url'])
+            self.assertEqual(result['requests'], 2)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        # временный суперпользователь удален
+        self.assertFalse(User.objects.filter(username__startswith='benchmark').exists())
+
+    def test_benchmark_as_existing_user(self):
+        User.objects.create_user(username='reader', password='12345')
+        output = os.path.join(self.tmpdir, 'results.json')
+        call_command('benchmark_catalog', requests=1, warmup=0, no_admin=True, user='reader', output=output,
+                     stdout=StringIO())
+        with open(output) as f:
+            results = {result['name']: result for result in json.load(f)['results']}
+        # у читателя нет прав библиотекаря
+        self.assertEqual(results['all-borrowed']['status'], 403)
+        self.assertTrue(User.objects.filter(username='reader').exists())
+        with self.assertRaises(CommandError):
+            call_command('benchmark_catalog', user='nobody', output=output, stdout=StringIO())
@@ -0,0 +1,59 @@
+from django.test import SimpleTestCase, TestCase
+from django.core.management import call_command
+
+import time
+import uuid
+from io import StringIO
+from unittest import mock
+
+from .. import uuids
+from ..models import Book, BookInstance
+from ..synthetic import SyntheticCatalog
+from ..uuids import uuid7, uuid7_from, uuid7_timestamp
+
+
+class Uuid7Test(SimpleTestCase):
+
+    def test_layout(self):
+        value = uuid7()
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, uuid.RFC_4122)
+        self.assertLessEqual(abs(uuid7_timestamp(value) - time.time() * 1000), 1000)
+
+    def test_keys_are_increasing(self):
+        keys = [uuid7() for _ in range(10000)]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_counter_overflow_and_clock_going_back(self):
+        future = int(time.time() * 1000) + 60000
+        with mock.patch.object(uuids, '_last', [future, 0xFFF]):
+            value = uuid7()
+        self.assertEqual(uuid7_timestamp(value), future + 1)
+        self.assertGreater(value, uuid7_from(future, 0xFFF, 2 ** 62 - 1))
+
+
+class Uuid7KeysTest(TestCase):
+
+    def test_book_instance_default(self):
+        book = Book.objects.create(title='Book', summary='Summary', isbn='1')
+        first = BookInstance.objects.create(book=book, imprint='Imprint')
+        second = BookInstance.objects.create(book=book, imprint='Imprint')
+        self.assertEqual(first.pk.version, 7)
+        self.assertLess(first.pk, second.pk)
+        # старые случайные ключи остаются рабочими
+        old = BookInstance.objects.create(id=uuid.uuid4(), book=book, imprint='Imprint')
+        self.assertEqual(BookInstance.objects.get(pk=old.pk).pk.version, 4)
+
+    def test_synthetic_key_versions(self):
+        for version in (4, 7):
+            BookInstance.objects.all().delete()
+            SyntheticCatalog(authors=2, books=3, instances=20, genres=2, borrowers=2, seed=version,
+                             use_copy=False, key_version=version).generate()
+            self.assertEqual({pk.version for pk in BookInstance.objects.values_list('pk', flat=True)}, {version})
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_uuid_keys', rows=300, batch_size=100, stdout=out)
+        self.assertIn('v4: 300 rows', out.getvalue())
+        self.assertIn('v7: 300 rows', out.getvalue())
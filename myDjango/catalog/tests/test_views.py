@@ -1,8 +1,13 @@
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.cache import cache
 
 # Create your tests here.
 
+from .. import views
 from ..models import Author, BookInstance, Book, Genre
+from ..stats import rebuild_stats
 from django.urls import reverse
 
 import datetime
@@ -10,6 +15,7 @@ from django.utils import timezone
 
 from django.contrib.auth.models import User  # Необходимо для представления User как borrower
 from django.contrib.auth.models import Permission # Required to grant the permission needed to set a book as returned.
+from django.contrib.auth.models import Group
 
 import uuid
 
@@ -34,6 +40,9 @@ class AuthorListViewTest(TestCase):
             Author.objects.create(first_name='Christian %s' % author_num, last_name='Surname %s' % author_num, )
 
     def setUp(self):
+        # данные из setUpTestData одинаковы во всех тестах класса - страница из общего
+        # кэша (catalog/pagecache.py) пришла бы без response.context
+        cache.clear()
         # Создание пользователя
         test_user1 = User.objects.create_user(username='testuser1', password='12345')
         test_user1.save()
@@ -476,3 +485,95 @@ class AuthorCreateTest(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertFormError(resp, 'form', 'date_of_birth', 'Enter a valid date.')
         self.assertFormError(resp, 'form', 'date_of_death', 'Enter a valid date.')
+
+
+class QueryBudgetTest(TestCase):
+    # каждое отображение должно укладываться в свой query_budget (см. views.py)
+    # независимо от количества строк, поэтому данных создается заметно больше,
+    # чем помещается на одну страницу
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = User.objects.create_user(username='librarian', password='12345')
+        for codename in ('can_mark_returned', 'can_check_all_borrowed_books',
+                         'can_update_create_delete_author', 'can_update_create_delete_book'):
+            cls.librarian.user_permissions.add(Permission.objects.get(codename=codename))
+        cls.librarian.groups.add(Group.objects.create(name='Librarian'))
+
+        genres = [Genre.objects.create(name='Genre %s' % genre_num) for genre_num in range(5)]
+        authors = [Author.objects.create(first_name='First %s' % author_num, last_name='Last %s' % author_num)
+                   for author_num in range(20)]
+        books = []
+        for book_num in range(60):
+            book = Book.objects.create(title='Title %s' % book_num, summary='Summary', isbn='ISBN%s' % book_num,
+                                       author=authors[book_num % 3])
+            book.genre.set(genres)
+            books.append(book)
+
+        due_back = datetime.date.today() + datetime.timedelta(days=3)
+        copies = [BookInstance(book=books[copy_num % 2], imprint='Imprint', due_back=due_back,
+                               status='o' if copy_num % 3 else 'a',
+                               borrower=cls.librarian if copy_num % 3 else None)
+                  for copy_num in range(150)]
+        BookInstance.objects.bulk_create(copies)
+        cls.book = books[0]
+        cls.author = authors[0]
+        cls.copy = BookInstance.objects.filter(status='o').first()
+        # bulk_create не вызывает сигналы, поэтому счетчики пересчитываются явно
+        rebuild_stats()
+
+    def setUp(self):
+        # кэш фрагментов пуст - бюджет проверяется для худшего случая
+        cache.clear()
+        self.client.login(username='librarian', password='12345')
+
+    def assertWithinBudget(self, url, budget):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertLessEqual(len(queries), budget,
+                             '%s made %s queries (budget %s):\n%s' % (
+                                 url, len(queries), budget, '\n'.join(q['sql'] for q in queries)))
+        return resp
+
+    def test_index(self):
+        self.assertWithinBudget(reverse('index'), views.index.query_budget)
+
+    def test_search(self):
+        self.assertWithinBudget(reverse('search') + '?q=Title', views.search.query_budget)
+
+    def test_book_list(self):
+        self.assertWithinBudget(reverse('books'), views.BookListView.query_budget)
+
+    def test_book_detail(self):
+        resp = self.assertWithinBudget(reverse('book-detail', args=[self.book.pk]),
+                                       views.BookDetailView.query_budget)
+        self.assertEqual(resp.content.decode().count('<strong>Imprint:</strong>'), 75)
+
+    def test_author_list(self):
+        self.assertWithinBudget(reverse('authors'), views.AuthorListView.query_budget)
+
+    def test_author_detail(self):
+        resp = self.assertWithinBudget(reverse('author-detail', args=[self.author.pk]),
+                                       views.AuthorDetailView.query_budget)
+        self.assertEqual(resp.content.decode().count('font-size: 30px'), 20)
+
+    def test_my_borrowed(self):
+        self.assertWithinBudget(reverse('my-borrowed'), views.LoanedBooksByUserListView.query_budget)
+
+    def test_all_borrowed(self):
+        self.assertWithinBudget(reverse('all-borrowed'), views.AllLoanedBooksForLibrarianView.query_budget)
+
+    def test_renew(self):
+        self.assertWithinBudget(reverse('renew-book-librarian', args=[self.copy.pk]),
+                                views.renew_book_librarian.query_budget)
+
+    def test_author_create_update_delete(self):
+        self.assertWithinBudget(reverse('author_create'), views.AuthorCreate.query_budget)
+        self.assertWithinBudget(reverse('author_update', args=[self.author.pk]), views.AuthorUpdate.query_budget)
+        self.assertWithinBudget(reverse('author_delete', args=[self.author.pk]), views.AuthorDelete.query_budget)
+
+    def test_book_create_update_delete(self):
+        self.assertWithinBudget(reverse('book_create'), views.BookCreate.query_budget)
+        self.assertWithinBudget(reverse('book_update', args=[self.book.pk]), views.BookUpdate.query_budget)
+        self.assertWithinBudget(reverse('book_delete', args=[self.book.pk]), views.BookDelete.query_budget)
@@ -0,0 +1,67 @@
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import get_resolver
+
+from io import StringIO
+from unittest import mock
+
+from .. import warmup
+
+
+class WarmupTest(TestCase):
+    # прогрев подключается ко всем базам, включая реплики
+    databases = '__all__'
+
+    def test_template_names_cover_catalog_and_registration(self):
+        names = warmup.template_names()
+        for name in ('base_generic.html', 'catalog/book_list.html', 'admin/catalog/change_form.html',
+                     'registration/login.html', 'registration/password_reset_email.html'):
+            self.assertIn(name, names)
+
+    def test_warm_up_reports_every_step(self):
+        report = warmup.warm_up()
+        self.assertEqual(report['templates'], len(warmup.template_names()))
+        self.assertGreater(report['urls'], 50)
+        self.assertIn('default', report['connections'])
+        self.assertIsNotNone(connection.connection)
+        for step in ('urls', 'templates', 'connections', 'total'):
+            self.assertGreaterEqual(report['%s_ms' % step], 0)
+        self.assertIs(warmup.last_report, report)
+        self.assertTrue(get_resolver()._populated)
+
+    def test_warm_up_without_connections(self):
+        report = warmup.warm_up(connect=False)
+        self.assertNotIn('connections', report)
+
+    def test_worker_warmup_leaves_no_connections_open(self):
+        # подключения, открытые при импорте wsgi.py, достались бы воркерам после fork
+        with mock.patch.object(warmup.connections, 'close_all') as close_all:
+            report = warmup.warm_up_worker()
+        self.assertNotIn('connections', report)
+        close_all.assert_called_once_with()
+
+    def test_post_worker_init_opens_connections(self):
+        warmup.warm_up(connect=False)
+        report = warmup.post_worker_init(None)
+        self.assertIn('default', report['connections'])
+        self.assertIn('urls', report)
+        self.assertGreaterEqual(report['total_ms'], report['connections_ms'])
+        self.assertIs(warmup.last_report, report)
+
+    @override_settings(WORKER_WARMUP=False)
+    def test_worker_warmup_can_be_disabled(self):
+        self.assertIsNone(warmup.warm_up_worker())
+        self.assertIsNone(warmup.post_worker_init(None))
+
+
+class BenchmarkStartupCommandTest(TestCase):
+
+    def test_command_compares_cold_and_warm_workers(self):
+        out = StringIO()
+        call_command('benchmark_startup', rounds=1, urls=['/accounts/login/'], stdout=out)
+        output = out.getvalue()
+        self.assertIn('cold: import', output)
+        self.assertIn('warm-up off', output)
+        self.assertRegex(output, r'warm: import [\d.]+ ms \(warm-up [\d.]+ ms\)')
+        self.assertIn('/accounts/login/ [200]: first', output)
@@ -1,10 +1,11 @@
 from django.urls import path
 from django.conf.urls import url
-from . import views
+from . import api, metrics, views
 
 
 urlpatterns = [
     url(r'^$', views.index, name='index'),
+    url(r'^search/$', views.search, name='search'),
     url(r'^books/$', views.BookListView.as_view(), name='books'),
     url(r'^book/(?P<pk>\d+)$', views.BookDetailView.as_view(), name='book-detail'),
     url(r'^authors/$', views.AuthorListView.as_view(), name='authors'),
@@ -12,6 +13,15 @@ urlpatterns = [
     url(r'^mybooks/$', views.LoanedBooksByUserListView.as_view(), name='my-borrowed'),
     url(r'^allborrowed/$', views.AllLoanedBooksForLibrarianView.as_view(), name='all-borrowed'),
     url(r'^book/(?P<pk>[-\w]+)/renew/$', views.renew_book_librarian, name='renew-book-librarian'),
+    url(r'^allborrowed/renew/$', views.renew_books_bulk, name='renew-books-bulk'),
+    url(r'^book/(?P<pk>\d+)/checkout/$', views.checkout_book, name='book-checkout'),
+    url(r'^copy/(?P<pk>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/return/$', views.return_book_copy,
+        name='return-copy'),
+    url(r'^export/(?P<kind>books|authors|loans)\.(?P<fmt>csv|jsonl)$', views.export_catalog, name='export'),
+    url(r'^api/v1/(?P<resource>books|authors|genres|availability)/$', api.collection, name='api-collection'),
+    url(r'^api/v1/(?P<resource>books|authors)/(?P<pk>\d+)$', api.detail, name='api-detail'),
+    url(r'^api/v1/loans/renew/$', views.renew_loans_api, name='api-renew-loans'),
+    url(r'^metrics/$', metrics.metrics_view, name='metrics'),
     url(r'^author/create/$', views.AuthorCreate.as_view(), name='author_create'),
     url(r'^author/(?P<pk>\d+)/update/$', views.AuthorUpdate.as_view(), name='author_update'),
     url(r'^author/(?P<pk>\d+)/delete/$', views.AuthorDelete.as_view(), name='author_delete'),
@@ -8,11 +8,23 @@ from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMix
 from django.contrib.auth.decorators import permission_required
 
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
 from django.urls import reverse
 import datetime
-
-from .forms import RenewBookForm, RenewBookModelForm
+import json
+
+from .forms import BookFilterForm, BulkRenewForm, CheckoutForm, RenewBookForm, RenewBookModelForm
+from .services import RENEWED, NoCopyAvailable, NotOnLoan, checkout, renew_loans, return_copy
+from .api import JSON_PARAMS
+from .stats import get_stats
+from .pagination import KeysetPaginationMixin
+from .conditional import ConditionalGetMixin
+from .pagecache import SharedPageCacheMixin
+from .changes import catalog_stamps
+from .search import search_catalog
+from .facets import book_facets
+from .exports import stream_csv, stream_jsonl
 
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
@@ -32,17 +44,10 @@ def index(request):
     """
     Функция отображения для домашней страницы сайта.
     """
-    # Генерация "количеств" некоторых главных объектов
-    num_books = Book.objects.all().count()
-    num_instances = BookInstance.objects.all().count()
-    # Доступные книги (статус = 'a')
-    num_instances_available = BookInstance.objects.filter(status__exact='a').count()
-    num_authors = Author.objects.count()  # Метод 'all()' применен по умолчанию.
-
-    # Получить жанры, которые содержат ЖАС без учета регистра
-    num_genre_my = Genre.objects.filter(name__icontains='ЖАС')
-    # Получить книги к Genre которые содержат гарри без учета регистра
-    num_books_my = Book.objects.filter(title__icontains='ГарРи')
+    # Генерация "количеств" некоторых главных объектов.
+    # Счетчики поддерживаются сигналами (catalog/signals.py), поэтому
+    # вместо четырех COUNT(*) по таблицам читается одна строка CatalogStats (с суммой шардов)
+    stats = get_stats()
 
     # добавдяем анализ сессии
     # Number of visits to this view, as counted in the session variable.
@@ -54,19 +59,43 @@ def index(request):
     return render(
         request,
         'index.html',
-        context={'num_books': num_books, 'num_instances': num_instances,
-                 'num_instances_available': num_instances_available, 'num_authors': num_authors,
-                 'num_genre_my': num_genre_my, 'num_books_my': num_books_my, 'num_visits': num_visits},
+        context={'num_books': stats.num_books, 'num_instances': stats.num_instances,
+                 'num_instances_available': stats.num_instances_available, 'num_authors': stats.num_authors,
+                 'num_visits': num_visits},
     )
 
 
+# Бюджет запросов к базе на один запрос страницы (проверяется в tests/test_views.py
+# на большом наборе данных). Сюда входят и "накладные" запросы: пользователь,
+# загрузка снимка групп и прав при промахе кэша (catalog/permissions.py) и
+# периодическая запись счетчика посещений в сессию (catalog/session_backend.py).
+index.query_budget = 5
+
+
+@login_required
+def search(request):
+    """
+    Search over books, authors and genres (full-text + trigram on PostgreSQL).
+    """
+    query = request.GET.get('q', '')
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    results = search_catalog(query, page=page, per_page=10)
+    return render(request, 'catalog/search_results.html', {'query': results.query, 'results': results})
+
+
+search.query_budget = 7
+
+
 # generic.ListView - чотбы выводился как список объектов
 # Это всё! Обобщенное отображение выполнит запрос к базе данных, получит все записи заданной модели (Book),
 # затем отрендерит (отрисует) соответствующий шаблон,
 # расположенный в /locallibrary/catalog/templates/catalog/book_list.html
 # если не указать queryset или не переопределить метод get_context_data,
 # то вернуться все записи Book.objects.all()
-class BookListView(LoginRequiredMixin, generic.ListView):
+class BookListView(LoginRequiredMixin, SharedPageCacheMixin, KeysetPaginationMixin, generic.ListView):
     # указываем куда перенаправить пользователя если он не аутентифицирован
     login_url = 'login'
     # куда сделать перенаправление после авторизации redirect_field_name == next в шаблоне
@@ -75,6 +104,8 @@ class BookListView(LoginRequiredMixin, generic.ListView):
     # redirect_field_name = 'books'
     model = Book
     paginate_by = 4
+    # у Book нет Meta.ordering, поэтому курсор строится по id
+    keyset_ordering = ('id', )
 
     # ваше собственное имя переменной контекста в шаблоне
     context_object_name = 'book_list'
@@ -83,12 +114,36 @@ class BookListView(LoginRequiredMixin, generic.ListView):
     queryset = Book.objects.all()
     # Определение имени вашего шаблона и его расположения
     template_name = 'book_list.html'
+    # сессия + пользователь + сайдбар + проверка ETag + одна страница книг вместе с авторами
+    # + фасеты (только при промахе их кэша); страница из общего кэша (catalog/pagecache.py)
+    # обходится без выборки книг и фасетов
+    query_budget = 7
 
     # переопределнием методов в классах отображения
     # можно переопределить метод родительского класса по получения списка queryset
+    def get_modification_stamps(self):
+        # в списке книг видны и имена авторов
+        return catalog_stamps()
+
     def get_queryset(self):
         # return Book.objects.filter(title__icontains='СИЯ')
-        return Book.objects.all()
+        # select_related - автор подтягивается через JOIN, а не отдельным запросом на каждую книгу
+        queryset = Book.objects.select_related('author')
+        filters = self.get_filters()
+        # ?genre=<id> - через промежуточную таблицу, индекс (genre_id, book_id)
+        if filters['genre']:
+            queryset = queryset.filter(genre=filters['genre'])
+        if filters['author']:
+            queryset = queryset.filter(author=filters['author'])
+        # ?available=1 - только книги, которые можно взять сейчас (счетчик в самой книге, без JOIN)
+        if filters['available']:
+            queryset = queryset.filter(available_copies__gt=0)
+        return queryset
+
+    def get_filters(self):
+        if not hasattr(self, '_filters'):
+            self._filters = BookFilterForm(self.request.GET).filters()
+        return self._filters
 
     # переопределение пеередоваемоего контекста в шаблон
     def get_context_data(self, **kwargs):
@@ -96,6 +151,9 @@ class BookListView(LoginRequiredMixin, generic.ListView):
         context = super(BookListView, self).get_context_data(**kwargs)
         # Добавляем новую переменную к контексту и иниуиализируем ее некоторым значением
         context['some_data'] = 'Книги просто отпадные'
+        # количества по жанрам, авторам и доступности - один запрос, кэш по версии и отметкам каталога
+        context['book_filters'] = self.get_filters()
+        context['facets'] = book_facets(self.get_filters(), self._modification_stamps())
         return context
 
 
@@ -103,13 +161,28 @@ class BookListView(LoginRequiredMixin, generic.ListView):
 # с именем /locallibrary/catalog/templates/catalog/book_detail.html,
 # а отображение передаст ему информацию из базы данных для определенной записи Book,
 # выделенной при помощи URL-преобразования.
-class BookDetailView(generic.DetailView):
+class BookDetailView(ConditionalGetMixin, generic.DetailView):
     model = Book
+    # проверка ETag + книга с автором + жанры + экземпляры (только при промахе
+    # кэша фрагмента), независимо от количества экземпляров
+    query_budget = 8
+
+    def get_modification_stamps(self):
+        # экземпляры и жанры поднимают last_modified книги, автор - свой
+        return (Book.objects.filter(pk=self.kwargs['pk'])
+                .values_list('last_modified', 'author__last_modified').first())
 
+    def get_queryset(self):
+        # prefetch_related - жанры загружаются одним запросом на всю страницу;
+        # экземпляры читаются в шаблоне внутри {% cache %}, т.е. только при промахе кэша
+        return Book.objects.select_related('author').prefetch_related('genre')
 
-class AuthorListView(LoginRequiredMixin, generic.ListView):
+
+class AuthorListView(LoginRequiredMixin, SharedPageCacheMixin, KeysetPaginationMixin, generic.ListView):
     model = Author
     paginate_by = 3
+    # Author.Meta.ordering = ['last_name'] + id для устойчивого порядка однофамильцев
+    keyset_ordering = ('last_name', 'id')
 
     # куда пересылать если пользователь не авторизован
     login_url = 'login'
@@ -123,10 +196,17 @@ class AuthorListView(LoginRequiredMixin, generic.ListView):
     queryset = Author.objects.all()
     # Определение имени вашего шаблона и его расположения
     template_name = 'author_list.html'
+    query_budget = 6
 
     # второй вариант получить queryset
     # переопределнием методов в классах отображения
     # можно переопределить метод родительского класса по получения списка queryset
+    def get_modification_stamps(self):
+        # в списке только имена авторов: время изменения авторов и их число, без отметок
+        # книг - выдачи и возвраты не меняют ни ETag, ни ключ страницы в общем кэше
+        books_modified, authors_modified, num_books, num_authors = catalog_stamps()
+        return authors_modified, num_authors
+
     def get_queryset(self):
         # return Book.objects.filter(title__icontains='СИЯ')
         return Author.objects.all()
@@ -140,11 +220,21 @@ class AuthorListView(LoginRequiredMixin, generic.ListView):
         return context
 
 
-class AuthorDetailView(generic.DetailView):
+class AuthorDetailView(ConditionalGetMixin, generic.DetailView):
     model = Author
+    # проверка ETag + автор + все его книги одним запросом (только при промахе кэша фрагмента)
+    query_budget = 7
 
+    def get_modification_stamps(self):
+        # изменения книг автора поднимают его last_modified (catalog/signals.py)
+        return Author.objects.filter(pk=self.kwargs['pk']).values_list('last_modified').first()
 
-class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
+    def get_queryset(self):
+        # книги читаются в шаблоне внутри {% cache %}, поэтому без prefetch_related
+        return Author.objects.all()
+
+
+class LoanedBooksByUserListView(LoginRequiredMixin, KeysetPaginationMixin, generic.ListView):
     """
     Generic class-based view listing books on loan to current user.
     """
@@ -152,12 +242,15 @@ class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
     model = BookInstance
     template_name = 'catalog/bookinstance_list_borrowed_user.html'
     paginate_by = 10
+    keyset_ordering = ('due_back', 'id')
+    query_budget = 5
 
     def get_queryset(self):
-        return BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o').order_by('due_back')
+        return (BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o')
+                .select_related('book').with_overdue().order_by('due_back'))
 
 
-class AllLoanedBooksForLibrarianView(PermissionRequiredMixin, generic.ListView):
+class AllLoanedBooksForLibrarianView(PermissionRequiredMixin, KeysetPaginationMixin, generic.ListView):
     """
     Generic class-based view listing books on loan to current user.
     """
@@ -168,9 +261,13 @@ class AllLoanedBooksForLibrarianView(PermissionRequiredMixin, generic.ListView):
     # указываем разрешения
     permission_required = ('catalog.can_check_all_borrowed_books', )
     paginate_by = 10
+    keyset_ordering = ('due_back', 'id')
+    query_budget = 5
 
     def get_queryset(self):
-        return BookInstance.objects.filter(status__exact='o').order_by('due_back')
+        # книга и заемщик для каждой строки списка приходят одним JOIN
+        return (BookInstance.objects.filter(status__exact='o').select_related('book', 'borrower')
+                .with_overdue().order_by('due_back'))
 
 # для ограничения доступа используется декоратор, поскольку у нас метод
 # для классов происходит наследование у класса PermissionRequiredMixin
@@ -179,7 +276,7 @@ def renew_book_librarian(request, pk):
     """
     View function for renewing a specific BookInstance by librarian
     """
-    book_inst = get_object_or_404(BookInstance, pk=pk)
+    book_inst = get_object_or_404(BookInstance.objects.select_related('book', 'borrower'), pk=pk)
 
     # If this is a POST request then process the Form data
     if request.method == 'POST':
@@ -220,6 +317,114 @@ def renew_book_librarian(request, pk):
 
     return render(request, 'catalog/book_renew_librarian.html', {'form': form, 'bookinst': book_inst})
 
+
+renew_book_librarian.query_budget = 5
+
+
+# продление многих экземпляров одним UPDATE (catalog/services.py): форма со
+# страницы всех выданных книг и JSON API с теми же правилами проверки даты
+@require_POST
+@permission_required('catalog.can_mark_returned')
+def renew_books_bulk(request):
+    """
+    Renews the copies checked on the all borrowed books page.
+    """
+    form = BulkRenewForm(request.POST)
+    results = None
+    if form.is_valid():
+        results = renew_loans(form.cleaned_data['copies'], form.cleaned_data['renewal_date'])
+        copies = BookInstance.objects.select_related('book', 'borrower').in_bulk(list(results))
+        results = [(pk, copies.get(pk), result) for pk, result in results.items()]
+    return render(request, 'catalog/bookinstance_bulk_renew.html',
+                  {'form': form, 'results': results, 'renewed': RENEWED}, status=200 if form.is_valid() else 400)
+
+
+# пользователь и права, транзакция продления (3 запроса + savepoint в тестах), экземпляры для отчета
+renew_books_bulk.query_budget = 9
+
+
+@require_POST
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def renew_loans_api(request):
+    """
+    POST {"copies": ["<uuid>", ...], "renewal_date": "YYYY-MM-DD"} ->
+    {"renewal_date": ..., "renewed": N, "results": {"<uuid>": "renewed" | "not_on_loan" | "not_found"}}.
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400, json_dumps_params=JSON_PARAMS)
+    # DateField разбирает только строки (или даты) - число из JSON уронило бы форму
+    if not isinstance(data.get('renewal_date', ''), str):
+        return JsonResponse({'errors': {'renewal_date': ['Expected a date string (YYYY-MM-DD)']}}, status=400,
+                            json_dumps_params=JSON_PARAMS)
+    form = BulkRenewForm(data)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400, json_dumps_params=JSON_PARAMS)
+    results = renew_loans(form.cleaned_data['copies'], form.cleaned_data['renewal_date'])
+    return JsonResponse({'renewal_date': form.cleaned_data['renewal_date'].isoformat(),
+                         'renewed': sum(1 for result in results.values() if result == RENEWED),
+                         'results': {str(pk): result for pk, result in results.items()}},
+                        json_dumps_params=JSON_PARAMS)
+
+
+def _loan_json(copy, status=200):
+    return JsonResponse({'id': str(copy.pk), 'book': copy.book_id, 'status': copy.status,
+                         'borrower': copy.borrower_id,
+                         'due_back': copy.due_back.isoformat() if copy.due_back else None},
+                        status=status, json_dumps_params=JSON_PARAMS)
+
+
+# выдача и возврат для библиотекарей (catalog/services.py); отвечают JSON,
+# поэтому без прав - 403, а не перенаправление на страницу входа
+@require_POST
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def checkout_book(request, pk):
+    """
+    Lends any available copy of the book: POST borrower=<username>[&due_back=YYYY-MM-DD].
+    """
+    get_object_or_404(Book.objects.only('pk'), pk=pk)
+    form = CheckoutForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400, json_dumps_params=JSON_PARAMS)
+    try:
+        copy = checkout(int(pk), form.cleaned_data['borrower'], form.cleaned_data['due_back'])
+    except NoCopyAvailable as e:
+        return JsonResponse({'error': str(e)}, status=409, json_dumps_params=JSON_PARAMS)
+    return _loan_json(copy, status=201)
+
+
+@require_POST
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def return_book_copy(request, pk):
+    """
+    Marks a copy on loan as returned.
+    """
+    try:
+        copy = return_copy(pk)
+    except BookInstance.DoesNotExist:
+        raise Http404('No such copy')
+    except NotOnLoan as e:
+        return JsonResponse({'error': str(e)}, status=409, json_dumps_params=JSON_PARAMS)
+    return _loan_json(copy)
+
+# выгрузка каталога для библиотекарей: ответ отдается потоком по мере чтения
+# строк из базы, поэтому память не растет с размером выгрузки
+@permission_required('catalog.can_check_all_borrowed_books')
+def export_catalog(request, kind, fmt):
+    """
+    Streams books, authors or loans as CSV or JSON Lines.
+    """
+    if fmt == 'csv':
+        response = StreamingHttpResponse(stream_csv(kind), content_type='text/csv; charset=utf-8')
+    else:
+        response = StreamingHttpResponse(stream_jsonl(kind), content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (kind, fmt)
+    return response
+
+
 # Обобщенные классы отображения для редактирования
 # синтаксис такой как и у форм, которые наслеюутся у ModelForm
 # Отображения  "создать" и "обновить" используют  шаблоны с именем model_name_form.html,
@@ -231,6 +436,7 @@ class AuthorCreate(PermissionRequiredMixin, CreateView):
 
     # указываем разрешения
     permission_required = ('catalog.can_update_create_delete_author', )
+    query_budget = 4
 
     fields = '__all__'
     initial = {
@@ -243,6 +449,7 @@ class AuthorUpdate(PermissionRequiredMixin, UpdateView):
 
     # указываем разрешения
     permission_required = ('catalog.can_update_create_delete_author', )
+    query_budget = 5
 
     fields = ['first_name', 'last_name', 'date_of_birth', 'date_of_death']
 
@@ -252,6 +459,7 @@ class AuthorDelete(PermissionRequiredMixin, DeleteView):
     model = Author
     # указываем разрешения
     permission_required = ('catalog.can_update_create_delete_author', )
+    query_budget = 5
 
     success_url = reverse_lazy('authors')
 
@@ -261,6 +469,7 @@ class BookCreate(PermissionRequiredMixin, CreateView):
 
     # указываем разрешения
     permission_required = ('catalog.can_update_create_delete_book', )
+    query_budget = 6
 
     fields = '__all__'
     # initial = {'date_of_death': '12/10/1500', }
@@ -272,6 +481,7 @@ class BookUpdate(PermissionRequiredMixin, UpdateView):
 
     # указываем разрешения
     permission_required = ('catalog.can_update_create_delete_book', )
+    query_budget = 8
     fields = '__all__'
 
     # fields = ['first_name', 'last_name', 'date_of_birth', 'date_of_death']
@@ -282,5 +492,6 @@ class BookDelete(PermissionRequiredMixin, DeleteView):
     model = Book
     # указываем разрешения
     permission_required = ('catalog.can_update_create_delete_book', )
+    query_budget = 5
 
     success_url = reverse_lazy('books')
@@ -0,0 +1,158 @@
+import logging
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.template import TemplateSyntaxError, engines
+from django.urls import URLResolver, get_resolver
+from django.utils import translation
+
+# Прогрев воркера до первого запроса. Без него первые запросы каждого процесса после
+# деплоя платят за компиляцию регулярных выражений URL, загрузку и разбор шаблонов,
+# импорт представлений и подключение к базе. warm_up() делает все это заранее.
+#
+# При импорте myDjango/wsgi.py и myDjango/asgi.py (warm_up_worker) прогреваются
+# только URL и шаблоны, а подключения к базе закрываются: под gunicorn --preload
+# и другими pre-fork серверами импорт идет в мастере, и открытые сокеты достались
+# бы после fork всем воркерам сразу. Подключения открывает post_worker_init() -
+# хук gunicorn, который выполняется в каждом воркере после загрузки приложения
+# (подключен в gunicorn.conf.py рядом с manage.py).
+#
+# Шаблоны сохраняются, только если шаблоны берутся через cached loader: Django
+# включает его сам, когда DEBUG = False (в разработке прогрев шаблонов только
+# проверяет, что они разбираются).
+
+logger = logging.getLogger(__name__)
+
+# результат последнего прогрева в этом процессе (для benchmark_startup)
+last_report = None
+
+
+def template_names():
+    """
+    Names of the catalog and project (registration) templates: everything
+    under catalog/templates and the DIRS of the template engines.
+    """
+    directories = [os.path.join(apps.get_app_config('catalog').path, 'templates')]
+    for config in settings.TEMPLATES:
+        directories.extend(config.get('DIRS', []))
+    names = []
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith(('.html', '.txt')):
+                    names.append(os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/'))
+    return sorted(set(names))
+
+
+def warm_templates():
+    """
+    Loads and compiles every catalog and registration template in every
+    template engine. Returns the number of compiled templates.
+    """
+    compiled = 0
+    for engine in engines.all():
+        for name in template_names():
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError:
+                # ошибка все равно проявится на запросе - прогрев не должен останавливать воркер
+                logger.exception('Template %s does not compile', name)
+            else:
+                compiled += 1
+    # каталоги переводов загружаются при первом activate()
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.deactivate()
+    return compiled
+
+
+def _populate(resolver):
+    # reverse_dict строит словари reverse() и компилирует регулярные выражения всех шаблонов
+    resolver.reverse_dict
+    count = 0
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            count += _populate(pattern)
+        else:
+            pattern.pattern.regex
+            count += 1
+    return count
+
+
+def warm_urls():
+    """
+    Imports the URLconf (with the catalog and admin views) and populates every
+    resolver. Returns the number of URL patterns.
+    """
+    return _populate(get_resolver())
+
+
+def warm_connections():
+    """
+    Opens a connection to every configured database in this thread; it is
+    reused by requests for CONN_MAX_AGE seconds. Returns the aliases that
+    connected.
+    """
+    connected = []
+    for alias in connections:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            # база может подняться позже - тогда подключится первый запрос
+            logger.warning('Could not connect to database %s during warm-up', alias, exc_info=True)
+        else:
+            connected.append(alias)
+    return connected
+
+
+def warm_up(connect=True):
+    """
+    Runs every warm-up step and returns a report with the duration of each
+    step in milliseconds.
+    """
+    global last_report
+    report = {}
+    steps = [('urls', warm_urls), ('templates', warm_templates)]
+    if connect:
+        steps.append(('connections', warm_connections))
+    started = time.perf_counter()
+    for name, step in steps:
+        begin = time.perf_counter()
+        report[name] = step()
+        report['%s_ms' % name] = round((time.perf_counter() - begin) * 1000, 3)
+    report['total_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    last_report = report
+    return report
+
+
+def warm_up_worker():
+    """
+    Entry point for wsgi.py and asgi.py: warms up the URLs and templates
+    unless WORKER_WARMUP is off and leaves no database connection open, so
+    that nothing is shared with processes forked after the import.
+    """
+    if not getattr(settings, 'WORKER_WARMUP', True):
+        return None
+    report = warm_up(connect=False)
+    # на случай, если импорт представлений или шаблонов обратился к базе
+    connections.close_all()
+    return report
+
+
+def post_worker_init(worker):
+    """
+    gunicorn hook, called in every worker after it has loaded the application:
+    opens the database connections of this worker in advance.
+    """
+    global last_report
+    if not getattr(settings, 'WORKER_WARMUP', True):
+        return None
+    begin = time.perf_counter()
+    report = dict(last_report or {})
+    report['connections'] = warm_connections()
+    report['connections_ms'] = round((time.perf_counter() - begin) * 1000, 3)
+    report['total_ms'] = round(report.get('total_ms', 0) + report['connections_ms'], 3)
+    last_report = report
+    return report
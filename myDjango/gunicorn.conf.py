@@ -0,0 +1,7 @@
+# Настройки gunicorn: `gunicorn myDjango.wsgi` читает ./gunicorn.conf.py сам.
+#
+# Импорт myDjango/wsgi.py прогревает URL и шаблоны, но не открывает подключения к
+# базе: при --preload он выполняется в мастере, и сокеты достались бы всем воркерам
+# после fork. Подключения каждого воркера открывает этот хук - он вызывается в
+# воркере после загрузки приложения (и с --preload, и без него).
+from catalog.warmup import post_worker_init  # noqa: F401
@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myDjango.settings')
 
 application = get_asgi_application()
+
+# прогрев до первого запроса: URL и шаблоны (catalog/warmup.py). Подключения к базе
+# здесь не открываются: синхронные представления под ASGI выполняются в других
+# потоках, а подключения Django привязаны к потоку.
+from catalog.warmup import warm_up_worker  # noqa: E402
+
+warm_up_worker()
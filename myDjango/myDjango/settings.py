@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -41,7 +43,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # первым, чтобы время ответа включало остальные middleware (catalog/metrics.py)
+    'catalog.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # чтения после записи идут на primary (catalog/routers.py)
+    'catalog.routers.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,7 +60,8 @@ ROOT_URLCONF = 'myDjango.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # обычный DjangoTemplates + учет времени рендеринга (catalog/metrics.py)
+        'BACKEND': 'catalog.metrics.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')]
         ,
         'APP_DIRS': True,
@@ -90,10 +97,94 @@ DATABASES = {
         'PASSWORD': 'qwe123',
         'HOST': 'localhost',
         'PORT': '5432',
+        # постоянные подключения: воркер держит подключение между запросами (и открывает
+        # его заранее при прогреве, catalog/warmup.py), а не подключается на каждый запрос
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+    }
+}
+
+# Реплики только для чтения: DATABASE_REPLICA_HOSTS=host1,host2 добавляет алиасы
+# replica1, replica2 с теми же настройками, что и у default. В тестах реплики
+# зеркалят тестовую базу default (TEST MIRROR), поэтому отдельные базы не нужны.
+DATABASE_REPLICAS = []
+for replica_num, replica_host in enumerate(
+        filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES['replica%s' % replica_num] = dict(DATABASES['default'], HOST=replica_host.strip(),
+                                                TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append('replica%s' % replica_num)
+
+# чтения моделей catalog - с реплик, записи - на primary (catalog/routers.py)
+DATABASE_ROUTERS = ['catalog.routers.PrimaryReplicaRouter']
+# сколько секунд после записи пользователь читает только с primary
+REPLICA_STICKY_SECONDS = 10
+# реплика, отставшая больше чем на столько секунд, не используется
+REPLICA_MAX_LAG_SECONDS = 5
+# как часто (в секундах) каждый процесс проверяет отставание реплик
+REPLICA_LAG_CHECK_INTERVAL = 1
+
+
+# Прогрев воркера при запуске из wsgi.py/asgi.py (catalog/warmup.py);
+# WORKER_WARMUP=0 отключает его (например, для сравнения в benchmark_startup)
+WORKER_WARMUP = os.environ.get('WORKER_WARMUP', '1') != '0'
+
+
+# Метрики (catalog/metrics.py): каталог, общий для всех воркеров, куда каждый процесс
+# пишет свои значения, чтобы /metrics/ отдавал сумму по процессам. SERVER_TIMING=1
+# добавляет заголовок Server-Timing во все ответы, а не только для персонала.
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+
+# В кэше хранятся снимки групп и прав пользователей (catalog/permissions.py), сессии,
+# фрагменты шаблонов, фасеты и страницы списков. LocMemCache живет внутри одного
+# процесса: каждый воркер заполнял бы свою копию, а сессии из кэша не были бы видны
+# соседним воркерам. Поэтому по умолчанию кэш - memcached, общий для всех процессов:
+#   CACHE_LOCATION - адреса серверов через запятую (обязательно);
+#   CACHE_BACKEND=memcached (python-memcached, по умолчанию) или pylibmc.
+# CACHE_BACKEND=locmem - кэш процесса, выбирается только явно: для разработки
+# с одним процессом и для тестов.
+# Без CACHE_LOCATION проект не запускается, а не уходит молча в кэш процесса.
+# Во всех вариантах считаются попадания и промахи (catalog/metrics.py).
+CACHE_BACKENDS = {
+    'memcached': 'catalog.metrics.InstrumentedMemcachedCache',
+    'pylibmc': 'catalog.metrics.InstrumentedPyLibMCCache',
+    'locmem': 'catalog.metrics.InstrumentedLocMemCache',
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memcached')
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured('CACHE_BACKEND must be one of: %s' % ', '.join(sorted(CACHE_BACKENDS)))
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', 'catalog' if CACHE_BACKEND == 'locmem' else '')
+if not CACHE_LOCATION:
+    raise ImproperlyConfigured('Set CACHE_LOCATION to the memcached servers (host:port, comma-separated), '
+                               'or CACHE_BACKEND=locmem for a single-process development server')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': CACHE_LOCATION,
     }
 }
 
 
+# Сессии хранятся в кэше и в базе (catalog/session_backend.py). Изменения
+# счетчиков из SESSION_COALESCED_KEYS пишутся в базу не на каждый запрос,
+# а раз в SESSION_FLUSH_EVERY сохранений или SESSION_FLUSH_INTERVAL секунд;
+# вход и выход пользователя записываются в базу сразу.
+SESSION_ENGINE = 'catalog.session_backend'
+SESSION_COALESCED_KEYS = ['num_visits']
+SESSION_FLUSH_EVERY = 20
+SESSION_FLUSH_INTERVAL = 5 * 60
+
+
+# Проверки прав (has_perm, PermissionRequiredMixin, perms в шаблонах)
+# читаются из кэшированного снимка прав, а не из базы на каждый запрос
+AUTHENTICATION_BACKENDS = [
+    'catalog.backends.SnapshotModelBackend',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -131,6 +222,9 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+# сюда collectstatic собирает файлы с хэшем в имени и их сжатые варианты (catalog/storage.py)
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_STORAGE = 'catalog.storage.CompressedManifestStaticFilesStorage'
 
 # Redirect to home URL after login (Default redirects to /accounts/profile/)
 # сейчас ни LOGIN_REDIRECT_URL ни LOGOUT_REDIRECT_URL не работают
@@ -14,12 +14,15 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+import re
+
+from django.urls import path, re_path
 from django.urls import include
 from django.views.generic import RedirectView
-from django.conf.urls.static import static
 from django.conf import settings
 
+from catalog.storage import serve_static
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('catalog/', include('catalog.urls')),
@@ -28,4 +31,7 @@ urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),
 ]
 
-urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+# статику отдает само приложение, с кэшированием и сжатыми вариантами (не только в DEBUG)
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.STATIC_URL.lstrip('/')), serve_static),
+]
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myDjango.settings')
 
 application = get_wsgi_application()
+
+# прогрев до первого запроса: URL и шаблоны (catalog/warmup.py). Подключения к базе
+# здесь не открываются - импорт может идти в мастере до fork (gunicorn --preload);
+# их открывает хук post_worker_init в каждом воркере (gunicorn.conf.py).
+from catalog.warmup import warm_up_worker  # noqa: E402
+
+warm_up_worker()